@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+반복 광고 / 징글 오디오 핑거프린트 (spectral peak landmark)
+
+같은 광고·시보("위더스 제약에서 6시를 알려드립니다")가 매일 나오는데, 매번 Whisper → diarization →
+역할 추정으로 다시 찾고 있으므로 확정된 AD 블록({date}-blocks.csv)을 핑거프린트로 저장해 두고
+새 방송은 한 번의 스트리밍 패스로 대조해서 정확한 시작/끝 시각을 냅니다.
+
+  8kHz mono PCM (audio_buffer 공유 버퍼)
+    → STFT (512 / hop 128 = 16ms) → log magnitude
+    → maximum_filter 로 국소 최댓값(peak) 추출, 초당 PEAKS_PER_SEC 개까지
+    → anchor peak 와 뒤따르는 FAN_OUT 개 peak 를 묶어 hash (f1, f2, dt) 24bit
+  인덱스: 정렬된 hash 배열 + (ad_id, anchor 의 광고 내 frame offset)
+  검색:   np.searchsorted 로 hash 조회 → (ad_id, 방송 frame - 광고 frame) 투표
+          → 같은 시작점에 표가 몰리면 그 광고가 거기서 시작
+
+Usage:
+  python ad_fingerprint.py index <DATE> [<DATE> ...]   # AD 블록 등록 (이미 등록된 광고는 건너뜀)
+  python ad_fingerprint.py scan <DATE>                 # → {date}-ad_matches.csv
+  python ad_fingerprint.py scan-file <audio> [--output out.csv]
+  python ad_fingerprint.py info
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from audio_buffer import load_pcm
+
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
+AD_INDEX = os.path.join(BASE_PATH, "ad_fingerprint.npz")
+
+# 스펙트로그램
+SR = 8000
+N_FFT = 512
+HOP = 128                  # 16ms → 시작/끝 시각 해상도
+FRAME_SEC = HOP / SR
+
+# Peak / hash
+PEAK_NEIGHBORHOOD = (15, 11)   # (주파수 bin, frame) 국소 최댓값 영역
+PEAKS_PER_SEC = 30
+FAN_OUT = 10
+DT_MAX = 63                    # anchor ~ target 최대 frame 차 (6bit, ~1초)
+
+# 검색
+CHUNK_SEC = 60.0               # 스트리밍 처리 단위
+MIN_MATCHES = 20               # 한 시작점에 이 이상 표가 모여야 매칭
+MIN_MATCH_RATIO = 0.02         # 그리고 광고 hash 수 대비 이 비율 이상 (음악/멘트가 겹치면 peak 일부만 남음)
+MIN_AD_SEC = 3.0               # 이보다 짧은 AD 블록은 등록 안 함
+
+_WINDOW = np.hanning(N_FFT).astype(np.float32)
+
+
+# ==========================================
+# 1. 스펙트로그램 / peak / hash
+# ==========================================
+def n_frames(n_samples):
+    return 0 if n_samples < N_FFT else 1 + (n_samples - N_FFT) // HOP
+
+
+def spectrogram(y):
+    """(bins, frames) log magnitude"""
+    n = n_frames(len(y))
+    if n == 0:
+        return np.zeros((N_FFT // 2 + 1, 0), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(y, N_FFT)[::HOP][:n]
+    spec = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)).astype(np.float32)
+    return np.log(spec + 1e-6).T
+
+
+def find_peaks(spec):
+    """국소 최댓값 peak → (frame, bin) 배열 (frame 순 정렬)"""
+    from scipy.ndimage import maximum_filter
+
+    if spec.shape[1] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    local_max = maximum_filter(spec, size=PEAK_NEIGHBORHOOD, mode="constant", cval=-np.inf)
+    mask = (spec == local_max) & (spec > np.median(spec) + 2.0)
+    f, t = np.nonzero(mask)
+
+    # 너무 촘촘하면 강한 peak 만 남김
+    limit = max(1, int(PEAKS_PER_SEC * spec.shape[1] * FRAME_SEC))
+    if len(t) > limit:
+        keep = np.argpartition(-spec[f, t], limit - 1)[:limit]
+        f, t = f[keep], t[keep]
+
+    order = np.lexsort((f, t))
+    return t[order], f[order]
+
+
+def pair_hashes(t, f, first_target=0):
+    """
+    anchor → 뒤따르는 FAN_OUT 개 peak 로 hash
+    first_target 보다 앞선 target 은 제외 (이전 chunk 에서 이미 만든 쌍)
+
+    Returns:
+        (hashes uint32, anchor frame int64)
+    """
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        if len(t) <= k:
+            break
+        i = np.arange(len(t) - k)
+        j = i + k
+        dt = t[j] - t[i]
+        ok = (dt >= 1) & (dt <= DT_MAX) & (j >= first_target)
+        i, j, dt = i[ok], j[ok], dt[ok]
+        hashes.append(((f[i] << 15) | (f[j] << 6) | dt).astype(np.uint32))
+        anchors.append(t[i])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def iter_hashes(y, chunk_sec=CHUNK_SEC):
+    """
+    긴 오디오를 chunk 단위로 한 번 훑으며 (hashes, 절대 anchor frame) 생성
+    chunk 경계: peak 판정은 앞뒤 PEAK_NEIGHBORHOOD 만큼 더 보고,
+    이전 chunk 끝 DT_MAX frame 의 peak 는 다음 chunk 의 target 과 짝지음
+    """
+    total = n_frames(len(y))
+    chunk = int(chunk_sec / FRAME_SEC)
+    ctx = PEAK_NEIGHBORHOOD[1]
+
+    carry_t = np.zeros(0, dtype=np.int64)
+    carry_f = np.zeros(0, dtype=np.int64)
+    for c0 in range(0, total, chunk):
+        c1 = min(total, c0 + chunk)
+        lo, hi = max(0, c0 - ctx), min(total, c1 + ctx)
+        spec = spectrogram(np.asarray(y[lo * HOP:(hi - 1) * HOP + N_FFT], dtype=np.float32))
+        t, f = find_peaks(spec)
+        t = t + lo
+        keep = (t >= c0) & (t < c1)
+        t, f = t[keep], f[keep]
+
+        all_t = np.concatenate([carry_t, t])
+        all_f = np.concatenate([carry_f, f])
+        yield pair_hashes(all_t, all_f, first_target=len(carry_t))
+
+        tail = all_t >= c1 - DT_MAX
+        carry_t, carry_f = all_t[tail], all_f[tail]
+
+
+def fingerprint(y):
+    """짧은 구간 전체 → (hashes, anchor frame)"""
+    parts = list(iter_hashes(y))
+    if not parts:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+# ==========================================
+# 2. 인덱스
+# ==========================================
+class AdIndex:
+    def __init__(self):
+        self.hashes = np.zeros(0, dtype=np.uint32)    # 정렬됨
+        self.ad_ids = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(0, dtype=np.int32)
+        self.ads = pd.DataFrame(columns=["Ad_ID", "Source_Date", "Source_Start", "Duration", "Hashes", "Text"])
+
+    def __len__(self):
+        return len(self.ads)
+
+    @classmethod
+    def load(cls, path=AD_INDEX):
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        data = np.load(path, allow_pickle=False)
+        index.hashes = data["hashes"]
+        index.ad_ids = data["ad_ids"]
+        index.offsets = data["offsets"]
+        index.ads = pd.DataFrame({
+            "Ad_ID": data["ad_id"], "Source_Date": data["source_date"],
+            "Source_Start": data["source_start"], "Duration": data["duration"],
+            "Hashes": data["n_hashes"], "Text": data["text"],
+        })
+        return index
+
+    def save(self, path=AD_INDEX):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, hashes=self.hashes, ad_ids=self.ad_ids, offsets=self.offsets,
+                     ad_id=self.ads["Ad_ID"].to_numpy(np.int32),
+                     source_date=self.ads["Source_Date"].to_numpy(str),
+                     source_start=self.ads["Source_Start"].to_numpy(np.float64),
+                     duration=self.ads["Duration"].to_numpy(np.float64),
+                     n_hashes=self.ads["Hashes"].to_numpy(np.int64),
+                     text=self.ads["Text"].to_numpy(str))
+        os.replace(tmp, path)
+
+    def add(self, y, source_date, source_start, text=""):
+        """AD 구간 1개 등록 → ad_id"""
+        hashes, anchors = fingerprint(y)
+        if len(hashes) == 0:
+            return None
+        ad_id = len(self.ads)
+        hashes = np.concatenate([self.hashes, hashes])
+        ad_ids = np.concatenate([self.ad_ids, np.full(len(anchors), ad_id, dtype=np.int32)])
+        offsets = np.concatenate([self.offsets, anchors.astype(np.int32)])
+        order = np.argsort(hashes, kind="stable")
+        self.hashes, self.ad_ids, self.offsets = hashes[order], ad_ids[order], offsets[order]
+        self.ads.loc[ad_id] = [ad_id, source_date, float(source_start), len(y) / SR, len(anchors), text]
+        return ad_id
+
+    def votes(self, hashes, anchors):
+        """질의 hash → (ad_id, 시작 frame) 별 득표 dict"""
+        if len(hashes) == 0 or len(self.hashes) == 0:
+            return {}
+        lo = np.searchsorted(self.hashes, hashes, side="left")
+        hi = np.searchsorted(self.hashes, hashes, side="right")
+        counts = hi - lo
+        hit = counts > 0
+        if not hit.any():
+            return {}
+        lo, counts, q_anchor = lo[hit], counts[hit], anchors[hit]
+
+        # (질의 i, 인덱스 항목 lo[i] ... hi[i]-1) 펼치기
+        rep = np.repeat(np.arange(len(lo)), counts)
+        idx = lo[rep] + (np.arange(len(rep)) - np.repeat(np.cumsum(counts) - counts, counts))
+        starts = q_anchor[rep] - self.offsets[idx]
+        ads = self.ad_ids[idx]
+
+        keys, n = np.unique(np.stack([ads.astype(np.int64), starts]), axis=1, return_counts=True)
+        return {(int(a), int(s)): int(c) for (a, s), c in zip(keys.T, n)}
+
+
+def detect(votes, index):
+    """
+    득표 → 매칭 목록
+    시작 frame 이 ±1 흔들리는 표는 합치고, 겹치는 매칭은 점수 높은 것만 남김
+    """
+    merged = {}
+    for (ad, start), c in votes.items():
+        merged[(ad, start)] = merged.get((ad, start), 0) + c
+    candidates = []
+    for (ad, start), c in merged.items():
+        score = c + merged.get((ad, start - 1), 0) + merged.get((ad, start + 1), 0)
+        n_hashes = int(index.ads.loc[ad, "Hashes"])
+        if score >= MIN_MATCHES and score >= MIN_MATCH_RATIO * n_hashes:
+            candidates.append((score, ad, start))
+
+    candidates.sort(key=lambda x: (-x[0], x[2]))
+    taken = []
+    matches = []
+    for score, ad, start in candidates:
+        begin = start * FRAME_SEC
+        end = begin + float(index.ads.loc[ad, "Duration"])
+        if any(begin < e and b < end for b, e in taken):
+            continue
+        taken.append((begin, end))
+        matches.append({
+            "Start Time": round(max(begin, 0.0), 3),
+            "Stop Time": round(end, 3),
+            "Ad_ID": ad,
+            "Score": score,
+            "Match_Ratio": round(score / max(int(index.ads.loc[ad, "Hashes"]), 1), 3),
+            "Source_Date": index.ads.loc[ad, "Source_Date"],
+            "Source_Start": index.ads.loc[ad, "Source_Start"],
+            "Text": index.ads.loc[ad, "Text"],
+        })
+    matches.sort(key=lambda m: m["Start Time"])
+    return matches
+
+
+def scan(y, index, chunk_sec=CHUNK_SEC):
+    """방송 전체를 한 번 훑어서 매칭 목록 반환"""
+    votes = {}
+    for hashes, anchors in iter_hashes(y, chunk_sec):
+        for key, c in index.votes(hashes, anchors).items():
+            votes[key] = votes.get(key, 0) + c
+    return detect(votes, index)
+
+
+# ==========================================
+# 3. 날짜 단위 실행
+# ==========================================
+def day_paths(date_str, base_path=BASE_PATH):
+    transcript_dir = os.path.join(base_path, date_str, "transcript")
+    return (
+        os.path.join(base_path, date_str, "mp3", f"{date_str}.mp3"),
+        os.path.join(transcript_dir, f"{date_str}-blocks.csv"),
+        os.path.join(transcript_dir, f"{date_str}-ad_matches.csv"),
+    )
+
+
+def index_day(date_str, index, base_path=BASE_PATH):
+    """
+    그날 AD 블록 등록 — 이미 인덱스에 있는 광고와 매칭되면 건너뜀 (매일 같은 광고 중복 방지)
+    """
+    mp3, blocks_csv, _ = day_paths(date_str, base_path)
+    if not os.path.exists(mp3) or not os.path.exists(blocks_csv):
+        print(f"   ⚠️  [{date_str}] mp3 or blocks.csv missing")
+        return 0
+
+    y = load_pcm(mp3, SR)
+    blocks = pd.read_csv(blocks_csv)
+    ads = blocks[(blocks["block_type"] == "AD") & (blocks["end"] - blocks["start"] >= MIN_AD_SEC)]
+
+    added = skipped = 0
+    for _, b in ads.iterrows():
+        seg = np.asarray(y[int(b["start"] * SR):int(b["end"] * SR)], dtype=np.float32)
+        if len(index) and scan(seg, index):
+            skipped += 1
+            continue
+        text = b["text"] if isinstance(b.get("text"), str) else ""
+        if index.add(seg, date_str, b["start"], text[:200]) is not None:
+            added += 1
+    print(f"   ✅ [{date_str}] {added} new ads, {skipped} already known")
+    return added
+
+
+def scan_file(audio_file, output_csv, index):
+    started = time.time()
+    y = load_pcm(audio_file, SR)
+    matches = scan(y, index)
+    elapsed = time.time() - started
+
+    columns = ["Start Time", "Stop Time", "Ad_ID", "Score", "Match_Ratio", "Source_Date", "Source_Start", "Text"]
+    pd.DataFrame(matches, columns=columns).to_csv(output_csv, index=False, encoding="utf-8-sig")
+
+    audio_sec = len(y) / SR
+    print(f"🔎 {len(matches)} known ads in {audio_sec / 60:.1f} min audio "
+          f"({elapsed:.1f}s, {audio_sec / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"💾 Saved to {output_csv}")
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python ad_fingerprint.py (index DATES... | scan DATE | scan-file AUDIO | info)"
+    )
+    parser.add_argument("command", choices=["index", "scan", "scan-file", "info"])
+    parser.add_argument("targets", nargs="*", help="YYYYMMDD ... 또는 오디오 파일")
+    parser.add_argument("--index", default=AD_INDEX)
+    parser.add_argument("--base-dir", default=BASE_PATH)
+    parser.add_argument("--output", default=None, help="scan-file 출력 CSV")
+    args = parser.parse_args()
+
+    index = AdIndex.load(args.index)
+
+    if args.command == "info":
+        print(f"📚 {args.index}: {len(index)} ads, {len(index.hashes)} hashes")
+        if len(index):
+            print(index.ads[["Ad_ID", "Source_Date", "Source_Start", "Duration", "Text"]].to_string(index=False))
+        sys.exit(0)
+
+    if not args.targets:
+        print("❌ No targets given")
+        sys.exit(1)
+
+    if args.command == "index":
+        for d in args.targets:
+            index_day(d, index, args.base_dir)
+        index.save(args.index)
+        print(f"💾 {args.index}: {len(index)} ads")
+    elif len(index) == 0:
+        print(f"❌ Empty index: {args.index}")
+        sys.exit(1)
+    elif args.command == "scan":
+        mp3, _, out = day_paths(args.targets[0], args.base_dir)
+        scan_file(mp3, args.output or out, index)
+    else:
+        out = args.output or os.path.splitext(args.targets[0])[0] + "-ad_matches.csv"
+        scan_file(args.targets[0], out, index)
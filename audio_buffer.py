@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+디코딩된 오디오 공유 버퍼
+
+2시간짜리 MP3 를 stage 마다 다시 디코딩하지 않도록, mono float32 PCM 을
+raw 파일(.f32) 로 한 번만 저장해 두고 np.memmap 으로 엽니다.
+  - 디코딩: ffmpeg 1회 (mp3 보다 새 PCM 파일이 있으면 재사용)
+  - 읽기: memmap 슬라이스 → 필요한 구간만 페이지 단위로 로드
+
+  20260101.mp3 → 20260101.16k.f32  (기본: MP3 옆, RADIO_PCM_DIR 로 변경 가능 예: /dev/shm)
+
+Usage:
+  python audio_buffer.py <input.mp3> [--sr 16000]   # 미리 디코딩
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+import numpy as np
+
+PCM_SR = 16000
+PCM_DIR = os.environ.get("RADIO_PCM_DIR")
+# stage 캐시 키에 넣는 디코더 표시 (디코더가 바뀌면 입력 샘플이 달라지므로 캐시도 새로)
+PCM_DECODER = "ffmpeg-f32le"
+
+
+def pcm_path(audio_file, sr=PCM_SR):
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    out_dir = PCM_DIR or os.path.dirname(os.path.abspath(audio_file))
+    return os.path.join(out_dir, f"{stem}.{sr // 1000}k.f32")
+
+
+def ensure_pcm(audio_file, sr=PCM_SR):
+    """
+    PCM 파일이 없거나 원본보다 오래됐으면 ffmpeg 로 디코딩 → PCM 경로 반환
+    """
+    out = pcm_path(audio_file, sr)
+    if os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(audio_file):
+        return out
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", "-y",
+        "-i", audio_file,
+        "-ac", "1",           # Mono
+        "-ar", str(sr),
+        "-f", "f32le",        # raw float32 little-endian
+        tmp
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+        # 동시에 여러 stage 가 디코딩해도 rename 은 원자적
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+def load_pcm(audio_file, sr=PCM_SR, writable=False):
+    """
+    mono float32 PCM 을 memmap 으로 반환 (복사 없음)
+
+    writable=True 면 copy-on-write 모드 — torch.from_numpy 처럼 쓰기 가능한
+    배열이 필요한 곳에서 사용 (원본 PCM 파일은 바뀌지 않음)
+    """
+    path = ensure_pcm(audio_file, sr)
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="c" if writable else "r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MP3 → 공유 PCM(.f32) 디코딩")
+    parser.add_argument("audio", help="입력 오디오 파일")
+    parser.add_argument("--sr", type=int, default=PCM_SR, help="샘플레이트 (기본 16000)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"❌ File not found: {args.audio}")
+        sys.exit(1)
+
+    pcm = load_pcm(args.audio, args.sr)
+    print(f"✅ {pcm_path(args.audio, args.sr)} ({len(pcm) / args.sr / 60:.1f} min @ {args.sr} Hz)")
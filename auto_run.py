@@ -1,27 +1,169 @@
 import os
 import sys
-import shutil
+import argparse
 import subprocess
 
+from pipeline_dag import Stage, run_dag
+
 # ==========================================
 # 설정
 # ==========================================
 PROGRAM_NAME = "baechulsu"
 BASE_PATH = f"/mnt/home_dnlab/jhjung/radio/{PROGRAM_NAME}"
 
-def run_command(cmd):
+def run_command(cmd, env=None):
     """명령어 실행"""
     print(f"🚀 Running: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    subprocess.run(cmd, check=True, env=env)
+
+def separate_vocals(original_mp3, vocals_mp3, env=None):
+    """Demucs 스트리밍 분리 → vocals 만 16kHz mono MP3 로 바로 저장 (temp wav / 재인코딩 없음)"""
+    run_command(["python", "preprocess_vocals.py", "--stream", original_mp3, vocals_mp3], env=env)
+
+    if not os.path.exists(vocals_mp3):
+        raise FileNotFoundError(f"Vocal file not found: {vocals_mp3}")
+    print(f"   ✅ Created vocals MP3: {vocals_mp3}")
+
+def whisper_command(date_str, whisper_queue=None, structured=False):
+    extra = ["--jsonl"] if structured else []
+    if whisper_queue:
+        # 상주 워커에 작업만 넘기고 완료 대기 (모델 재로딩 없음)
+        return ["python", "whisper_worker.py", "submit", "--queue", whisper_queue, "--wait", date_str] + extra
+    return ["python", "whisper-direct.py", date_str] + extra
+
+# ==========================================
+# DAG 구성
+# ==========================================
+def build_stages(date_str, whisper_queue=None, in_process=False, structured=False):
+    """
+    Step 1~8 을 의존성 그래프로 구성
+
+      original.mp3 ─┬─ whisper ── srt2csv ──────────┐
+                    └─ vocals ── diarize ───────────┴─ merge ── dj_stats ─┬─ blocks
+                                                                          └─ ground_truth
+      original.mp3 ── ad_scan (ad_fingerprint.npz 가 있을 때) ───────────────────────┘
+
+    in_process: srt2csv ~ ground_truth 를 postprocess.py 한 stage 로 (CSV 재파싱 없음)
+    structured: whisper 가 {date}.jsonl + {date}.csv 를 바로 저장 → srt2csv stage 없음
+    """
+    target_dir = os.path.join(BASE_PATH, date_str)
+    mp3_dir = os.path.join(target_dir, "mp3")
+    transcript_dir = os.path.join(target_dir, "transcript")
+
+    original_mp3 = os.path.join(mp3_dir, f"{date_str}.mp3")
+    vocals_mp3 = os.path.join(mp3_dir, f"{date_str}_vocals.mp3")
+
+    srt_file = os.path.join(transcript_dir, f"{date_str}.srt")
+    txt_file = os.path.join(transcript_dir, f"{date_str}.txt")
+    csv_file = os.path.join(transcript_dir, f"{date_str}.csv")
+    jsonl_file = os.path.join(transcript_dir, f"{date_str}.jsonl")
+    diar_file = os.path.join(transcript_dir, f"{date_str}_diarization.txt")
+    ratio_csv = os.path.join(transcript_dir, f"{date_str}_with_speaker_ratio.csv")
+    ratio_npz = os.path.join(transcript_dir, f"{date_str}_with_speaker_ratio.npz")
+    stats_csv = os.path.join(transcript_dir, f"{date_str}-dj_stats.csv")
+    blocks_csv = os.path.join(transcript_dir, f"{date_str}-blocks.csv")
+    gt_csv = os.path.join(transcript_dir, f"{date_str}-inference_result_ratio.csv")
+    ad_matches_csv = os.path.join(transcript_dir, f"{date_str}-ad_matches.csv")
+    ad_index = os.path.join(BASE_PATH, "ad_fingerprint.npz")
+
+    stages = [
+        # Step 1: Vocal 분리 (Diarization용만!)
+        Stage("vocals",
+              lambda env: separate_vocals(original_mp3, vocals_mp3, env=env),
+              inputs=[original_mp3], outputs=[vocals_mp3], resource="gpu"),
+
+        # Step 2: Whisper 전사 (원본으로! - music provides context)
+        # queue 모드에서는 상주 워커가 GPU 를 쥐고 있으므로 여기서는 슬롯을 잡지 않음
+        Stage("whisper", whisper_command(date_str, whisper_queue, structured),
+              inputs=[original_mp3],
+              outputs=[srt_file, txt_file] + ([jsonl_file, csv_file] if structured else []),
+              resource=None if whisper_queue else "gpu"),
+
+        # Step 4: Speaker Diarization (Vocals로!)
+        Stage("diarize", ["python", "diarize-direct.py", date_str],
+              inputs=[original_mp3, vocals_mp3], outputs=[diar_file], deps=["vocals"], resource="gpu"),
+    ]
+
+    # 알려진 광고 핑거프린트 인덱스가 있으면 원본 MP3 를 바로 대조 (Whisper/diarization 과 병렬)
+    ad_inputs, ad_deps = [], []
+    if os.path.exists(ad_index):
+        stages.append(Stage("ad_scan", ["python", "ad_fingerprint.py", "scan", date_str],
+                            inputs=[original_mp3, ad_index], outputs=[ad_matches_csv], resource="cpu"))
+        ad_inputs, ad_deps = [ad_matches_csv], ["ad_scan"]
+
+    if in_process:
+        # Step 3, 5-8: 한 프로세스에서 DataFrame 으로 전달
+        # ratio / stats 는 다른 스크립트(speaker_embedding, ina_speech_mbc_classify 등)가 읽으므로 같이 저장
+        stages.append(Stage("postprocess", ["python", "postprocess.py", date_str, "--keep", "ratio", "stats"],
+                            inputs=[csv_file if structured else srt_file, diar_file] + ad_inputs,
+                            outputs=[ratio_csv, ratio_npz, stats_csv, blocks_csv, gt_csv],
+                            deps=["whisper", "diarize"] + ad_deps, resource="cpu"))
+        return stages
+
+    if not structured:
+        # Step 3: SRT → CSV 변환
+        stages.append(Stage("srt2csv", ["python", "srt2csv.py", srt_file, csv_file],
+                            inputs=[srt_file], outputs=[csv_file], deps=["whisper"], resource="cpu"))
+
+    stages += [
+        # Step 5-8: 나머지 파이프라인
+        Stage("merge", ["python", "merge_speaker_overlap_ratio.py", date_str],
+              inputs=[csv_file, diar_file], outputs=[ratio_csv, ratio_npz],
+              deps=["whisper" if structured else "srt2csv", "diarize"], resource="cpu"),
+        Stage("dj_stats", ["python", "dj_stat_ratio5.py", date_str],
+              inputs=[ratio_csv], outputs=[stats_csv], deps=["merge"], resource="cpu"),
+        Stage("blocks", ["python", "dj_merge_block3.py", date_str],
+              inputs=[ratio_csv, stats_csv], outputs=[blocks_csv], deps=["dj_stats"], resource="cpu"),
+        Stage("ground_truth", ["python", "make_ground_truth.py", date_str],
+              inputs=[ratio_csv, stats_csv] + ad_inputs, outputs=[gt_csv],
+              deps=["dj_stats"] + ad_deps, resource="cpu"),
+    ]
+    return stages
+
+def default_gpus():
+    """CUDA_VISIBLE_DEVICES 가 있으면 그 장치들, 없으면 0번 하나"""
+    visible = os.environ.get("CUDA_VISIBLE_DEVICES", "").strip()
+    if visible:
+        return [d.strip() for d in visible.split(",") if d.strip()]
+    return ["0"]
 
-def main(date_str):
+def main(date_str, whisper_queue=None, gpus=None, cpu_jobs=2, force=False, in_process=False,
+         structured=False):
+    original_mp3 = os.path.join(BASE_PATH, date_str, "mp3", f"{date_str}.mp3")
+
+    print(f"🔥 Starting Pipeline for {date_str}...")
+
+    # ==========================================
+    # Step 0: 원본 파일 확인
+    # ==========================================
+    if not os.path.exists(original_mp3):
+        print(f"❌ Original MP3 not found: {original_mp3}")
+        sys.exit(1)
+
+    stages = build_stages(date_str, whisper_queue=whisper_queue, in_process=in_process, structured=structured)
+    resources = {
+        "gpu": gpus or default_gpus(),   # GPU 1장당 무거운 작업 1개
+        "cpu": [None] * max(cpu_jobs, 1),
+    }
+
+    ok = run_dag(stages, resources=resources, force=force)
+    if not ok:
+        print(f"\n❌ Pipeline failed for {date_str}")
+        sys.exit(1)
+
+    print(f"\n🎉 All Done for {date_str}!")
+
+# ==========================================
+# 기존 순차 실행 (--sequential)
+# ==========================================
+def run_sequential(date_str, whisper_queue=None, structured=False):
     target_dir = os.path.join(BASE_PATH, date_str)
     mp3_dir = os.path.join(target_dir, "mp3")
     transcript_dir = os.path.join(target_dir, "transcript")
-    
+
     original_mp3 = os.path.join(mp3_dir, f"{date_str}.mp3")
     vocals_mp3 = os.path.join(mp3_dir, f"{date_str}_vocals.mp3")
-    
+
     print(f"🔥 Starting Pipeline for {date_str}...")
 
     # ==========================================
@@ -36,33 +178,11 @@ def main(date_str):
     # ==========================================
     if not os.path.exists(vocals_mp3):
         print("🎵 [Step 1] Separating Vocals for Diarization...")
-        
-        temp_dir = os.path.join(mp3_dir, "temp_demucs")
-        
-        # Demucs 실행
-        run_command(["python", "preprocess_vocals.py", original_mp3, temp_dir])
-        
-        # 분리된 vocal 파일 경로
-        vocal_wav = os.path.join(temp_dir, "htdemucs", date_str, "vocals.wav")
-        
-        if not os.path.exists(vocal_wav):
-            print(f"❌ Vocal file not found: {vocal_wav}")
+        try:
+            separate_vocals(original_mp3, vocals_mp3)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
             sys.exit(1)
-        
-        # Vocals를 MP3로 변환 (16kHz mono)
-        run_command([
-            "ffmpeg", "-i", vocal_wav,
-            "-ac", "1",           # Mono
-            "-ar", "16000",       # 16kHz
-            "-b:a", "64k",        # 64kbps
-            "-y",
-            vocals_mp3
-        ])
-        print(f"   ✅ Created vocals MP3: {vocals_mp3}")
-        
-        # 임시 폴더 삭제
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
     else:
         print("⚠️  Vocals MP3 already exists - skipping separation")
 
@@ -71,22 +191,25 @@ def main(date_str):
     # ==========================================
     print("🗣️  [Step 2] Transcribing with Whisper (original audio)...")
     print("   ℹ️  Using original MP3 - music provides context!")
-    run_command(["python", "whisper-direct.py", date_str])
+    run_command(whisper_command(date_str, whisper_queue, structured))
 
     # ==========================================
-    # Step 3: SRT → CSV 변환
+    # Step 3: SRT → CSV 변환 (structured 모드는 whisper 가 CSV 까지 저장)
     # ==========================================
-    print("📝 [Step 3] Converting SRT to CSV...")
-    srt_file = os.path.join(transcript_dir, f"{date_str}.srt")
-    csv_file = os.path.join(transcript_dir, f"{date_str}.csv")
-    run_command(["python", "srt2csv.py", srt_file, csv_file])
+    if structured:
+        print("📝 [Step 3] Skipped - CSV written by Whisper (--structured)")
+    else:
+        print("📝 [Step 3] Converting SRT to CSV...")
+        srt_file = os.path.join(transcript_dir, f"{date_str}.srt")
+        csv_file = os.path.join(transcript_dir, f"{date_str}.csv")
+        run_command(["python", "srt2csv.py", srt_file, csv_file])
 
     # ==========================================
     # Step 4: Speaker Diarization (Vocals로!)
     # ==========================================
     print("👥 [Step 4] Running Speaker Diarization (vocals only)...")
     print("   ℹ️  Using clean vocals for better speaker separation")
-    
+
     # diarize-direct.py가 기본으로 vocals 사용 (수정됨)
     run_command(["python", "diarize-direct.py", date_str])
 
@@ -98,7 +221,7 @@ def main(date_str):
 
     print("🧠 [Step 6] Analyzing Roles...")
     run_command(["python", "dj_stat_ratio5.py", date_str])
-    
+
     print("🧱 [Step 7] Merging Blocks...")
     run_command(["python", "dj_merge_block3.py", date_str])
 
@@ -114,9 +237,28 @@ def main(date_str):
     print(f"     - {vocals_mp3} (created)")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python auto_run.py <YYYYMMDD>")
-        print("Example: python auto_run.py 20241124")
-        sys.exit(1)
-    
-    main(sys.argv[1])
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        usage="python auto_run.py <YYYYMMDD> [--whisper-queue DIR] [--gpus 0,1] [--force] [--sequential] [--in-process] [--structured]",
+        epilog="Example: python auto_run.py 20241124"
+    )
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--whisper-queue", default=None,
+                        help="whisper_worker.py serve 가 감시 중인 queue 디렉토리 (없으면 whisper-direct.py 실행)")
+    parser.add_argument("--gpus", default=None,
+                        help="사용할 GPU 번호 (쉼표 구분, 기본: CUDA_VISIBLE_DEVICES 또는 0)")
+    parser.add_argument("--cpu-jobs", type=int, default=2, help="동시에 실행할 CPU stage 수")
+    parser.add_argument("--force", action="store_true", help="출력이 최신이어도 모든 stage 재실행")
+    parser.add_argument("--sequential", action="store_true", help="기존 Step 1~8 순차 실행")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Step 3, 5~8 을 postprocess.py 한 프로세스로 (중간 CSV 재파싱 없음)")
+    parser.add_argument("--structured", action="store_true",
+                        help="Whisper 가 {date}.jsonl + {date}.csv 를 바로 저장 (srt2csv 단계 생략)")
+    args = parser.parse_args()
+
+    if args.sequential:
+        run_sequential(args.date, whisper_queue=args.whisper_queue, structured=args.structured)
+    else:
+        gpus = [g.strip() for g in args.gpus.split(",")] if args.gpus else None
+        main(args.date, whisper_queue=args.whisper_queue, gpus=gpus,
+             cpu_jobs=args.cpu_jobs, force=args.force, in_process=args.in_process,
+             structured=args.structured)
@@ -1,7 +1,14 @@
 import sys
+import json
+import time
+import queue
+import argparse
+import threading
 import subprocess
 import os
+from collections import deque
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 # ==========================================
 # 설정
@@ -11,43 +18,193 @@ END_DATE   = "20241224"
 
 # 데이터가 있는 기본 경로 (파일 존재 확인용)
 # 배철수인지 정은임인지 확인해서 수정하세요
-BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu" 
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
 # BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
 
-def run_range():
-    # 날짜 변환
-    start = datetime.strptime(START_DATE, "%Y%m%d")
-    end = datetime.strptime(END_DATE, "%Y%m%d")
-    
+# 상주 Whisper 워커 queue (python whisper_worker.py serve --queue <dir> 를 먼저 띄워두면
+# 날짜마다 large-v3 를 다시 로드하지 않습니다). None 이면 whisper-direct.py 사용
+WHISPER_QUEUE = None
+
+# 작업 상태 파일 (재실행 시 done 인 날짜는 건너뜀)
+STATE_FILE = "range_state.json"
+LOG_DIR = "range_logs"
+STDERR_TAIL_LINES = 20
+
+# ==========================================
+# 작업 상태 파일
+# ==========================================
+class JobState:
+    """
+    {date: {"status": done/failed/missing/running, "attempts": n, "error_tail": "...", "updated": "..."}}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f)
+
+    def get(self, date_str):
+        return self.jobs.get(date_str, {})
+
+    def update(self, date_str, **fields):
+        with self.lock:
+            job = self.jobs.setdefault(date_str, {"status": "pending", "attempts": 0})
+            job.update(fields)
+            job["updated"] = datetime.now().isoformat(timespec="seconds")
+
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.jobs, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+# ==========================================
+# 워커 슬롯 (CPU 코어 / GPU 장치 고정)
+# ==========================================
+def build_slots(n_workers, devices):
+    """
+    사용 가능한 CPU 코어를 워커 수만큼 나누고, 장치는 round-robin 으로 배정
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    per_worker = max(len(cores) // n_workers, 1) if cores else 0
+
+    slots = []
+    for i in range(n_workers):
+        worker_cores = cores[i * per_worker:(i + 1) * per_worker] if per_worker else []
+        device = devices[i % len(devices)] if devices else None
+        slots.append({"id": i, "cores": worker_cores, "device": device})
+    return slots
+
+def tail_file(path, n_lines):
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(deque(f, maxlen=n_lines))
+
+def run_one(date_str, slot, attempt):
+    """auto_run.py 1회 실행 → (성공 여부, stderr tail)"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    out_log = os.path.join(LOG_DIR, f"{date_str}.log")
+    err_log = os.path.join(LOG_DIR, f"{date_str}.err")
+
+    cmd = ["python", "auto_run.py", date_str]
+    if WHISPER_QUEUE:
+        cmd += ["--whisper-queue", WHISPER_QUEUE]
+
+    env = os.environ.copy()
+    if slot["device"] is not None:
+        env["CUDA_VISIBLE_DEVICES"] = str(slot["device"])
+
+    mode = "w" if attempt == 1 else "a"
+    with open(out_log, mode, encoding="utf-8") as fout, open(err_log, mode, encoding="utf-8") as ferr:
+        fout.write(f"\n===== attempt {attempt} ({datetime.now().isoformat(timespec='seconds')}) =====\n")
+        fout.flush()
+        # subprocess를 써야 메모리 누수 없이 깔끔하게 돕니다.
+        proc = subprocess.Popen(cmd, stdout=fout, stderr=ferr, env=env)
+        # CPU 코어 고정은 부모에서 pid 로 (스레드 풀 안이라 preexec_fn 은 fork 후 deadlock 위험)
+        # auto_run.py 가 이후 띄우는 stage 프로세스들은 affinity 를 그대로 물려받음
+        if slot["cores"]:
+            try:
+                os.sched_setaffinity(proc.pid, slot["cores"])
+            except ProcessLookupError:
+                pass   # 이미 종료됨 (returncode 로 판정)
+        returncode = proc.wait()
+
+    return returncode == 0, tail_file(err_log, STDERR_TAIL_LINES)
+
+# ==========================================
+# 날짜 범위 실행
+# ==========================================
+def date_range(start_date, end_date):
+    start = datetime.strptime(start_date, "%Y%m%d")
+    end = datetime.strptime(end_date, "%Y%m%d")
+
     current = start
-    
     while current <= end:
-        date_str = current.strftime("%Y%m%d")
-        
-        # 1. 해당 날짜의 MP3 파일이 있는지 확인
+        yield current.strftime("%Y%m%d")
+        # 하루 더하기
+        current += timedelta(days=1)
+
+def run_range(start_date=START_DATE, end_date=END_DATE, workers=1, devices=None,
+              retries=2, state_path=STATE_FILE, retry_failed=True):
+    state = JobState(state_path)
+    slots = queue.Queue()
+    for slot in build_slots(workers, devices):
+        slots.put(slot)
+
+    todo = []
+    for date_str in date_range(start_date, end_date):
+        prev = state.get(date_str)
+        if prev.get("status") == "done":
+            continue
+        if prev.get("status") == "failed" and not retry_failed:
+            continue
+
+        # 1. 해당 날짜의 MP3 파일이 있는지 확인 (없으면 프로세스를 띄우지 않음)
         target_mp3 = os.path.join(BASE_PATH, date_str, "mp3", f"{date_str}.mp3")
-        
-        print(f"\n" + "="*50)
-        print(f"📅 Processing Date: {date_str}")
-        print(f"="*50)
+        if not os.path.exists(target_mp3):
+            print(f"⚠️  파일 없음 (Skip): {target_mp3}")
+            state.update(date_str, status="missing")
+            continue
+        todo.append(date_str)
+
+    print(f"\n📅 {len(todo)} dates to process with {workers} workers (retries: {retries})")
+
+    def process(date_str):
+        slot = slots.get()
+        try:
+            for attempt in range(1, retries + 2):
+                attempts = state.get(date_str).get("attempts", 0) + 1
+                state.update(date_str, status="running", attempts=attempts,
+                             worker=slot["id"], device=slot["device"])
+                print(f"▶ {date_str} (worker {slot['id']}, device {slot['device']}, attempt {attempt})")
 
-        if os.path.exists(target_mp3):
-            try:
                 # 2. auto_run.py 실행 (하루치 파이프라인 수행)
-                # subprocess를 써야 메모리 누수 없이 깔끔하게 돕니다.
-                subprocess.run(["python", "auto_run.py", date_str], check=True)
-                print(f"✅ {date_str} 완료!")
-                
-            except subprocess.CalledProcessError:
-                print(f"❌ {date_str} 실행 중 에러 발생! (다음 날짜로 넘어갑니다)")
-                # 에러 로그 파일에 기록
-                with open("error_log.txt", "a") as f:
-                    f.write(f"{date_str}: Pipeline Failed\n")
-        else:
-            print(f"⚠️  파일 없음 (Skip): {target_mp3}")
-        
-        # 하루 더하기
-        current += timedelta(days=1)
+                ok, err_tail = run_one(date_str, slot, attempt)
+                if ok:
+                    state.update(date_str, status="done", error_tail="")
+                    print(f"✅ {date_str} 완료!")
+                    return True
+
+                state.update(date_str, status="failed", error_tail=err_tail)
+                print(f"❌ {date_str} 실행 중 에러 발생! (attempt {attempt})")
+                if attempt <= retries:
+                    time.sleep(min(30 * attempt, 120))
+
+            # 에러 로그 파일에 기록 (stderr 마지막 부분 포함)
+            with open("error_log.txt", "a") as f:
+                f.write(f"{date_str}: Pipeline Failed\n")
+                for line in err_tail.rstrip().splitlines():
+                    f.write(f"    {line}\n")
+            return False
+        finally:
+            slots.put(slot)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(process, todo))
+
+    elapsed = time.time() - started
+    print("\n" + "=" * 50)
+    print(f"📊 Done: {sum(results)} / Failed: {len(results) - sum(results)} "
+          f"/ Elapsed: {elapsed / 60:.1f} min")
+    print(f"   State file: {state_path}")
+    print("=" * 50)
 
 if __name__ == "__main__":
-    run_range()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="날짜 범위 병렬 백필 (auto_run.py)")
+    parser.add_argument("--start", default=START_DATE, help="시작 날짜 YYYYMMDD")
+    parser.add_argument("--end", default=END_DATE, help="끝 날짜 YYYYMMDD")
+    parser.add_argument("--workers", type=int, default=1, help="동시에 처리할 날짜 수")
+    parser.add_argument("--devices", default=None, help="GPU 번호 목록 (쉼표 구분, 워커에 round-robin 배정)")
+    parser.add_argument("--retries", type=int, default=2, help="실패 시 재시도 횟수")
+    parser.add_argument("--state", default=STATE_FILE, help="작업 상태 JSON 경로")
+    parser.add_argument("--skip-failed", action="store_true", help="이전에 실패한 날짜는 다시 돌리지 않음")
+    args = parser.parse_args()
+
+    devices = [d.strip() for d in args.devices.split(",")] if args.devices else None
+    run_range(args.start, args.end, workers=max(args.workers, 1), devices=devices,
+              retries=max(args.retries, 0), state_path=args.state,
+              retry_failed=not args.skip_failed)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+파이프라인 스크립트 시작 시간 측정 (python -X importtime)
+
+각 스크립트를 `python -X importtime <script> --help` 로 실행해서
+  - wall: --help 가 끝날 때까지 걸린 시간 (= 잘못된 인자 / 파일 없음으로 종료할 때의 최소 비용)
+  - import: -X importtime 의 최상위 모듈 cumulative 합
+  - top: 가장 오래 걸린 최상위 import
+를 출력합니다. --budget-ms 를 넘는 스크립트가 있으면 exit 1 (시작 시간 회귀 감시용).
+
+Usage:
+  python bench_import_time.py [script.py ...] [--repeat 3] [--budget-ms 1500] [--csv history.csv]
+"""
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+import subprocess
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 기본 측정 대상 (CLI 진입점)
+DEFAULT_SCRIPTS = [
+    "whisper-direct.py",
+    "whisper_worker.py",
+    "diarize-direct.py",
+    "run_ina.py",
+    "auto_run.py",
+    "auto_run_range.py",
+    "ina_speech_mbc_classify.py",
+    "extract_audio_feature_diarized_csv.py",
+]
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """→ [(모듈, cumulative us)] 최상위 import 만 (들여쓰기 1칸)"""
+    top = []
+    for line in stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m and len(m.group(3)) == 1:
+            top.append((m.group(4), int(m.group(2))))
+    return top
+
+
+def measure(script, repeat=3):
+    """→ (최소 wall 초, import us 합, 상위 모듈 3개, 종료 코드)"""
+    path = os.path.join(SCRIPT_DIR, script)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", path, "--help"],
+                                cwd=SCRIPT_DIR, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if best is None or wall < best[0]:
+            top = parse_importtime(result.stderr)
+            slowest = sorted(top, key=lambda t: -t[1])[:3]
+            best = (wall, sum(us for _, us in top), slowest, result.returncode)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스크립트 시작(import) 시간 측정")
+    parser.add_argument("scripts", nargs="*", default=DEFAULT_SCRIPTS)
+    parser.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최솟값 사용)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="이 시간을 넘으면 exit 1")
+    parser.add_argument("--csv", default=None, help="결과를 누적 기록할 CSV")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'script':<40} {'wall':>8} {'import':>8}  top imports")
+    print("-" * 100)
+    for script in args.scripts:
+        if not os.path.exists(os.path.join(SCRIPT_DIR, script)):
+            print(f"{script:<40} ⚠️  not found")
+            continue
+        wall, import_us, slowest, code = measure(script, args.repeat)
+        top_str = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in slowest)
+        flag = "" if code == 0 else f"  (exit {code})"
+        print(f"{script:<40} {wall * 1000:6.0f}ms {import_us / 1000:6.0f}ms  {top_str}{flag}")
+        rows.append({"script": script, "wall_ms": round(wall * 1000, 1),
+                     "import_ms": round(import_us / 1000, 1), "exit_code": code})
+
+    if args.csv:
+        new_file = not os.path.exists(args.csv)
+        with open(args.csv, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["time", "python", "script", "wall_ms", "import_ms", "exit_code"])
+            if new_file:
+                writer.writeheader()
+            stamp = datetime.now().isoformat(timespec="seconds")
+            for row in rows:
+                writer.writerow({"time": stamp, "python": sys.version.split()[0], **row})
+        print(f"\n📂 Appended to: {args.csv}")
+
+    if args.budget_ms is not None:
+        over = [r for r in rows if r["wall_ms"] > args.budget_ms]
+        if over:
+            print(f"\n❌ Over budget ({args.budget_ms:.0f}ms): " + ", ".join(r["script"] for r in over))
+            sys.exit(1)
+        print(f"\n✅ All scripts start within {args.budget_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
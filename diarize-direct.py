@@ -1,41 +1,68 @@
-import torch
-from pyannote.audio import Pipeline
 import datetime
 import time
-import torchaudio
 import sys
 import os
+import argparse
+
+from stage_cache import get_cache
+from audio_buffer import load_pcm, PCM_DECODER
 
 # ==========================================
 # 설정
 # ==========================================
 BASE_DIR = "/mnt/home_dnlab/jhjung/radio/baechulsu"
+DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
+
+def check_audio(date_str):
+    """
+    날짜 형식 / 오디오 존재 확인 → 오디오 경로
+    torch / pyannote import (수 초) 전에 실행해서 잘못된 입력은 바로 종료
+    """
+    try:
+        datetime.datetime.strptime(date_str, "%Y%m%d")
+    except ValueError:
+        print(f"❌ Invalid date (YYYYMMDD): {date_str}")
+        sys.exit(1)
 
-def run(date_str):
     audio_file = f"{BASE_DIR}/{date_str}/mp3/{date_str}.mp3"
-    output_path = f"{BASE_DIR}/{date_str}/transcript/{date_str}_diarization.txt"
+    if not os.path.exists(audio_file):
+        print(f"❌ [{date_str}] Audio file not found: {audio_file}")
+        sys.exit(1)
+    return audio_file
+
+def run(date_str, output_path=None):
+    audio_file = check_audio(date_str)
+    output_path = output_path or f"{BASE_DIR}/{date_str}/transcript/{date_str}_diarization.txt"
 
     # 출력 폴더가 없으면 생성
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
+    # 같은 오디오 + 같은 모델/전처리면 캐시 결과 사용
+    cache = get_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key("diarize", [audio_file], model=DIARIZATION_MODEL,
+                              params={"sample_rate": 16000, "mono": True,
+                                      "decoder": PCM_DECODER})
+        if cache.restore(cache_key, [output_path]) is not None:
+            print(f"♻️  [{date_str}] Cache hit - diarization restored: {output_path}")
+            return
+
     print(f"🚀 [{date_str}] Pyannote 3.1 분석 시작...")
 
+    # 무거운 import 는 입력 확인 / 캐시 확인 이후에만
+    import torch
+    from pyannote.audio import Pipeline
+
     try:
-        pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1")
+        pipeline = Pipeline.from_pretrained(DIARIZATION_MODEL)
 
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         pipeline.to(device)
         print(f"✅ 사용 장치: {device}")
 
-        # 2. 오디오 로드 및 전처리
-        waveform, sample_rate = torchaudio.load(audio_file)
-
-        if sample_rate != 16000:
-            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
-            waveform = resampler(waveform)
-
-        if waveform.shape[0] > 1:
-            waveform = torch.mean(waveform, dim=0, keepdim=True)
+        # 2. 오디오 로드 (공유 16kHz mono PCM 을 memmap 으로 - 디코딩/리샘플링 1회)
+        waveform = torch.from_numpy(load_pcm(audio_file, 16000, writable=True)).unsqueeze(0)
 
         start_time = time.time()
 
@@ -57,13 +84,102 @@ def run(date_str):
         print(f"✨ 분석 성공! 소요시간: {end_time - start_time:.1f}초")
         print(f"📂 저장 완료: {output_path}")
 
+        if cache_key is not None:
+            cache.store(cache_key, [output_path], stage="diarize")
+
     except Exception as e:
         print(f"❌ [{date_str}] 에러 발생: {e}")
         sys.exit(1)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python diarize-direct.py <DATE>")
+def run_chunked(date_str, chunk_sec, workers=1, device=None, threads=None, output_path=None):
+    """
+    윈도우 단위 diarization (diarize_chunked.py) → 같은 형식의 결과 파일
+    한 번에 메모리에 올라가는 파형은 윈도우 1개, CPU 에서는 윈도우별 프로세스 병렬
+    """
+    from diarize_chunked import diarize_chunked, write_turns
+
+    audio_file = check_audio(date_str)
+    output_path = output_path or f"{BASE_DIR}/{date_str}/transcript/{date_str}_diarization.txt"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    cache = get_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key("diarize-chunked", [audio_file], model=DIARIZATION_MODEL,
+                              params={"sample_rate": 16000, "mono": True, "chunk_sec": chunk_sec,
+                                      "decoder": PCM_DECODER})
+        if cache.restore(cache_key, [output_path]) is not None:
+            print(f"♻️  [{date_str}] Cache hit - diarization restored: {output_path}")
+            return
+
+    print(f"🚀 [{date_str}] Pyannote 3.1 chunked 분석 시작...")
+    try:
+        start_time = time.time()
+        turns = diarize_chunked(audio_file, chunk_sec=chunk_sec, workers=workers,
+                                device=device, threads=threads)
+        write_turns(turns, output_path)
+
+        print(f"✨ 분석 성공! 소요시간: {time.time() - start_time:.1f}초")
+        print(f"📂 저장 완료: {output_path}")
+
+        if cache_key is not None:
+            cache.store(cache_key, [output_path], stage="diarize-chunked")
+
+    except Exception as e:
+        print(f"❌ [{date_str}] 에러 발생: {e}")
         sys.exit(1)
-    
-    run(sys.argv[1])
+
+def compare(date_str, chunk_sec, workers=1, device=None, threads=None, collar=0.0):
+    """
+    같은 날짜를 single-pass / chunked 로 각각 돌려서 DER 리포트 저장
+    (기존 {date}_diarization.txt 는 건드리지 않음)
+    """
+    from diarize_chunked import der_report
+
+    transcript_dir = f"{BASE_DIR}/{date_str}/transcript"
+    single_path = f"{transcript_dir}/{date_str}_diarization_single.txt"
+    chunked_path = f"{transcript_dir}/{date_str}_diarization_chunk{int(chunk_sec)}.txt"
+    report_path = f"{transcript_dir}/{date_str}_diarization_der.txt"
+
+    timings = {}
+    start_time = time.time()
+    run(date_str, output_path=single_path)
+    timings["single-pass"] = time.time() - start_time
+
+    start_time = time.time()
+    run_chunked(date_str, chunk_sec, workers=workers, device=device, threads=threads,
+                output_path=chunked_path)
+    timings[f"chunked ({chunk_sec:.0f}s x {workers} workers)"] = time.time() - start_time
+
+    report = der_report(single_path, chunked_path, collar=collar)
+    report += "\n" + "\n".join(f"   time {name}: {sec:.1f}s" for name, sec in timings.items())
+    print(report)
+
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+    print(f"📂 리포트 저장: {report_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python diarize-direct.py <DATE> [--chunk-sec 600 --workers 4] [--compare]"
+    )
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--chunk-sec", type=float, default=0,
+                        help="윈도우 길이(초). 0 이면 기존 single-pass (기본)")
+    parser.add_argument("--workers", type=int, default=1, help="chunked 모드 병렬 프로세스 수 (CPU)")
+    parser.add_argument("--device", default=None, help="cuda / cpu (기본: 자동, 병렬 워커는 cpu)")
+    parser.add_argument("--threads", type=int, default=None, help="워커당 torch 스레드 수")
+    parser.add_argument("--compare", action="store_true",
+                        help="single-pass vs chunked DER 리포트 생성 (--chunk-sec 기본 600)")
+    parser.add_argument("--collar", type=float, default=0.0, help="DER collar(초)")
+    args = parser.parse_args()
+    check_audio(args.date)
+
+    if args.compare:
+        compare(args.date, args.chunk_sec or 600.0, workers=args.workers,
+                device=args.device, threads=args.threads, collar=args.collar)
+    elif args.chunk_sec > 0:
+        run_chunked(args.date, args.chunk_sec, workers=args.workers,
+                    device=args.device, threads=args.threads)
+    else:
+        run(args.date)
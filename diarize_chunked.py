@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+윈도우(chunk) 단위 pyannote diarization + chunk 간 화자 연결
+
+1. 방송 전체를 고정 길이 윈도우로 나눠 각각 diarization (CPU 에서는 프로세스 병렬)
+   → 한 번에 메모리에 올라가는 파형은 윈도우 1개 분량
+2. 각 윈도우의 로컬 화자(SPEAKER_00 ...)마다 pyannote 가 계산한 embedding centroid 를 받아서
+3. 전체 윈도우의 centroid 를 cosine 유사도로 묶어 전역 화자 ID 를 부여
+   (같은 윈도우의 서로 다른 로컬 화자는 같은 전역 화자로 묶지 않음)
+4. diarize-direct.py 와 같은 "START= STOP= SPEAKER=" 형식으로 저장
+
+der_report() 로 single-pass 결과 대비 DER 을 계산할 수 있습니다.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_buffer import load_pcm
+
+SAMPLE_RATE = 16000
+DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
+
+# pyannote 3.1 clustering threshold (정규화 embedding 간 euclidean 0.7046) 를 cosine 유사도로 환산
+LINK_THRESHOLD = 1.0 - 0.7045654963945799 ** 2 / 2
+
+# 워커 프로세스별 pipeline (initializer 에서 1회 로드)
+_PIPELINE = None
+
+
+# ==========================================
+# 1. 윈도우 diarization
+# ==========================================
+def load_pipeline(device=None, threads=None):
+    import torch
+    from pyannote.audio import Pipeline
+
+    if threads:
+        torch.set_num_threads(threads)
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    pipeline = Pipeline.from_pretrained(DIARIZATION_MODEL)
+    pipeline.to(torch.device(device))
+    return pipeline
+
+
+def _init_worker(device, threads):
+    global _PIPELINE
+    _PIPELINE = load_pipeline(device, threads)
+
+
+def _split_output(output):
+    """pyannote 버전에 따라 (annotation, embeddings) 꺼내기"""
+    if isinstance(output, tuple):
+        return output[0], output[1]
+    return output.speaker_diarization, getattr(output, "speaker_embeddings", None)
+
+
+def diarize_window(audio_file, start_sample, stop_sample, pipeline=None):
+    """
+    [start_sample, stop_sample) 구간 diarization
+
+    Returns:
+        {"offset": 초, "turns": [(start, stop, local_label)],
+         "speakers": {local_label: {"embedding": ndarray | None, "duration": 초}}}
+    """
+    import torch
+
+    pipeline = pipeline or _PIPELINE
+    pcm = load_pcm(audio_file, SAMPLE_RATE, writable=True)
+    offset = start_sample / SAMPLE_RATE
+
+    waveform = torch.from_numpy(pcm[start_sample:stop_sample]).unsqueeze(0)
+    annotation, embeddings = _split_output(
+        pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE}, return_embeddings=True)
+    )
+
+    turns = []
+    durations = {}
+    for turn, _, speaker in annotation.itertracks(yield_label=True):
+        turns.append((turn.start + offset, turn.end + offset, speaker))
+        durations[speaker] = durations.get(speaker, 0.0) + (turn.end - turn.start)
+
+    speakers = {}
+    for i, label in enumerate(annotation.labels()):
+        emb = None
+        if embeddings is not None and i < len(embeddings):
+            emb = np.asarray(embeddings[i], dtype=np.float32)
+            if not np.all(np.isfinite(emb)):
+                emb = None
+        speakers[label] = {"embedding": emb, "duration": durations.get(label, 0.0)}
+
+    return {"offset": offset, "turns": turns, "speakers": speakers}
+
+
+# ==========================================
+# 2. chunk 간 화자 연결
+# ==========================================
+def link_speakers(windows, threshold=LINK_THRESHOLD):
+    """
+    로컬 화자 centroid 를 전역 화자로 묶기 (발화량 많은 순서로 greedy 할당)
+
+    - 가장 가까운 전역 centroid 와의 cosine 유사도가 threshold 이상이면 합류
+    - 단, 같은 윈도우의 다른 로컬 화자가 이미 들어간 전역 화자에는 합류 불가
+    - 전역 centroid 는 발화 시간 가중 평균
+
+    Returns:
+        {(window_idx, local_label): global_idx}
+    """
+    locals_ = []
+    for w_idx, window in enumerate(windows):
+        for label, info in window["speakers"].items():
+            locals_.append((info["duration"], w_idx, label, info["embedding"]))
+    locals_.sort(key=lambda x: -x[0])
+
+    centroid_sums = []     # 전역 화자별 가중합 (embedding 없는 화자는 None)
+    members = []           # 전역 화자별 포함된 윈도우 집합
+    mapping = {}
+
+    for duration, w_idx, label, emb in locals_:
+        unit = None if emb is None else emb / (np.linalg.norm(emb) + 1e-12)
+
+        best = None
+        candidates = [g for g, c in enumerate(centroid_sums) if c is not None]
+        if unit is not None and candidates:
+            sums = np.stack([centroid_sums[g] for g in candidates])
+            sims = sums @ unit / (np.linalg.norm(sums, axis=1) + 1e-12)
+            for i in np.argsort(-sims):
+                if sims[i] < threshold:
+                    break
+                if w_idx not in members[candidates[i]]:
+                    best = candidates[i]
+                    break
+
+        if best is None:
+            centroid_sums.append(None)
+            members.append(set())
+            best = len(centroid_sums) - 1
+
+        if unit is not None:
+            weighted = unit * max(duration, 1e-3)
+            centroid_sums[best] = weighted if centroid_sums[best] is None else centroid_sums[best] + weighted
+        members[best].add(w_idx)
+        mapping[(w_idx, label)] = best
+
+    return mapping
+
+
+def merge_turns(windows, mapping):
+    """
+    전역 화자 ID 로 바꾼 turn 목록 (시간순)
+    전역 라벨은 처음 등장한 순서대로 SPEAKER_00, SPEAKER_01 ...
+    윈도우 경계에서 잘린 같은 화자의 turn 은 다시 이어 붙임
+    """
+    turns = []
+    for w_idx, window in enumerate(windows):
+        for start, stop, label in window["turns"]:
+            turns.append((start, stop, mapping[(w_idx, label)]))
+    turns.sort(key=lambda t: (t[0], t[1]))
+
+    boundaries = {round(w["offset"], 6) for w in windows}
+    names = {}
+    merged = []
+    open_by_speaker = {}
+    for start, stop, g in turns:
+        name = names.setdefault(g, f"SPEAKER_{len(names):02d}")
+        prev = open_by_speaker.get(name)
+        if prev is not None and abs(prev[1] - start) < 1e-3 and round(start, 6) in boundaries:
+            prev[1] = max(prev[1], stop)
+            continue
+        item = [start, stop, name]
+        merged.append(item)
+        open_by_speaker[name] = item
+    return [tuple(t) for t in merged]
+
+
+# ==========================================
+# 3. 실행
+# ==========================================
+def diarize_chunked(audio_file, chunk_sec=600.0, workers=1, device=None, threads=None,
+                    threshold=LINK_THRESHOLD):
+    """
+    Returns:
+        [(start, stop, "SPEAKER_xx"), ...]
+    """
+    total = len(load_pcm(audio_file, SAMPLE_RATE))
+    step = int(chunk_sec * SAMPLE_RATE)
+    spans = [(s, min(s + step, total)) for s in range(0, total, step)]
+    # 너무 짧은 마지막 조각은 앞 윈도우에 붙임
+    if len(spans) > 1 and spans[-1][1] - spans[-1][0] < step // 4:
+        spans[-2] = (spans[-2][0], spans[-1][1])
+        spans.pop()
+
+    print(f"🧩 {len(spans)} windows of {chunk_sec:.0f}s ({workers} workers)")
+    started = time.time()
+
+    if workers <= 1:
+        pipeline = load_pipeline(device, threads)
+        windows = []
+        for i, (s, e) in enumerate(spans):
+            windows.append(diarize_window(audio_file, s, e, pipeline=pipeline))
+            print(f"   ✅ window {i + 1}/{len(spans)} ({len(windows[-1]['speakers'])} local speakers)")
+    else:
+        import multiprocessing as mp
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(device or "cpu", threads)) as pool:
+            futures = [pool.submit(diarize_window, audio_file, s, e) for s, e in spans]
+            windows = [f.result() for f in futures]
+
+    mapping = link_speakers(windows, threshold)
+    turns = merge_turns(windows, mapping)
+
+    n_global = len({t[2] for t in turns})
+    n_local = sum(len(w["speakers"]) for w in windows)
+    print(f"🔗 Linked {n_local} local speakers → {n_global} speakers in {time.time() - started:.1f}s")
+    return turns
+
+
+def write_turns(turns, output_path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        for start, stop, speaker in turns:
+            f.write(f"START={start:.2f} STOP={stop:.2f} SPEAKER={speaker}\n")
+
+
+# ==========================================
+# 4. DER 비교 리포트
+# ==========================================
+def read_annotation(path):
+    import re
+    from pyannote.core import Annotation, Segment
+
+    pattern = re.compile(r"START=(\d+\.\d+) STOP=(\d+\.\d+) SPEAKER=(\S+)")
+    annotation = Annotation()
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            m = pattern.search(line)
+            if m:
+                annotation[Segment(float(m.group(1)), float(m.group(2))), i] = m.group(3)
+    return annotation
+
+
+def der_report(reference_path, hypothesis_path, collar=0.0):
+    """
+    reference (single-pass) 대비 hypothesis (chunked) DER 리포트 문자열 반환
+    화자 라벨은 최적 매핑 후 비교되므로 SPEAKER 번호가 달라도 됩니다.
+    """
+    from pyannote.metrics.diarization import DiarizationErrorRate
+
+    reference = read_annotation(reference_path)
+    hypothesis = read_annotation(hypothesis_path)
+
+    metric = DiarizationErrorRate(collar=collar, skip_overlap=False)
+    details = metric(reference, hypothesis, detailed=True)
+    total = details["total"] or 1e-9
+
+    lines = [
+        "📏 DER report (chunked vs single-pass)",
+        f"   reference : {reference_path} ({len(reference.labels())} speakers)",
+        f"   hypothesis: {hypothesis_path} ({len(hypothesis.labels())} speakers)",
+        f"   collar    : {collar}s",
+        f"   DER       : {details['diarization error rate'] * 100:.2f}%",
+        f"     - confusion   : {details['confusion'] / total * 100:.2f}%",
+        f"     - missed      : {details['missed detection'] / total * 100:.2f}%",
+        f"     - false alarm : {details['false alarm'] / total * 100:.2f}%",
+        f"   speech total: {details['total']:.1f}s",
+    ]
+    return "\n".join(lines)
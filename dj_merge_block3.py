@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 import pandas as pd
+import numpy as np
 import re
 import sys
 import os
+import argparse
+
+from speaker_matrix import load_for_csv
+
+# extract_speakers 와 같은 규칙 (";" 로 나눈 조각의 앞 공백 제거 후 "SPEAKER_xx:")
+SPEAKER_PATTERN = r"(?:^|;)\s*(SPEAKER_\d+):"
 
 ############################################
 # 유틸
@@ -65,7 +72,7 @@ def decide_block_type(rows, speaker_role_map):
     return "AD"
 
 ############################################
-# Block Merge
+# Block Merge (legacy: 행 단위 iterrows)
 ############################################
 def merge_blocks(df, speaker_role_map):
     blocks = []
@@ -149,15 +156,179 @@ def merge_consecutive_same_blocks(blocks_df):
     merged.append(current)
     return pd.DataFrame(merged)
 
+############################################
+# Run-length 블록 엔진 (행마다 Series 를 만들지 않음)
+############################################
+def row_speakers(df, rows, matrix=None):
+    """rows 위치의 Speakers → (행 위치, 화자) DataFrame (matrix 가 있으면 텍스트 파싱 없이)"""
+    if matrix is not None:
+        pair_rows, pair_speakers = matrix.take(rows).speaker_pairs()
+        return pd.DataFrame({"row": rows[pair_rows], "speaker": pair_speakers.astype(object)})
+    empty = pd.DataFrame({"row": np.array([], dtype=np.int64), "speaker": []})
+    if "Speakers" not in df.columns or pd.api.types.is_numeric_dtype(df["Speakers"]):
+        return empty
+    found = df["Speakers"].iloc[rows].reset_index(drop=True).str.extractall(SPEAKER_PATTERN)
+    if found.empty:
+        return empty
+    return pd.DataFrame({"row": rows[found.index.get_level_values(0)],
+                         "speaker": found[0].to_numpy()})
+
+def merge_blocks_runlength(df, speaker_role_map, matrix=None):
+    """
+    merge_blocks 와 같은 결과 (matrix: df 와 같은 행 순서의 SpeakerMatrix, 없으면 텍스트 파싱)
+      - silence 가 아닌 행마다 run id: Type 이 바로 앞 행과 다르면 새 블록 (앞 행이 silence 인 경우 포함)
+      - 블록 안의 행은 모두 같은 Type → decide_block_type 입력을 블록 단위 배열로 계산
+    """
+    types = df["Type"].reset_index(drop=True)
+    keep = (types != "silence").to_numpy()
+    if not keep.any():
+        return pd.DataFrame()
+
+    rows = np.flatnonzero(keep)
+    new_block = types.ne(types.shift()).to_numpy()[rows]
+    block_of = np.cumsum(new_block) - 1
+    n_blocks = int(block_of[-1]) + 1
+    starts = np.flatnonzero(new_block)
+    first = rows[starts]
+    last = rows[np.append(starts[1:] - 1, len(rows) - 1)]
+    block_type_in = types.to_numpy()[first]
+
+    # 길이 합: 행 순서대로 더해야 sum() 과 같은 값 (groupby.sum 은 보정 합산이라 끝자리가 다를 수 있음)
+    durations = df["Duration"].to_numpy()[rows]
+    total = np.zeros(n_blocks, dtype=durations.dtype)
+    np.add.at(total, block_of, durations)
+    is_music = np.asarray(block_type_in == "music", dtype=bool)
+    is_speech = np.asarray(block_type_in == "speech", dtype=bool)
+    music_dur = np.where(is_music, total, 0.0)
+    speech_dur = np.where(is_speech, total, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        music_ratio = music_dur / np.maximum(total, 1e-6)
+
+    # 화자: 블록 전체 (speakers 컬럼) / speech 블록만 (역할 판정)
+    pairs = row_speakers(df, rows, matrix)
+    block_pos = np.empty(len(types), dtype=np.int64)
+    block_pos[rows] = block_of
+    pairs = (pairs.assign(block=block_pos[pairs["row"].to_numpy()])
+             .drop_duplicates(["block", "speaker"])
+             .sort_values(["block", "speaker"], kind="stable"))
+    speaker_lists = [[] for _ in range(n_blocks)]
+    for block, speaker in zip(pairs["block"].tolist(), pairs["speaker"].tolist()):
+        speaker_lists[block].append(speaker)
+
+    roles = pairs[is_speech[pairs["block"].to_numpy()]]
+    roles = roles.assign(role=roles["speaker"].map(lambda s: speaker_role_map.get(s, "MINOR")))
+    has_role = {}
+    for role in ("DJ", "GUEST", "AD_SPEAKER"):
+        flag = np.zeros(n_blocks, dtype=bool)
+        flag[roles.loc[roles["role"] == role, "block"].to_numpy()] = True
+        has_role[role] = flag
+
+    block_type = np.select(
+        [(music_dur >= 60) | (music_ratio >= 0.7),
+         has_role["GUEST"],
+         has_role["DJ"],
+         has_role["AD_SPEAKER"] | (speech_dur > 0),
+         (speech_dur == 0) & (music_dur > 0)],
+        ["MUSIC", "GUEST", "DJ", "AD", "MUSIC"],
+        default="AD",
+    )
+
+    # 텍스트: speech 행 중 Transcript 가 문자열인 것만
+    transcripts = df["Transcript"].to_numpy()[rows]
+    has_text = is_speech[block_of] & np.fromiter((isinstance(t, str) for t in transcripts),
+                                                 dtype=bool, count=len(rows))
+    parts = [[] for _ in range(n_blocks)]
+    for block, transcript in zip(block_of[has_text].tolist(), transcripts[has_text].tolist()):
+        parts[block].append(transcript)
+
+    return pd.DataFrame({
+        "block_type": block_type.astype(object),
+        "start": df["Start Time"].to_numpy()[first],
+        "end": df["Stop Time"].to_numpy()[last],
+        "duration": [round(d, 2) for d in total.tolist()],
+        "segments": np.bincount(block_of, minlength=n_blocks),
+        "speaker_count": [len(names) for names in speaker_lists],
+        "speakers": [",".join(names) for names in speaker_lists],
+        "text": [" ".join(texts) for texts in parts],
+    })
+
+def coalesce_blocks(blocks_df):
+    """
+    merge_consecutive_same_blocks 와 같은 결과 (두 번째 run-length 패스)
+    합쳐진 블록: duration = round(end - start, 2), 화자 합집합, 텍스트는 앞에서부터 이어 붙임
+    """
+    if len(blocks_df) == 0:
+        return blocks_df
+
+    block_type = blocks_df["block_type"]
+    new_run = block_type.ne(block_type.shift()).to_numpy()
+    run_of = np.cumsum(new_run) - 1
+    lo_all = np.flatnonzero(new_run)
+    hi_all = np.append(lo_all[1:] - 1, len(blocks_df) - 1)
+    size = hi_all - lo_all + 1
+    merged = size > 1
+
+    start = blocks_df["start"].to_numpy()[lo_all]
+    end = blocks_df["end"].to_numpy()[hi_all]
+    # 합쳐진 블록은 numpy 스칼라 (iloc 행) 끼리 계산되던 값 → np.round 와 같음
+    duration = np.where(merged, np.round(end - start, 2), blocks_df["duration"].to_numpy()[lo_all])
+    out = pd.DataFrame({
+        "block_type": block_type.to_numpy()[lo_all],
+        "start": start,
+        "end": end,
+        "duration": duration,
+        "segments": blocks_df.groupby(run_of, sort=False)["segments"].sum().to_numpy(),
+    })
+
+    speakers = blocks_df["speakers"].tolist()
+    texts = blocks_df["text"].tolist()
+    speaker_sets, joined_text = [], []
+    for lo, n in zip((np.cumsum(size) - size).tolist(), size.tolist()):
+        if n == 1:
+            speaker_sets.append(speakers[lo])
+            joined_text.append(texts[lo])
+            continue
+        names = set()
+        for value in speakers[lo:lo + n]:
+            if value:
+                names |= set(value.split(","))
+        current = texts[lo]
+        for value in texts[lo + 1:lo + n]:
+            if value:
+                current = (current + " " + value).strip()
+        speaker_sets.append(",".join(sorted(names)))
+        joined_text.append(current)
+
+    counts = blocks_df["speaker_count"].to_numpy()[lo_all]
+    out["speaker_count"] = [c if n == 1 else (len(s.split(",")) if s else 0)
+                            for c, n, s in zip(counts, size, speaker_sets)]
+    out["speakers"] = speaker_sets
+    out["text"] = joined_text
+    return out
+
+def build_blocks(df, speaker_role_map, legacy=False, matrix=None):
+    """세그먼트 DataFrame + Speaker → Role 맵 → 블록 DataFrame (-blocks.csv 내용)"""
+    print("🧱 Merging blocks (simplified: AD/MUSIC/DJ/GUEST)...")
+    if legacy:
+        blocks = merge_blocks(df, speaker_role_map)
+    else:
+        blocks = merge_blocks_runlength(df, speaker_role_map, matrix=matrix)
+
+    print("🔗 Merging consecutive same-type blocks...")
+    if legacy:
+        return merge_consecutive_same_blocks(blocks)
+    return coalesce_blocks(blocks)
+
 ############################################
 # MAIN
 ############################################
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python dj_merge_block3.py <YYYYMMDD>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python dj_merge_block3.py <YYYYMMDD> [--legacy]")
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--legacy", action="store_true", help="기존 iterrows 블록 병합 (비교용)")
+    args = parser.parse_args()
 
-    date = sys.argv[1]
+    date = args.date
     base_dir = f"/mnt/home_dnlab/jhjung/radio/baechulsu/{date}/transcript"
 
     input_csv = os.path.join(base_dir, f"{date}_with_speaker_ratio.csv")
@@ -181,11 +352,8 @@ def main():
     # Speaker → Role 맵
     speaker_role_map = dict(zip(dj_df["Speaker"], dj_df["Role"]))
 
-    print("🧱 Merging blocks (simplified: AD/MUSIC/DJ/GUEST)...")
-    blocks = merge_blocks(df, speaker_role_map)
-
-    print("🔗 Merging consecutive same-type blocks...")
-    blocks = merge_consecutive_same_blocks(blocks)
+    matrix = load_for_csv(input_csv, len(df))
+    blocks = build_blocks(df, speaker_role_map, legacy=args.legacy, matrix=matrix)
 
     blocks.to_csv(output_csv, index=False, encoding="utf-8-sig")
 
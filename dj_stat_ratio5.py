@@ -1,43 +1,37 @@
+import numpy as np
 import pandas as pd
 import re
 import sys
 import os
+import argparse
+
+from speaker_matrix import load_for_csv
 
 def get_dominant_speaker(speaker_str):
     if not isinstance(speaker_str, str): return None
     m = re.search(r"(SPEAKER_\d+)", speaker_str)
     return m.group(1) if m else None
 
-def calculate_stats_multi_guest(df):
-    """
-    다중 게스트 지원 로직 (V3):
-    1. 발화량 1위 = DJ
-    2. DJ 제외 Interaction 1위(Top Guest)를 찾음
-    3. Top Guest의 20% 이상 활동했으면 서브 게스트로 인정
-    4. [안전장치] 비율과 상관없이 Interaction이 15회 이상이면 무조건 게스트
-    """
+# ==========================================
+# 화자별 발화량 / DJ Interaction — 기존 row 단위 처리 (--legacy, 결과 비교용)
+# ==========================================
+def speaker_durations_legacy(df):
     # 1. Dominant Speaker 추출
     df['Dominant_Speaker'] = df.apply(
         lambda row: get_dominant_speaker(row.get('Speakers', '')) if row['Type'] == 'speech' else None,
         axis=1
     )
     
-    # 2. 발화량으로 DJ 선정
+    # 2. 발화량 집계
     duration_stats = {}
     for _, row in df.iterrows():
         if row['Type'] != 'speech': continue
         spk = row['Dominant_Speaker']
         if spk:
             duration_stats[spk] = duration_stats.get(spk, 0.0) + row['Duration']
-            
-    if not duration_stats: return pd.DataFrame()
-    
-    sorted_durations = sorted(duration_stats.items(), key=lambda x: x[1], reverse=True)
-    dj_id = sorted_durations[0][0]
-    dj_duration = sorted_durations[0][1]
-    print(f"👑 DJ Identified: {dj_id} (Duration: {dj_duration:.1f}s)")
-    
-    # 3. DJ와의 Interaction 카운트
+    return duration_stats
+
+def interaction_counts_legacy(df, duration_stats, dj_id):
     speaker_indices = {spk: [] for spk in duration_stats.keys()}
     for idx, row in df.iterrows():
         if row['Type'] != 'speech': continue
@@ -62,6 +56,103 @@ def calculate_stats_multi_guest(df):
                         count += 1
                         break
         interaction_counts[spk] = count
+    return interaction_counts
+
+# ==========================================
+# 화자별 발화량 / DJ Interaction — 컬럼 단위 처리 (기본)
+# ==========================================
+NEIGHBOR_OFFSETS = (-3, -2, -1, 1, 2, 3)
+
+def speaker_durations_columnar(df, matrix=None):
+    """
+    → (duration_stats, codes)
+    duration_stats: {speaker: 발화 시간} (처음 등장한 순서 — legacy dict 와 같은 순서)
+    codes:          행별 Dominant_Speaker 번호 (duration_stats 순서, 없으면 -1)
+    matrix:         SpeakerMatrix (있으면 Speakers 텍스트 파싱 대신 사용)
+    """
+    is_speech = df['Type'].eq('speech').to_numpy()
+    if matrix is not None:
+        dominant = pd.Series(matrix.dominant_speaker(), index=df.index, dtype='string')
+    elif 'Speakers' in df.columns:
+        # 정규식 search 1회 (문자열이 아닌 값은 NA → 매칭 없음)
+        dominant = df['Speakers'].astype('string').str.extract(r"(SPEAKER_\d+)", expand=False)
+    else:
+        dominant = pd.Series(pd.NA, index=df.index, dtype='string')
+    dominant = dominant.where(is_speech)
+    df['Dominant_Speaker'] = dominant.astype(object).where(dominant.notna(), None)
+
+    codes, speakers = pd.factorize(dominant, sort=False)
+    # groupby().sum() 은 보정 합(Kahan)이라 마지막 자리가 달라질 수 있음
+    # → 행 순서대로 더하는 np.add.at 으로 기존 누적 합과 bit 단위로 같게
+    sums = np.zeros(len(speakers))
+    valid = codes >= 0
+    np.add.at(sums, codes[valid], df['Duration'].to_numpy(dtype=float)[valid])
+    return dict(zip(speakers, sums.tolist())), codes
+
+def interaction_counts_columnar(codes, duration_stats, dj_id):
+    """앞뒤 3칸 안에 DJ 가 있는 speech 행 수 (shift 한 bool 배열 OR)"""
+    speakers = list(duration_stats.keys())
+    dj_code = speakers.index(dj_id)
+    is_dj = codes == dj_code
+
+    n = len(codes)
+    near_dj = np.zeros(n, dtype=bool)
+    for offset in NEIGHBOR_OFFSETS:
+        if abs(offset) >= n:
+            continue
+        if offset < 0:
+            near_dj[-offset:] |= is_dj[:n + offset]
+        else:
+            near_dj[:n - offset] |= is_dj[offset:]
+
+    hits = codes[(codes >= 0) & near_dj]
+    counts = np.bincount(hits, minlength=len(speakers))
+    return {spk: (0 if spk == dj_id else int(counts[i])) for i, spk in enumerate(speakers)}
+
+def calculate_stats_multi_guest(df, known_roles=None, legacy=False, matrix=None):
+    """
+    다중 게스트 지원 로직 (V3):
+    1. 발화량 1위 = DJ
+    2. DJ 제외 Interaction 1위(Top Guest)를 찾음
+    3. Top Guest의 20% 이상 활동했으면 서브 게스트로 인정
+    4. [안전장치] 비율과 상관없이 Interaction이 15회 이상이면 무조건 게스트
+
+    known_roles: {speaker: "DJ" | "GUEST" | "AD_SPEAKER"} (speaker_index.py 조회 결과)
+                 있으면 DJ / 게스트 / 광고 목소리는 추측 대신 인덱스 역할을 사용
+    legacy:      기존 iterrows / iloc 경로 (결과 비교용)
+                 기존 코드는 index 값을 위치로 쓰므로 RangeIndex 가 아니면 자동으로 legacy
+    matrix:      SpeakerMatrix (df 와 같은 행 순서, 컬럼 경로에서만 사용)
+    """
+    known_roles = known_roles or {}
+    range_index = isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1
+    legacy = legacy or not range_index
+
+    # 1~2. Dominant Speaker 추출 + 발화량 집계
+    if legacy:
+        duration_stats = speaker_durations_legacy(df)
+    else:
+        duration_stats, codes = speaker_durations_columnar(df, matrix=matrix)
+            
+    if not duration_stats: return pd.DataFrame()
+    
+    # 발화량으로 DJ 선정
+    sorted_durations = sorted(duration_stats.items(), key=lambda x: x[1], reverse=True)
+    dj_id = sorted_durations[0][0]
+    dj_duration = sorted_durations[0][1]
+
+    # 인덱스에서 DJ 목소리로 찾은 화자가 있으면 그 중 발화량 1위
+    known_dj = [(spk, dur) for spk, dur in sorted_durations if known_roles.get(spk) == "DJ"]
+    if known_dj:
+        dj_id, dj_duration = known_dj[0]
+        print(f"👑 DJ Identified: {dj_id} (Duration: {dj_duration:.1f}s, matched in speaker index)")
+    else:
+        print(f"👑 DJ Identified: {dj_id} (Duration: {dj_duration:.1f}s)")
+    
+    # 3. DJ와의 Interaction 카운트
+    if legacy:
+        interaction_counts = interaction_counts_legacy(df, duration_stats, dj_id)
+    else:
+        interaction_counts = interaction_counts_columnar(codes, duration_stats, dj_id)
 
     # 4. 게스트 판별 (핵심 로직 개선)
     candidates = [(spk, cnt) for spk, cnt in interaction_counts.items() if spk != dj_id]
@@ -91,7 +182,13 @@ def calculate_stats_multi_guest(df):
             is_guest = False
             reason = ""
             
-            if cnt >= FREE_PASS_THRESHOLD:
+            known = known_roles.get(spk)
+            if known == "GUEST":
+                is_guest = True
+                reason = "Known Guest (speaker index)"
+            elif known in ("AD_SPEAKER", "DJ"):
+                reason = f"Known {known} (speaker index)"
+            elif cnt >= FREE_PASS_THRESHOLD:
                 is_guest = True
                 reason = "High Interaction (Free Pass)"
             elif cnt >= cutoff_value:
@@ -101,13 +198,16 @@ def calculate_stats_multi_guest(df):
             if is_guest:
                 guest_list.append(spk)
                 print(f"   ✅ GUEST: {spk:<12} | {cnt:>3} interactions | {reason}")
+            elif known == "DJ":
+                print(f"   👑 DJ   : {spk:<12} | {cnt:>3} interactions | {reason}")
             else:
-                print(f"   ❌ AD   : {spk:<12} | {cnt:>3} interactions | Too low")
+                print(f"   ❌ AD   : {spk:<12} | {cnt:>3} interactions | {reason or 'Too low'}")
     
     # 5. 결과 생성
     results = []
     for spk, total_dur in sorted_durations:
-        if spk == dj_id:
+        if spk == dj_id or known_roles.get(spk) == "DJ":
+            # 인덱스상 DJ 목소리인데 diarization 이 따로 나눈 화자도 DJ
             role = "DJ"
         elif spk in guest_list:
             role = "GUEST"
@@ -127,15 +227,46 @@ def calculate_stats_multi_guest(df):
     
     return pd.DataFrame(results)
 
+def build_stats(df, date=None, index_path=None, legacy=False, matrix=None):
+    """
+    화자 통계 DataFrame (-dj_stats.csv 내용) → (stats_df, speakers)
+    index_path 가 있으면 speaker_index 조회 결과(Voice_ID / Match_Sim / Known_Role)를 붙임
+    speakers 는 --update-index 때 재사용할 오늘 화자 embedding (인덱스 없으면 None)
+    matrix 는 merge 가 같이 저장한 SpeakerMatrix (없으면 Speakers 텍스트 파싱)
+
+    df 는 복사해서 사용 (Dominant_Speaker 컬럼이 호출한 쪽 DataFrame 에 남지 않도록)
+    """
+    known_df, speakers = None, None
+    if index_path:
+        from speaker_index import known_roles
+        print(f"📚 Looking up speakers in {index_path}...")
+        known_df, speakers = known_roles(date, index_path=index_path)
+        matched = known_df[known_df["Known_Role"] != ""]
+        print(f"   {len(matched)}/{len(known_df)} speakers matched known voices")
+
+    print("📊 Analysis: Multi-Guest Support Logic (V3)")
+    roles = None if known_df is None else dict(zip(known_df["Speaker"], known_df["Known_Role"]))
+    stats_df = calculate_stats_multi_guest(df.copy(), known_roles=roles, legacy=legacy, matrix=matrix)
+
+    if known_df is not None and not stats_df.empty:
+        stats_df = stats_df.merge(known_df, on="Speaker", how="left")
+    return stats_df, speakers
+
 # ==========================================
 # MAIN
 # ==========================================
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python dj_stat_interaction.py <YYYYMMDD>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python dj_stat_ratio5.py <YYYYMMDD> [--index speaker_index.npz] [--update-index] [--legacy]")
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--index", default=None,
+                        help="speaker_index.py 인덱스 — 알려진 DJ/게스트/광고 목소리는 lookup 으로 판별")
+    parser.add_argument("--update-index", action="store_true",
+                        help="판별 결과 역할과 함께 오늘 화자들을 인덱스에 추가")
+    parser.add_argument("--legacy", action="store_true",
+                        help="기존 iterrows 경로로 실행 (컬럼 처리 결과와 diff 용)")
+    args = parser.parse_args()
 
-    date = sys.argv[1]
+    date = args.date
     # ★ 본인 경로에 맞게 수정 ★
     base_dir = f"/mnt/home_dnlab/jhjung/radio/baechulsu/{date}/transcript"
 
@@ -148,10 +279,12 @@ def main():
 
     print(f"📥 Loading {input_csv}...")
     df = pd.read_csv(input_csv)
+    matrix = load_for_csv(input_csv, len(df))
+    if matrix is not None:
+        print(f"📥 Using speaker matrix: {len(matrix.data)} overlaps")
+
+    stats_df, speakers = build_stats(df, date, index_path=args.index, legacy=args.legacy, matrix=matrix)
 
-    print("📊 Analysis: Multi-Guest Support Logic (V3)")
-    stats_df = calculate_stats_multi_guest(df)
-    
     print("\n" + "="*70)
     print(stats_df.head(15).to_string(index=False)) # 상위 15명만 출력
     print("="*70)
@@ -159,5 +292,9 @@ def main():
     stats_df.to_csv(output_csv, index=False)
     print(f"\n💾 Saved to {output_csv}")
 
+    if args.update_index:
+        from speaker_index import INDEX_PATH, add_day
+        add_day(date, index_path=args.index or INDEX_PATH, speakers=speakers)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,15 @@
 import os
 import csv
 import json
+import time
 import argparse
 import librosa
 import numpy as np
 from tqdm import tqdm
 
+from audio_buffer import load_pcm
+from feature_store import write_store, store_path
+
 def extract_features(y, sr):
     if len(y) < 512:
         return [0.0] * 31
@@ -32,8 +36,151 @@ def sliding_window_from_buffer(y_sub, sr, window_sec=1.0):
         all_features.append(extract_features(window, sr))
     return all_features
 
+# ==========================================
+# 배치 엔진: 1초 윈도우 여러 개를 (B, win_len) 로 쌓아서 STFT 1번
+# ==========================================
+BATCH_WINDOWS = 64    # 배치당 윈도우 수 (float64 스펙트로그램 ≈ B × 1025 × 32 × 8 bytes)
+
+def extract_features_batch(Y, sr):
+    """
+    extract_features() 의 배치 버전 — Y: (B, win_len) float32 → (B, 31)
+
+    윈도우마다 librosa 호출 5번(각자 STFT)을 하던 것을
+    |STFT| 1번 → centroid / bandwidth / flatness (frame 별 NumPy 합), mel (S=|STFT|²) → MFCC 로 재사용.
+    rms / zcr 는 원래대로 시간 영역에서 계산 (배치 축 그대로).
+    power_to_db 의 top_db 는 윈도우별 최댓값 기준이어야 하므로 직접 계산.
+    """
+    S = np.abs(librosa.stft(Y, n_fft=2048, hop_length=512))            # (B, 1025, T)
+
+    rms = librosa.feature.rms(y=Y).mean(axis=(-2, -1))
+    zcr = librosa.feature.zero_crossing_rate(y=Y).mean(axis=(-2, -1))
+
+    # centroid / bandwidth / flatness: librosa 와 같은 정의를 frame 별 NumPy 합으로
+    #   centroid  = Σ f·S / Σ S
+    #   bandwidth = sqrt(Σ S·(f - centroid)² / Σ S) = sqrt(Σ f²·S / Σ S - centroid²)
+    #   flatness  = gmean(max(amin, S²)) / amean(max(amin, S²))
+    #   (bandwidth 식의 뺄셈 정밀도 때문에 합은 float64)
+    S64 = S.astype(np.float64)
+    freq = librosa.fft_frequencies(sr=sr, n_fft=2048)
+    m0 = np.einsum("bft->bt", S64)
+    m1 = np.einsum("f,bft->bt", freq, S64)
+    m2 = np.einsum("f,bft->bt", freq ** 2, S64)
+    valid = m0 > 0   # 완전 무음 frame 은 librosa 처럼 0
+    safe = np.where(valid, m0, 1.0)
+    centroid_t = np.where(valid, m1 / safe, 0.0)
+    bandwidth_t = np.where(valid, np.sqrt(np.maximum(m2 / safe - centroid_t ** 2, 0.0)), 0.0)
+
+    power = np.maximum(1e-10, S64 ** 2)
+    flatness_t = np.exp(np.mean(np.log(power), axis=-2)) / np.mean(power, axis=-2)
+
+    centroid = centroid_t.mean(axis=-1)
+    bandwidth = bandwidth_t.mean(axis=-1)
+    flatness = flatness_t.mean(axis=-1)
+
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+    log_mel = 10.0 * np.log10(np.maximum(1e-10, mel))
+    log_mel = np.maximum(log_mel, log_mel.max(axis=(-2, -1), keepdims=True) - 80.0)
+    mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=13)                  # (B, 13, T)
+
+    return np.column_stack([
+        rms, zcr, centroid, bandwidth, flatness,
+        mfcc.mean(axis=-1), mfcc.std(axis=-1),
+    ])
+
+def segment_windows(n_samples, win_len):
+    """sliding_window_from_buffer 와 같은 윈도우 시작 위치 (짧은 구간은 None = 구간 전체 1개)"""
+    if n_samples <= win_len:
+        return None
+    return range(0, n_samples - win_len + 1, win_len)
+
+def batch_features(y_full, segments, sr, window_sec=1.0, batch_windows=BATCH_WINDOWS):
+    """
+    segments: [(start_idx, stop_idx)] → 구간별 윈도우 feature 리스트 (sliding_window_from_buffer 와 같은 모양)
+    """
+    win_len = int(window_sec * sr)
+    results = [None] * len(segments)
+    jobs = []   # (구간 번호, 윈도우 시작 샘플)
+
+    for i, (a, b) in enumerate(segments):
+        y_sub = y_full[a:b]
+        starts = segment_windows(len(y_sub), win_len)
+        if starts is None:
+            results[i] = [extract_features(y_sub, sr)]
+        else:
+            results[i] = []
+            jobs.extend((i, a + s) for s in starts)
+
+    for k in range(0, len(jobs), batch_windows):
+        batch = jobs[k:k + batch_windows]
+        Y = np.stack([y_full[p:p + win_len] for _, p in batch]).astype(np.float32)
+        try:
+            feats = extract_features_batch(Y, sr).tolist()
+        except Exception:
+            # 배치 실패 시 윈도우별 기존 경로 (실패 윈도우는 기존처럼 0.0)
+            feats = [extract_features(y, sr) for y in Y]
+        for (i, _), f in zip(batch, feats):
+            results[i].append(f)
+
+    return results
+
+def read_segments(csv_file):
+    """CSV → [(start_sec, stop_sec, row)] ('Start Time' / 'Stop Time' 없는 행 제외)"""
+    rows = []
+    # encoding='utf-8-sig'를 사용하여 BOM 문제를 해결하고, 
+    # strip()을 통해 컬럼명 공백 문제를 방지합니다.
+    with open(csv_file, "r", encoding="utf-8-sig") as f:
+        # 컬럼명의 공백을 자동으로 제거하도록 설정
+        reader = csv.DictReader(f)
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        for row in reader:
+            st = row.get("Start Time")
+            et = row.get("Stop Time")
+            if st is None or et is None: continue
+            try:
+                rows.append((float(st), float(et), row))
+            except ValueError:
+                continue
+    return rows
+
+def make_record(date_str, start_sec, stop_sec, row, features):
+    return {
+        "date": date_str,
+        "start": start_sec,
+        "stop": stop_sec,
+        "type": row.get("Type", ""),
+        "speaker": row.get("Speaker", ""),
+        "transcript": row.get("Transcript"),
+        "audio_features": features
+    }
+
+def features_batched(date_str, y_full, sr, rows):
+    """배치 엔진 → JSONL 레코드 리스트"""
+    spans, kept = [], []
+    for start_sec, stop_sec, row in rows:
+        a, b = int(start_sec * sr), int(stop_sec * sr)
+        if len(y_full[a:b]) == 0: continue
+        spans.append((a, b))
+        kept.append((start_sec, stop_sec, row))
+    feats = batch_features(y_full, spans, sr)
+    return [make_record(date_str, st, et, row, f) for (st, et, row), f in zip(kept, feats)]
+
+def features_legacy(date_str, y_full, sr, rows):
+    """기존 엔진 (윈도우마다 extract_features) → JSONL 레코드 리스트"""
+    records = []
+    for start_sec, stop_sec, row in tqdm(rows, desc="피처 추출 중"):
+        try:
+            y_segment = y_full[int(start_sec * sr):int(stop_sec * sr)]
+            if len(y_segment) == 0: continue
+            features = sliding_window_from_buffer(y_segment, sr, window_sec=1.0)
+            records.append(make_record(date_str, start_sec, stop_sec, row, features))
+        except Exception as e:
+            # 구체적인 에러 확인용
+            # print(f"에러 내용: {e}") 
+            continue
+    return records
+
 #def process_date(date_str, out_base_dir):
-def process_date(date_str):
+def process_date(date_str, engine="batch", fmt="store"):
     # 경로 설정
     input_base_dir = f"/mnt/home_dnlab/jhjung/radio/jeongeunim/{date_str}"
     output_base_dir = f"/mnt/home_dnlab/jhjung/radio/jeongeunim/{date_str}/transcript"
@@ -45,6 +192,9 @@ def process_date(date_str):
     #os.makedirs(out_base_dir, exist_ok=True)
     out_file = os.path.join(output_base_dir, f"{date_str}_features.jsonl")
     #out_file = os.path.join(out_base_dir, f"{date_str}_features.jsonl")
+    if fmt == "store":
+        # float32 행렬 + offset + 구간 메타 (feature_store.py)
+        out_file = store_path(output_base_dir, date_str)
 
     if not os.path.exists(csv_file):
         print(f"❌ CSV 없음: {csv_file}")
@@ -53,58 +203,99 @@ def process_date(date_str):
         print(f"❌ MP3 없음: {mp3_file}")
         return
 
-    print(f"🚀 [{date_str}] 분석 시작... (저장처: {out_file})")
-    y_full, sr = librosa.load(mp3_file, sr=16000)
-    
-    results_count = 0
-    # encoding='utf-8-sig'를 사용하여 BOM 문제를 해결하고, 
-    # strip()을 통해 컬럼명 공백 문제를 방지합니다.
-    with open(csv_file, "r", encoding="utf-8-sig") as f:
-        # 컬럼명의 공백을 자동으로 제거하도록 설정
-        reader = csv.DictReader(f)
-        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    print(f"🚀 [{date_str}] 분석 시작... (저장처: {out_file}, engine={engine})")
+    # 공유 16kHz PCM 버퍼 (memmap - 필요한 구간만 읽음)
+    sr = 16000
+    y_full = load_pcm(mp3_file, sr)
+    rows = read_segments(csv_file)
+
+    if engine == "legacy":
+        records = features_legacy(date_str, y_full, sr, rows)
+    else:
+        records = features_batched(date_str, y_full, sr, rows)
 
+    if fmt == "store":
+        write_store(out_file, records)
+    else:
         with open(out_file, "w", encoding="utf-8") as fout:
-            for row in tqdm(reader, desc="피처 추출 중"):
-                try:
-                    # 'Start Time' 키가 있는지 확인 후 데이터 추출
-                    st = row.get("Start Time")
-                    et = row.get("Stop Time")
-                    if st is None or et is None: continue
-                    
-                    start_sec = float(st)
-                    stop_sec = float(et)
-                    
-                    start_idx = int(start_sec * sr)
-                    stop_idx = int(stop_sec * sr)
-                    y_segment = y_full[start_idx:stop_idx]
-                    
-                    if len(y_segment) == 0: continue
-
-                    features = sliding_window_from_buffer(y_segment, sr, window_sec=1.0)
-                    record = {
-                        "date": date_str,
-                        "start": start_sec,
-                        "stop": stop_sec,
-                        "type": row.get("Type", ""),
-                        "speaker": row.get("Speaker", ""),
-                        "transcript": row.get("Transcript"),
-                        "audio_features": features
-                    }
-                    fout.write(json.dumps(record, ensure_ascii=False) + "\n")
-                    results_count += 1
-                except Exception as e:
-                    # 구체적인 에러 확인용
-                    # print(f"에러 내용: {e}") 
-                    continue
-
-    print(f"✅ 완료: {results_count}개 구간 저장 완료")
+            for record in records:
+                fout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"✅ 완료: {len(records)}개 구간 저장 완료")
+
+# ==========================================
+# 벤치마크: 기존 vs 배치 (속도 + 최대 오차)
+# ==========================================
+def compare_records(legacy, batched):
+    """(최대 절대 오차, feature 별 최대 상대 오차) — 구간/윈도우 수가 다르면 ValueError"""
+    if len(legacy) != len(batched):
+        raise ValueError(f"record count differs: {len(legacy)} vs {len(batched)}")
+    a = np.array([w for r in legacy for w in r["audio_features"]], dtype=np.float64)
+    b = np.array([w for r in batched for w in r["audio_features"]], dtype=np.float64)
+    if a.shape != b.shape:
+        raise ValueError(f"window count differs: {a.shape} vs {b.shape}")
+    diff = np.abs(a - b)
+    scale = np.maximum(np.abs(a).max(axis=0), 1e-9)
+    return diff.max(), diff.max(axis=0) / scale
+
+def benchmark(date_str=None, mp3_file=None, csv_file=None, minutes=120, seg_sec=8.0):
+    """
+    날짜(또는 mp3 + csv)가 있으면 실제 데이터로, 없으면 minutes 분 합성 오디오 + seg_sec 초 구간으로 측정
+    """
+    sr = 16000
+    if date_str:
+        base = f"/mnt/home_dnlab/jhjung/radio/jeongeunim/{date_str}"
+        mp3_file = mp3_file or os.path.join(base, "mp3", f"{date_str}.mp3")
+        csv_file = csv_file or os.path.join(base, "transcript", f"{date_str}_with_speaker.csv")
+    if mp3_file and csv_file:
+        y_full = load_pcm(mp3_file, sr)
+        rows = read_segments(csv_file)
+        label = os.path.basename(mp3_file)
+    else:
+        rng = np.random.default_rng(0)
+        n = int(minutes * 60 * sr)
+        t = np.arange(n, dtype=np.float32) / sr
+        y_full = (0.1 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(n)).astype(np.float32)
+        bounds = np.arange(0.0, minutes * 60, seg_sec)
+        rows = [(float(a), float(min(a + seg_sec, minutes * 60)), {"Type": "speech"}) for a in bounds]
+        label = f"synthetic {minutes} min"
+
+    audio_min = len(y_full) / sr / 60
+    print(f"⏱️  Benchmark: {label} ({audio_min:.0f} min audio, {len(rows)} segments)")
+
+    t0 = time.time()
+    legacy = features_legacy(date_str, y_full, sr, rows)
+    t_legacy = time.time() - t0
+
+    t0 = time.time()
+    batched = features_batched(date_str, y_full, sr, rows)
+    t_batch = time.time() - t0
+
+    max_abs, rel = compare_records(legacy, batched)
+    names = ["rms", "zcr", "centroid", "bandwidth", "flatness"] + \
+            [f"mfcc_mean_{i}" for i in range(13)] + [f"mfcc_std_{i}" for i in range(13)]
+    worst = int(np.argmax(rel))
+
+    print(f"   legacy : {t_legacy:8.1f}s")
+    print(f"   batched: {t_batch:8.1f}s  (x{t_legacy / max(t_batch, 1e-9):.1f})")
+    print(f"   max |diff| {max_abs:.3g}, worst relative {rel[worst]:.3g} ({names[worst]})")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--date", required=True, help="날짜 (YYYYMMDD)")
+    parser.add_argument("--date", default=None, help="날짜 (YYYYMMDD)")
     #parser.add_argument("--out_dir", required=True, help="결과를 저장할 디렉토리 경로")
+    parser.add_argument("--engine", choices=["batch", "legacy"], default="batch",
+                        help="batch: 윈도우 묶음당 STFT 1번 (기본) / legacy: 윈도우마다 librosa 5번")
+    parser.add_argument("--format", choices=["store", "jsonl"], default="store",
+                        help="store: {date}_features/ 바이너리 저장소 (기본) / jsonl: 기존 _features.jsonl")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="legacy vs batch 속도/오차 비교 (--date 없으면 2시간 합성 오디오)")
+    parser.add_argument("--minutes", type=float, default=120, help="합성 벤치마크 길이(분)")
     args = parser.parse_args()
 
-    process_date(args.date)
-    #process_date(args.date, args.out_dir)
\ No newline at end of file
+    if args.benchmark:
+        benchmark(args.date, minutes=args.minutes)
+    elif not args.date:
+        parser.error("--date is required")
+    else:
+        process_date(args.date, engine=args.engine, fmt=args.format)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+오디오 feature 바이너리 저장소 (_features.jsonl 대체)
+
+  {date}_features/
+    features.npy   (윈도우 수, 31) float32   — 1초 윈도우별 feature (extract_features 순서)
+    offsets.npy    (구간 수 + 1,) int64      — 구간 i 의 윈도우 = features[offsets[i]:offsets[i+1]]
+    segments.csv   date, start, stop, type, speaker, transcript
+
+- .npy 라서 np.load(mmap_mode="r") 로 복사 없이 열림
+- 구간별 평균은 np.add.reduceat 한 번 (JSON 파싱 / 레코드별 np.mean 없음)
+
+Usage:
+  python feature_store.py convert <file_features.jsonl> [<out_dir>]   # 기존 JSONL 변환
+  python feature_store.py info <store_dir>
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+
+import numpy as np
+import pandas as pd
+
+N_FEATURES = 31
+META_COLUMNS = ["date", "start", "stop", "type", "speaker", "transcript"]
+
+
+def store_path(transcript_dir, date_str):
+    return os.path.join(transcript_dir, f"{date_str}_features")
+
+
+def write_store(out_dir, records):
+    """
+    extract_audio_feature_diarized_csv 의 레코드 리스트 → 저장소
+    (임시 폴더에 쓰고 rename → 중간에 죽어도 반쪽짜리 저장소가 남지 않음)
+    """
+    counts = np.array([len(r["audio_features"]) for r in records], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    features = np.zeros((int(offsets[-1]), N_FEATURES), dtype=np.float32)
+    for r, a, b in zip(records, offsets[:-1], offsets[1:]):
+        if b > a:
+            features[a:b] = np.asarray(r["audio_features"], dtype=np.float32)
+
+    meta = pd.DataFrame([{c: r.get(c, "") for c in META_COLUMNS} for r in records], columns=META_COLUMNS)
+
+    tmp = f"{out_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    np.save(os.path.join(tmp, "features.npy"), features)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    meta.to_csv(os.path.join(tmp, "segments.csv"), index=False, encoding="utf-8")
+
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp, out_dir)
+    return out_dir
+
+
+def open_store(store_dir, mmap=True):
+    """→ (features (memmap), offsets, meta DataFrame)"""
+    mode = "r" if mmap else None
+    features = np.load(os.path.join(store_dir, "features.npy"), mmap_mode=mode)
+    offsets = np.load(os.path.join(store_dir, "offsets.npy"))
+    meta = pd.read_csv(os.path.join(store_dir, "segments.csv"), keep_default_na=False,
+                       dtype={"date": str, "type": str, "speaker": str, "transcript": str})
+    return features, offsets, meta
+
+
+def segment_means(features, offsets):
+    """
+    구간별 윈도우 평균 (구간 수, 31) float64 — np.add.reduceat 한 번
+    윈도우가 없는 구간은 NaN
+    """
+    counts = np.diff(offsets)
+    means = np.full((len(counts), features.shape[1]), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        sums = np.add.reduceat(features, offsets[:-1][nonempty], axis=0, dtype=np.float64)
+        means[nonempty] = sums / counts[nonempty, None]
+    return means
+
+
+def load_many(store_dirs):
+    """
+    여러 날짜 저장소 → (구간별 평균, meta) 한 번에 (한 달치 로드용)
+    """
+    means, metas = [], []
+    for d in store_dirs:
+        features, offsets, meta = open_store(d)
+        means.append(segment_means(features, offsets))
+        metas.append(meta)
+    if not means:
+        return np.zeros((0, N_FEATURES)), pd.DataFrame(columns=META_COLUMNS)
+    return np.concatenate(means), pd.concat(metas, ignore_index=True)
+
+
+def convert_jsonl(jsonl_path, out_dir=None):
+    out_dir = out_dir or jsonl_path.replace("_features.jsonl", "_features")
+    if out_dir == jsonl_path:
+        out_dir = os.path.splitext(jsonl_path)[0]
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    write_store(out_dir, records)
+    return out_dir, len(records)
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python feature_store.py (convert JSONL [OUT_DIR] | info STORE_DIR)")
+    parser.add_argument("command", choices=["convert", "info"])
+    parser.add_argument("path")
+    parser.add_argument("out_dir", nargs="?", default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"❌ Not found: {args.path}")
+        sys.exit(1)
+
+    if args.command == "convert":
+        out_dir, n = convert_jsonl(args.path, args.out_dir)
+        before, after = os.path.getsize(args.path), dir_size(out_dir)
+        print(f"✅ {n} segments → {out_dir}")
+        print(f"   {before / 1e6:.1f} MB → {after / 1e6:.1f} MB (x{before / max(after, 1):.1f} smaller)")
+    else:
+        features, offsets, meta = open_store(args.path)
+        print(f"📦 {args.path}: {len(meta)} segments, {len(features)} windows x {features.shape[1]} "
+              f"({dir_size(args.path) / 1e6:.1f} MB)")
@@ -5,6 +5,8 @@ import numpy as np
 import argparse
 import os
 
+from feature_store import open_store, segment_means, store_path
+
 def describe_energy(rms):
     """RMS 값을 자연어로"""
     if rms > 0.3:
@@ -51,6 +53,50 @@ def summarize_audio(rms, zcr, centroid, bandwidth, flatness):
     else:
         return "Simple speech pattern with consistent characteristics"
 
+def describe_features(avg_features, meta):
+    """구간 평균 feature 31개 + 메타 → CSV 행 (자연어 설명 포함)"""
+    # 특성 추출 (extract_features.py 순서대로)
+    rms = avg_features[0]
+    zcr = avg_features[1]
+    centroid = avg_features[2]
+    bandwidth = avg_features[3]
+    flatness = avg_features[4]
+    mfcc_mean = avg_features[5:18]   # 13개
+    mfcc_std = avg_features[18:31]   # 13개
+    
+    mfcc_std_avg = np.mean(mfcc_std)
+    
+    # 자연어 설명 생성
+    return {
+        'start': meta['start'],
+        'stop': meta['stop'],
+        'type': meta.get('type', ''),
+        'speaker': meta.get('speaker', ''),
+        'transcript': meta.get('transcript', ''),
+        
+        # classify_audio_text.py에서 사용하는 컬럼들
+        'speech_energy_desc': describe_energy(rms),
+        'spectral_desc': describe_spectral(centroid, zcr, bandwidth),
+        'stability_desc': describe_stability(mfcc_std_avg),
+        'audio_summary': summarize_audio(rms, zcr, centroid, bandwidth, flatness),
+        
+        # 원본 숫자값도 보관
+        'rms': round(rms, 4),
+        'zcr': round(zcr, 4),
+        'centroid': round(centroid, 2),
+        'bandwidth': round(bandwidth, 2),
+        'flatness': round(flatness, 4),
+        'mfcc_std_avg': round(mfcc_std_avg, 2)
+    }
+
+def save_rows(rows, input_path, output_csv):
+    df = pd.DataFrame(rows)
+    df.to_csv(output_csv, index=False, encoding='utf-8')
+    print(f"✅ 변환 완료: {len(df)}개 구간")
+    print(f"   입력: {input_path}")
+    print(f"   출력: {output_csv}")
+    return len(df)
+
 def convert_jsonl_to_csv(jsonl_path, output_csv):
     """JSONL → CSV 변환 (자연어 설명 추가)"""
     
@@ -68,49 +114,22 @@ def convert_jsonl_to_csv(jsonl_path, output_csv):
                 
             # 모든 윈도우의 평균 계산
             avg_features = np.mean(features_list, axis=0)
-            
-            # 특성 추출 (extract_features.py 순서대로)
-            rms = avg_features[0]
-            zcr = avg_features[1]
-            centroid = avg_features[2]
-            bandwidth = avg_features[3]
-            flatness = avg_features[4]
-            mfcc_mean = avg_features[5:18]   # 13개
-            mfcc_std = avg_features[18:31]   # 13개
-            
-            mfcc_std_avg = np.mean(mfcc_std)
-            
-            # 자연어 설명 생성
-            row = {
-                'start': record['start'],
-                'stop': record['stop'],
-                'type': record.get('type', ''),
-                'speaker': record.get('speaker', ''),
-                'transcript': record.get('transcript', ''),
-                
-                # classify_audio_text.py에서 사용하는 컬럼들
-                'speech_energy_desc': describe_energy(rms),
-                'spectral_desc': describe_spectral(centroid, zcr, bandwidth),
-                'stability_desc': describe_stability(mfcc_std_avg),
-                'audio_summary': summarize_audio(rms, zcr, centroid, bandwidth, flatness),
-                
-                # 원본 숫자값도 보관
-                'rms': round(rms, 4),
-                'zcr': round(zcr, 4),
-                'centroid': round(centroid, 2),
-                'bandwidth': round(bandwidth, 2),
-                'flatness': round(flatness, 4),
-                'mfcc_std_avg': round(mfcc_std_avg, 2)
-            }
-            
-            rows.append(row)
+            rows.append(describe_features(avg_features, record))
     
-    df = pd.DataFrame(rows)
-    df.to_csv(output_csv, index=False, encoding='utf-8')
-    print(f"✅ 변환 완료: {len(df)}개 구간")
-    print(f"   입력: {jsonl_path}")
-    print(f"   출력: {output_csv}")
-    return len(df)
+    return save_rows(rows, jsonl_path, output_csv)
+
+def convert_store_to_csv(store_dir, output_csv):
+    """바이너리 저장소(feature_store.py) → CSV 변환 — memmap + np.add.reduceat 1번"""
+    features, offsets, meta = open_store(store_dir)
+    means = segment_means(features, offsets)
+
+    rows = []
+    for avg_features, record in zip(means, meta.to_dict('records')):
+        if np.isnan(avg_features[0]):   # 윈도우 없는 구간
+            continue
+        rows.append(describe_features(avg_features, record))
+
+    return save_rows(rows, store_dir, output_csv)
 
 def process_date(date_str):
     """특정 날짜 처리"""
@@ -119,9 +138,23 @@ def process_date(date_str):
     transcript_dir = os.path.join(base_dir, "transcript")
     
     # 입력/출력 파일
+    store_dir = store_path(transcript_dir, date_str)
     jsonl_file = os.path.join(transcript_dir, f"{date_str}_features.jsonl")
     output_csv = os.path.join(transcript_dir, f"{date_str}_audio_features_speech_music_spectral.csv")
     
+    # 바이너리 저장소 우선, 없거나 JSONL 이 더 새로우면 (저장소 이후 기존 추출기를 다시 돌린 경우) JSONL
+    if os.path.isdir(store_dir) and os.path.exists(jsonl_file):
+        store_mtime = os.path.getmtime(os.path.join(store_dir, "features.npy"))
+        if os.path.getmtime(jsonl_file) > store_mtime:
+            print(f"⚠️  JSONL 이 feature store 보다 새로움 → JSONL 사용: {jsonl_file}")
+            store_dir = None
+
+    if store_dir and os.path.isdir(store_dir):
+        print(f"🚀 [{date_str}] feature store → CSV 변환 시작... ({store_dir})")
+        convert_store_to_csv(store_dir, output_csv)
+        print(f"✅ 완료! 이제 classify_audio_text.py를 실행할 수 있습니다.")
+        return
+
     # 파일 존재 확인
     if not os.path.exists(jsonl_file):
         print(f"❌ JSONL 파일 없음: {jsonl_file}")
@@ -129,12 +162,12 @@ def process_date(date_str):
         print(f"   python extract_features.py --date {date_str}")
         return
     
-    print(f"🚀 [{date_str}] JSONL → CSV 변환 시작...")
+    print(f"🚀 [{date_str}] JSONL → CSV 변환 시작... ({jsonl_file})")
     convert_jsonl_to_csv(jsonl_file, output_csv)
     print(f"✅ 완료! 이제 classify_audio_text.py를 실행할 수 있습니다.")
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="JSONL 특성 파일을 CSV로 변환 (자연어 설명 추가)")
+    parser = argparse.ArgumentParser(description="특성 파일(feature store 또는 JSONL)을 CSV로 변환 (자연어 설명 추가)")
     parser.add_argument("--date", required=True, help="날짜 (YYYYMMDD)")
     args = parser.parse_args()
     
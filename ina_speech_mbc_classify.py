@@ -1,17 +1,32 @@
+import os
+import time
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import librosa
 import re
 from tqdm import tqdm
 
+from audio_buffer import ensure_pcm, load_pcm
+from speaker_matrix import load_for_csv
+
 # ===============================
 # 1. 경로 설정
 # ===============================
 
-CSV_PATH = "/mnt/home_dnlab/jhjung/radio/jeongeunim/20260124/transcript/20260124_with_speaker_ratio.csv"
-MP3_PATH = "/mnt/home_dnlab/jhjung/radio/jeongeunim/20260124/mp3/20260124.mp3"
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/jeongeunim"
 
 SR = 32000
+CHUNKS_PER_WORKER = 4   # 워커당 작업 묶음 수 (너무 잘게 나누면 IPC 비용, 너무 크면 부하 불균형)
+
+def date_paths(date_str, base_path=BASE_PATH):
+    """(CSV, MP3, 출력 CSV)"""
+    csv_path = f"{base_path}/{date_str}/transcript/{date_str}_with_speaker_ratio.csv"
+    mp3_path = f"{base_path}/{date_str}/mp3/{date_str}.mp3"
+    return csv_path, mp3_path, csv_path.replace(".csv", "_speech_music_spectral.csv")
 
 # ===============================
 # 2. 보조 함수들
@@ -51,13 +66,15 @@ def extract_spectral_features(y, sr):
     }
 
 
-def classify_speech_music(row, features):
+def classify_speech_music(row, features, speaker_ratio=None):
     """
     최종 분류 함수 (speech / music)
+    speaker_ratio: 미리 계산한 지배 화자 비율 (없으면 Speakers 텍스트에서)
     """
     duration = float(row["Duration"])
     transcript = str(row["Transcript"]) if pd.notna(row["Transcript"]) else ""
-    speaker_ratio = get_speaker_ratio(row["Speakers"])
+    if speaker_ratio is None:
+        speaker_ratio = get_speaker_ratio(row["Speakers"])
     density = text_density(transcript, duration)
 
     bw = features["bandwidth"]
@@ -86,69 +103,177 @@ def classify_speech_music(row, features):
 
 
 # ===============================
-# 3. CSV 로드
+# 3. 세그먼트 feature (프로세스 풀)
 # ===============================
 
-df = pd.read_csv(CSV_PATH)
-
-# silence 제거
-df = df[df["Type"] != "silence"].reset_index(drop=True)
+# 워커별로 연 PCM memmap (경로 → 배열). 오디오는 pickle 로 넘기지 않고 각 워커가 같은 파일을 memmap
+_AUDIO = {}
+
+def _worker_audio(mp3_path):
+    if mp3_path not in _AUDIO:
+        _AUDIO.clear()
+        _AUDIO[mp3_path] = load_pcm(mp3_path, SR)
+    return _AUDIO[mp3_path]
+
+def _features_chunk(task):
+    """(mp3 경로, [(s, e), ...]) → [features dict, ...]"""
+    mp3_path, spans = task
+    audio_full = _worker_audio(mp3_path)
+    return [extract_spectral_features(audio_full[s:e], SR) for s, e in spans]
+
+def segment_jobs(df, audio_len):
+    """분류 대상 행과 샘플 구간 [(row, s, e)] — 기존 루프와 같은 조건 (audio_full[s:e] 길이 기준)"""
+    jobs = []
+    for _, row in df.iterrows():
+        duration = float(row["Duration"])
+        if duration < 1.0:
+            continue
+
+        s = min(int(float(row["Start Time"]) * SR), audio_len)
+        e = min(max(int(float(row["Stop Time"]) * SR), s), audio_len)
+        if (e - s) < SR * 0.5:
+            continue
+        jobs.append((row, s, e))
+    return jobs
+
+def compute_features(mp3_path, spans, workers=1, pool=None):
+    """구간별 spectral feature (입력 순서 유지)"""
+    if workers <= 1 and pool is None:
+        audio_full = load_pcm(mp3_path, SR)
+        return [extract_spectral_features(audio_full[s:e], SR) for s, e in tqdm(spans)]
+
+    n_chunks = max(1, workers * CHUNKS_PER_WORKER)
+    size = max(1, -(-len(spans) // n_chunks))
+    tasks = [(mp3_path, spans[i:i + size]) for i in range(0, len(spans), size)]
+
+    own_pool = pool is None
+    pool = pool or ProcessPoolExecutor(max_workers=workers)
+    try:
+        features = []
+        for part in tqdm(pool.map(_features_chunk, tasks), total=len(tasks)):
+            features.extend(part)
+        return features
+    finally:
+        if own_pool:
+            pool.shutdown()
 
 # ===============================
-# 4. MP3 전체 로드 (한 번만)
+# 4. 날짜 단위 실행
 # ===============================
 
-print("▶ Loading full MP3...")
-audio_full, _ = librosa.load(MP3_PATH, sr=SR, mono=True)
-audio_full = audio_full.astype(np.float32)
+def classify_date(date_str, workers=1, pool=None, base_path=BASE_PATH):
+    csv_path, mp3_path, out_path = date_paths(date_str, base_path)
+    if not os.path.exists(csv_path) or not os.path.exists(mp3_path):
+        print(f"❌ [{date_str}] CSV or MP3 missing")
+        return None
+
+    df = pd.read_csv(csv_path)
+    matrix = load_for_csv(csv_path, len(df))
+
+    # silence 제거
+    keep = (df["Type"] != "silence").to_numpy()
+    df = df[keep].reset_index(drop=True)
+
+    # 지배 화자 비율: merge 가 저장한 화자 행렬이 있으면 텍스트 파싱 없이
+    if matrix is not None:
+        df["Speaker_Ratio"] = matrix.take(np.flatnonzero(keep)).dominant_ratio()
+    else:
+        df["Speaker_Ratio"] = df["Speakers"].map(get_speaker_ratio)
+
+    # 공유 PCM 버퍼는 부모에서 한 번만 디코딩 → 워커들은 같은 파일을 memmap
+    print(f"▶ [{date_str}] Loading full MP3 (shared PCM buffer)...")
+    ensure_pcm(mp3_path, SR)
+    audio_len = len(load_pcm(mp3_path, SR))
+
+    jobs = segment_jobs(df, audio_len)
+
+    print(f"▶ [{date_str}] Classifying {len(jobs)} segments (speech / music, {workers} workers)...")
+    features_list = compute_features(mp3_path, [(s, e) for _, s, e in jobs], workers=workers, pool=pool)
+
+    results = []
+    for (row, _, _), features in zip(jobs, features_list):
+        start = float(row["Start Time"])
+        end = float(row["Stop Time"])
+        duration = float(row["Duration"])
+        label = classify_speech_music(row, features, speaker_ratio=row["Speaker_Ratio"])
+
+        results.append({
+            "start": start,
+            "stop": end,
+            "duration": duration,
+            "label": label,
+            "speaker_ratio": row["Speaker_Ratio"],
+            "text_density": text_density(row["Transcript"], duration),
+            "bandwidth": features["bandwidth"],
+            "rolloff": features["rolloff"],
+            "flatness": features["flatness"],
+            "transcript": row["Transcript"]
+        })
+
+    # ===============================
+    # 결과 저장
+    # ===============================
+    out_df = pd.DataFrame(results)
+    out_df.to_csv(out_path, index=False, encoding="utf-8-sig")
+
+    print(f"✅ [{date_str}] Saved: {out_path}")
+    return out_path
+
+def classify_dates(dates, workers=1, base_path=BASE_PATH):
+    """여러 날짜를 같은 프로세스 풀로 (워커 재생성 / librosa import 1회)"""
+    if workers <= 1:
+        return [classify_date(d, 1, base_path=base_path) for d in dates]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [classify_date(d, workers, pool=pool, base_path=base_path) for d in dates]
 
 # ===============================
-# 5. 세그먼트별 분류
+# 5. 스케일링 벤치마크
 # ===============================
 
-results = []
-
-print("▶ Classifying segments (speech / music)...")
-
-for _, row in tqdm(df.iterrows(), total=len(df)):
-    start = float(row["Start Time"])
-    end = float(row["Stop Time"])
-    duration = float(row["Duration"])
-
-    if duration < 1.0:
-        continue
-
-    s = int(start * SR)
-    e = int(end * SR)
-
-    seg_audio = audio_full[s:e]
-
-    if len(seg_audio) < SR * 0.5:
-        continue
-
-    features = extract_spectral_features(seg_audio, SR)
-    label = classify_speech_music(row, features)
-
-    results.append({
-        "start": start,
-        "stop": end,
-        "duration": duration,
-        "label": label,
-        "speaker_ratio": get_speaker_ratio(row["Speakers"]),
-        "text_density": text_density(row["Transcript"], duration),
-        "bandwidth": features["bandwidth"],
-        "rolloff": features["rolloff"],
-        "flatness": features["flatness"],
-        "transcript": row["Transcript"]
-    })
-
-# ===============================
-# 6. 결과 저장
-# ===============================
-
-out_df = pd.DataFrame(results)
-out_path = CSV_PATH.replace(".csv", "_speech_music_spectral.csv")
-out_df.to_csv(out_path, index=False, encoding="utf-8-sig")
-
-print("✅ Saved:", out_path)
-
+def benchmark(date_str, worker_counts=(1, 2, 4, 8), base_path=BASE_PATH):
+    """feature 계산 단계만 워커 수별로 측정 (결과 동일성도 확인)"""
+    csv_path, mp3_path, _ = date_paths(date_str, base_path)
+    df = pd.read_csv(csv_path)
+    df = df[df["Type"] != "silence"].reset_index(drop=True)
+    ensure_pcm(mp3_path, SR)
+    audio_len = len(load_pcm(mp3_path, SR))
+    spans = [(s, e) for _, s, e in segment_jobs(df, audio_len)]
+
+    print(f"⏱️  Benchmark [{date_str}]: {len(spans)} segments, {os.cpu_count()} CPUs")
+    baseline, reference = None, None
+    for n in worker_counts:
+        t0 = time.time()
+        features = compute_features(mp3_path, spans, workers=n)
+        elapsed = time.time() - t0
+        if reference is None:
+            reference, baseline = features, elapsed
+        same = features == reference
+        print(f"   workers={n:<2} {elapsed:7.1f}s  x{baseline / elapsed:4.2f}  {'✅ same' if same else '❌ DIFFERENT'}")
+
+def date_range(start, end):
+    s = datetime.datetime.strptime(start, "%Y%m%d")
+    e = datetime.datetime.strptime(end, "%Y%m%d")
+    return [(s + datetime.timedelta(days=i)).strftime("%Y%m%d") for i in range((e - s).days + 1)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python ina_speech_mbc_classify.py <DATE> [<DATE> ...] [--start D --end D] [--workers N] [--benchmark]"
+    )
+    parser.add_argument("dates", nargs="*", help="YYYYMMDD ...")
+    parser.add_argument("--start", default=None, help="범위 시작 (YYYYMMDD)")
+    parser.add_argument("--end", default=None, help="범위 끝 (YYYYMMDD)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="프로세스 수")
+    parser.add_argument("--base-dir", default=BASE_PATH)
+    parser.add_argument("--benchmark", action="store_true", help="첫 날짜로 1/2/4/8 워커 스케일링 측정")
+    args = parser.parse_args()
+
+    dates = list(args.dates)
+    if args.start and args.end:
+        dates += date_range(args.start, args.end)
+    if not dates:
+        parser.error("no dates given")
+
+    if args.benchmark:
+        benchmark(dates[0], base_path=args.base_dir)
+    else:
+        classify_dates(dates, workers=args.workers, base_path=args.base_dir)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+생방송 근실시간 AD / MUSIC / DJ / GUEST 판별
+
+dj_stat_ratio5.py → dj_merge_block3.py → make_ground_truth.py 는 하루치가 끝나야 돌 수 있으므로,
+스트림을 받으면서 최근 WINDOW_SEC 만 들고 HOP_SEC 마다 바로 라벨을 냅니다.
+
+  ffmpeg (16kHz mono f32 pipe) → ring buffer (최근 10초)
+    ├─ 에너지 / 저에너지 프레임 비율 → SILENCE / MUSIC / speech
+    ├─ 화자 embedding → 지난 며칠로 만든 DJ 프로필과 cosine 유사도 → DJ
+    └─ DJ 가 아닌 목소리 → 세션 내 화자 묶음 + 최근 DJ 와 주고받은 횟수
+         (dj_stat_ratio5 의 앞뒤 3칸 interaction 규칙을 hop 단위로)
+         → 충분히 주고받았으면 GUEST, 아니면 AD
+         (--index 가 있으면 speaker_index.py 에 등록된 DJ / 게스트 / 광고 목소리를 먼저 lookup)
+
+판단 1건마다 지연(hop 의 가장 오래된 샘플이 방송된 시각 ~ 라벨 출력)을 기록하고 MAX_LATENCY 초과 시 경고합니다.
+
+Usage:
+  python speaker_embedding.py dj-profile --last 7                  # DJ 프로필 (1회)
+  python live_ad_detector.py <DATE> --url <STREAM_URL>
+  python live_ad_detector.py <DATE> --input 20251201.mp3           # 녹음 파일을 실시간 속도로 재생해서 테스트
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import subprocess
+from collections import deque
+
+import numpy as np
+
+from speaker_embedding import (
+    BASE_PATH, DJ_PROFILE, SAMPLE_RATE,
+    load_embedder, embed, normalize, load_dj_profile,
+)
+
+WINDOW_SEC = 10.0       # 판단에 쓰는 최근 구간
+HOP_SEC = 5.0           # 판단 주기 (라벨 1개 = hop 1개)
+MAX_LATENCY = 30.0      # 이 이상 밀리면 경고
+
+SILENCE_RMS = 0.003         # 창 전체 RMS 가 이보다 작으면 SILENCE
+SPEECH_LOW_ENERGY = 0.2     # 저에너지 프레임 비율: 말소리는 음절 사이가 자주 끊김, 음악은 거의 없음
+DJ_THRESHOLD = 0.55         # DJ 프로필과 cosine 유사도
+VOICE_THRESHOLD = 0.6       # 세션 내 같은 목소리로 묶는 기준
+INTERACTION_HOPS = 3        # 앞뒤 3 hop 안에 DJ 가 있으면 interaction
+GUEST_INTERACTIONS = 2      # 이 이상 주고받으면 GUEST
+
+
+# ==========================================
+# 1. 오디오 입력 / ring buffer
+# ==========================================
+def open_stream(source, realtime=True):
+    cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+    if realtime:
+        cmd += ["-re"]
+    cmd += ["-i", source, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE)
+
+
+def read_samples(stream, n):
+    data = stream.read(n * 4)
+    return np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+
+
+class RingBuffer:
+    """최근 size 샘플만 유지 (고정 크기, 복사 1회)"""
+    def __init__(self, size):
+        self.buf = np.zeros(size, dtype=np.float32)
+        self.size = size
+        self.filled = 0
+
+    def push(self, samples):
+        n = len(samples)
+        if n >= self.size:
+            self.buf[:] = samples[-self.size:]
+        else:
+            self.buf[:-n] = self.buf[n:]
+            self.buf[-n:] = samples
+        self.filled = min(self.size, self.filled + n)
+
+    def view(self):
+        return self.buf[self.size - self.filled:]
+
+
+# ==========================================
+# 2. 특징 / 판단
+# ==========================================
+def frame_rms(y, frame=400):
+    n = len(y) // frame
+    if n == 0:
+        return np.zeros(1, dtype=np.float32)
+    frames = y[:n * frame].reshape(n, frame)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def low_energy_ratio(rms):
+    """평균 RMS 의 절반보다 작은 프레임 비율 (speech/music 구분 고전 특징)"""
+    return float(np.mean(rms < 0.5 * rms.mean())) if rms.mean() > 0 else 1.0
+
+
+class VoiceTracker:
+    """
+    세션 안에서 DJ 가 아닌 목소리를 묶고, DJ 와 주고받은 횟수를 셈
+    hop 라벨 기록은 최근 INTERACTION_HOPS*2 개만 유지
+    """
+    def __init__(self):
+        self.centroids = []          # 가중합
+        self.interactions = []
+        self.recent = deque(maxlen=INTERACTION_HOPS * 2 + 1)  # (hop_idx, "DJ" | voice_id | None)
+        self.counted = set()         # (voice_id, hop_idx) 중복 카운트 방지
+
+    def assign(self, emb):
+        if self.centroids:
+            sums = np.stack(self.centroids)
+            sims = normalize(sums) @ emb
+            best = int(np.argmax(sims))
+            if sims[best] >= VOICE_THRESHOLD:
+                self.centroids[best] = self.centroids[best] + emb
+                return best
+        self.centroids.append(emb.copy())
+        self.interactions.append(0)
+        return len(self.centroids) - 1
+
+    def observe(self, hop_idx, who):
+        """hop 결과 기록 → DJ 와 INTERACTION_HOPS 이내로 붙어 있는 목소리 카운트"""
+        self.recent.append((hop_idx, who))
+        dj_hops = [h for h, w in self.recent if w == "DJ"]
+        for h, w in self.recent:
+            if w is None or w == "DJ" or (w, h) in self.counted:
+                continue
+            if any(abs(h - d) <= INTERACTION_HOPS for d in dj_hops):
+                self.interactions[w] += 1
+                self.counted.add((w, h))
+
+    def is_guest(self, voice_id):
+        return self.interactions[voice_id] >= GUEST_INTERACTIONS
+
+
+def classify(window, inference, dj_profile, tracker, hop_idx, index=None):
+    """
+    Returns:
+        (label, info dict)
+    """
+    rms = frame_rms(window)
+    energy = float(np.sqrt(np.mean(window ** 2))) if len(window) else 0.0
+    ler = low_energy_ratio(rms)
+    info = {"rms": energy, "low_energy": ler, "dj_sim": None, "voice": None}
+
+    if energy < SILENCE_RMS:
+        tracker.observe(hop_idx, None)
+        return "SILENCE", info
+
+    emb = embed(inference, window)
+    if not np.all(np.isfinite(emb)):
+        tracker.observe(hop_idx, None)
+        return "MUSIC", info
+
+    dj_sim = float(emb @ dj_profile)
+    info["dj_sim"] = dj_sim
+
+    # 음악 위에 DJ 가 말하는 경우도 DJ 로 (프로필 유사도 우선)
+    if dj_sim >= DJ_THRESHOLD:
+        tracker.observe(hop_idx, "DJ")
+        return "DJ", info
+
+    if ler < SPEECH_LOW_ENERGY:
+        tracker.observe(hop_idx, None)
+        return "MUSIC", info
+
+    # 지난 날들에 역할이 정해진 목소리면 바로 그 역할
+    if index is not None:
+        _, _, role = index.lookup({"hop": emb})["hop"]
+        if role is not None:
+            info["known"] = role
+            tracker.observe(hop_idx, "DJ" if role == "DJ" else None)
+            return {"DJ": "DJ", "GUEST": "GUEST", "AD_SPEAKER": "AD"}[role], info
+
+    voice = tracker.assign(emb)
+    info["voice"] = voice
+    tracker.observe(hop_idx, voice)
+    return ("GUEST" if tracker.is_guest(voice) else "AD"), info
+
+
+# ==========================================
+# 3. 실행
+# ==========================================
+def run(date_str, source, profile_path=DJ_PROFILE, output_csv=None, realtime=True, index_path=None):
+    output_csv = output_csv or os.path.join(BASE_PATH, date_str, "transcript", f"{date_str}-live_labels.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+
+    print(f"📥 Loading DJ profile: {profile_path}")
+    dj_profile = load_dj_profile(profile_path)
+    inference = load_embedder()
+
+    index = None
+    if index_path:
+        from speaker_index import SpeakerIndex
+        index = SpeakerIndex.load(index_path)
+        print(f"📚 Speaker index: {index_path} ({len(index)} voices)")
+
+    hop = int(HOP_SEC * SAMPLE_RATE)
+    ring = RingBuffer(int(WINDOW_SEC * SAMPLE_RATE))
+    tracker = VoiceTracker()
+
+    stream = open_stream(source, realtime=realtime)
+    print(f"📡 Listening: {source} (window {WINDOW_SEC:.0f}s, hop {HOP_SEC:.0f}s)")
+
+    latencies = []
+    counts = {}
+    audio_pos = 0
+    hop_idx = 0
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Start Time", "Stop Time", "Label", "DJ_Sim", "Low_Energy_Ratio", "Voice", "Latency"])
+        try:
+            stream_t0 = None   # 오디오 0초 지점이 방송된 wall-clock 시각 (-re 기준)
+            while True:
+                samples = read_samples(stream.stdout, hop)
+                if len(samples) == 0:
+                    break
+                if stream_t0 is None:
+                    stream_t0 = time.time() - len(samples) / SAMPLE_RATE
+                ring.push(samples)
+                start = audio_pos / SAMPLE_RATE
+                audio_pos += len(samples)
+                stop = audio_pos / SAMPLE_RATE
+
+                label, info = classify(ring.view(), inference, dj_profile, tracker, hop_idx, index=index)
+
+                # 지연 = hop 의 가장 오래된 샘플이 방송된 시점 ~ 라벨 출력 (처리가 밀리면 누적됨)
+                latency = time.time() - (stream_t0 + start)
+                latencies.append(latency)
+                counts[label] = counts.get(label, 0) + 1
+
+                writer.writerow([
+                    round(start, 2), round(stop, 2), label,
+                    "" if info["dj_sim"] is None else round(info["dj_sim"], 3),
+                    round(info["low_energy"], 3),
+                    info.get("known") or ("" if info["voice"] is None else f"VOICE_{info['voice']:02d}"),
+                    round(latency, 2),
+                ])
+                f.flush()
+
+                warn = " ⚠️" if latency > MAX_LATENCY else ""
+                print(f"   [{start:7.1f}s ~ {stop:7.1f}s] {label:<7} latency {latency:4.1f}s{warn}")
+
+                hop_idx += 1
+        finally:
+            stream.stdout.close()
+            stream.wait()
+
+    if latencies:
+        lat = np.array(latencies)
+        print(f"\n⏱️  Latency: mean {lat.mean():.1f}s, p95 {np.percentile(lat, 95):.1f}s, max {lat.max():.1f}s "
+              f"({np.mean(lat > MAX_LATENCY) * 100:.1f}% over {MAX_LATENCY:.0f}s)")
+    print(f"🏷️  Labels: {counts}")
+    print(f"💾 Saved to {output_csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python live_ad_detector.py <DATE> (--url URL | --input FILE) [--profile dj_profile.npz]"
+    )
+    parser.add_argument("date", help="YYYYMMDD (출력 파일 이름)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--url", help="라디오 스트림 주소")
+    src.add_argument("--input", help="녹음된 MP3 (실시간 속도로 재생)")
+    parser.add_argument("--profile", default=DJ_PROFILE, help="speaker_embedding.py dj-profile 결과")
+    parser.add_argument("--index", default=None, help="speaker_index.py 인덱스 (알려진 목소리 lookup)")
+    parser.add_argument("--output", default=None, help="출력 CSV (기본: {date}-live_labels.csv)")
+    parser.add_argument("--no-realtime", action="store_true", help="--input 을 최대 속도로 재생 (지연 수치는 무의미)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.profile):
+        print(f"❌ DJ profile not found: {args.profile}")
+        print("   python speaker_embedding.py dj-profile --last 7")
+        sys.exit(1)
+    if args.input and not os.path.exists(args.input):
+        print(f"❌ File not found: {args.input}")
+        sys.exit(1)
+
+    run(args.date, args.url or args.input, profile_path=args.profile,
+        output_csv=args.output, realtime=not args.no_realtime, index_path=args.index)
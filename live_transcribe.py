@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+녹음 중 실시간(증분) 전사
+
+ffmpeg 1개로
+  - 기존과 같은 전체 MP3 ({date}.mp3) 와
+  - N분 단위 16kHz mono WAV 세그먼트 (segments/{date}_000.wav ...)
+를 동시에 기록하고, segment muxer 가 세그먼트를 닫을 때마다 (segment_list csv 에 한 줄 추가됨)
+Whisper 로 전사해서 {date}.txt / {date}.srt / {date}.csv 에 이어 씁니다.
+타임스탬프는 segment_list 의 시작 시각만큼 밀어서 방송 전체 기준으로 맞춥니다.
+→ 방송이 끝나면 마지막 세그먼트 1개만 전사하면 되므로 수 분 안에 최종 전사 완료
+
+Usage:
+  python live_transcribe.py <DATE> --url <STREAM_URL>              # 생방송
+  python live_transcribe.py <DATE> --input local.mp3               # 로컬 파일을 가짜 스트림으로 재생 (-re)
+  python live_transcribe.py <DATE> --input local.mp3 --no-realtime # 테스트용: 최대 속도로 재생
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import subprocess
+
+from whisper_core import (
+    BASE_PATH, TRANSCRIBE_OPTIONS, WHISPER_MODEL_SIZE,
+    format_timestamp, is_hallucination, output_paths, load_model,
+)
+from srt2csv import SegmentCsvWriter, parse_timestamp
+
+SEGMENT_SEC = 300      # 5분 세그먼트
+DURATION_SEC = 7200    # mbc-1800.sh 와 같은 2시간
+POLL_INTERVAL = 2.0
+
+
+# ==========================================
+# 1. 녹음 (전체 MP3 + 세그먼트 WAV)
+# ==========================================
+def start_recorder(source, mp3_file, segment_dir, date_str, duration=DURATION_SEC,
+                   segment_sec=SEGMENT_SEC, realtime=True, input_format=None):
+    """
+    ffmpeg 녹음 프로세스 시작 → (Popen, segment_list 경로)
+    input_format: ffmpeg -f 입력 형식 (예: lavfi, pulse — 없으면 자동)
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(mp3_file)), exist_ok=True)
+    os.makedirs(segment_dir, exist_ok=True)
+    segment_list = os.path.join(segment_dir, f"{date_str}_segments.csv")
+    if os.path.exists(segment_list):
+        os.remove(segment_list)
+
+    cmd = ["ffmpeg", "-nostdin", "-y"]
+    if realtime:
+        cmd += ["-re"]    # 생방송 싱크 / 로컬 파일이면 실시간 재생처럼 흘려보냄
+    # -t 는 -i 앞에 (입력 옵션) → MP3 / 세그먼트 두 출력 모두 duration 에서 끝나고 ffmpeg 가 종료
+    # (-i 뒤에 두면 다음 출력 하나에만 적용되어 생방송 URL 에서는 세그먼트 출력이 끝나지 않음)
+    cmd += ["-t", str(duration)]
+    if input_format:
+        cmd += ["-f", input_format]
+    cmd += ["-i", source]
+    # 출력 1: 기존과 같은 전체 MP3
+    cmd += ["-map", "0:a", "-acodec", "mp3", mp3_file]
+    # 출력 2: Whisper 용 세그먼트 (16kHz mono WAV → 재디코딩 비용 없음)
+    cmd += [
+        "-map", "0:a", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le",
+        "-f", "segment", "-segment_time", str(segment_sec), "-segment_format", "wav",
+        "-segment_list", segment_list, "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        os.path.join(segment_dir, f"{date_str}_%03d.wav"),
+    ]
+
+    print(f"🎙️  Recording {source} → {mp3_file} (+ {segment_sec}s segments)")
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc, segment_list
+
+
+def read_segment_list(segment_list):
+    """완료된 세그먼트 목록 [(wav 경로, 시작 초, 끝 초)] — ffmpeg 가 세그먼트를 닫을 때 한 줄씩 추가"""
+    if not os.path.exists(segment_list):
+        return []
+    base = os.path.dirname(segment_list)
+    entries = []
+    with open(segment_list, "r", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            try:
+                entries.append((os.path.join(base, row[0]), float(row[1]), float(row[2])))
+            except ValueError:
+                continue   # 아직 쓰는 중인 마지막 줄
+    return entries
+
+
+# ==========================================
+# 2. 증분 출력 (TXT / SRT / CSV)
+# ==========================================
+class LiveTranscript:
+    """
+    세그먼트 전사 결과를 방송 전체 기준 시각으로 이어 쓰기
+    CSV 는 SRT 를 다시 읽어 만드는 srt2csv.py 와 같은 값이 나오도록
+    SRT 에 찍히는 ms 단위 시각(parse_timestamp(format_timestamp(x)))을 사용
+    """
+    def __init__(self, output_dir, date_str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_text, self.output_srt = output_paths(output_dir, date_str)
+        self.output_csv = os.path.join(output_dir, f"{date_str}.csv")
+
+        self.f_text = open(self.output_text, "w", encoding="utf-8")
+        self.f_srt = open(self.output_srt, "w", encoding="utf-8")
+        self.f_csv = open(self.output_csv, "w", newline="", encoding="utf-8")
+        self.rows = SegmentCsvWriter(self.f_csv)
+
+        self.seg_idx = 1
+        self.hallucinations = 0
+
+    def append(self, segments, offset):
+        saved = 0
+        for seg in segments:
+            text = seg.text.strip()
+            if not text:
+                continue
+            if is_hallucination(text):
+                self.hallucinations += 1
+                continue
+
+            start = seg.start + offset
+            end = seg.end + offset
+            start_ts, end_ts = format_timestamp(start), format_timestamp(end)
+
+            self.f_text.write(f"[{start_ts} → {end_ts}] {text}\n")
+            self.f_srt.write(f"{self.seg_idx}\n{start_ts} --> {end_ts}\n{text}\n\n")
+            self.rows.write_entry(parse_timestamp(start_ts), parse_timestamp(end_ts), text)
+
+            self.seg_idx += 1
+            saved += 1
+
+        # 세그먼트 단위로 flush → 다른 프로세스가 중간 결과를 바로 읽을 수 있음
+        for f in (self.f_text, self.f_srt, self.f_csv):
+            f.flush()
+        return saved
+
+    def close(self):
+        for f in (self.f_text, self.f_srt, self.f_csv):
+            f.close()
+
+
+# ==========================================
+# 3. 세그먼트 감시 + 전사
+# ==========================================
+def watch(model, segment_list, transcript, recorder=None, poll_interval=POLL_INTERVAL):
+    """
+    segment_list 에 새 세그먼트가 올라올 때마다 전사
+    recorder 가 끝나고 남은 세그먼트까지 모두 처리하면 종료
+    """
+    done = 0
+    while True:
+        # poll 을 먼저 — 목록을 읽은 뒤 ffmpeg 가 마지막 줄을 쓰고 끝나면 마지막 세그먼트를 놓침
+        recording = recorder is not None and recorder.poll() is None
+        entries = read_segment_list(segment_list)
+
+        if done >= len(entries):
+            if not recording:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        wav, seg_start, seg_end = entries[done]
+        t0 = time.time()
+        segments, _ = model.transcribe(wav, **TRANSCRIBE_OPTIONS)
+        saved = transcript.append(segments, seg_start)
+        elapsed = time.time() - t0
+
+        print(f"   ✅ [{format_timestamp(seg_start)} ~ {format_timestamp(seg_end)}] "
+              f"{saved} segments ({elapsed:.1f}s)")
+        done += 1
+
+    return done
+
+
+def run(date_str, source, base_path=BASE_PATH, mp3_file=None, transcript_dir=None,
+        duration=DURATION_SEC, segment_sec=SEGMENT_SEC, realtime=True, model_size=WHISPER_MODEL_SIZE):
+    mp3_dir = os.path.join(base_path, date_str, "mp3")
+    mp3_file = mp3_file or os.path.join(mp3_dir, f"{date_str}.mp3")
+    transcript_dir = transcript_dir or os.path.join(base_path, date_str, "transcript")
+    segment_dir = os.path.join(os.path.dirname(os.path.abspath(mp3_file)), "segments")
+
+    # 녹음이 시작되기 전에 모델을 올려 둠 (첫 세그먼트가 끝날 때 바로 전사)
+    print(f"📥 Loading Whisper model: {model_size}")
+    model = load_model(model_size)
+
+    recorder, segment_list = start_recorder(source, mp3_file, segment_dir, date_str,
+                                            duration=duration, segment_sec=segment_sec,
+                                            realtime=realtime)
+    transcript = LiveTranscript(transcript_dir, date_str)
+    started = time.time()
+    try:
+        count = watch(model, segment_list, transcript, recorder=recorder)
+    finally:
+        transcript.close()
+        if recorder.poll() is None:
+            recorder.terminate()
+        recorder.wait()
+
+    if recorder.returncode not in (0, None):
+        print(f"⚠️  ffmpeg exited with {recorder.returncode}")
+
+    print(f"\n🎉 Live transcription finished: {count} segments, "
+          f"{transcript.seg_idx - 1} lines ({transcript.hallucinations} hallucinations filtered)")
+    print(f"   ⏱️  Total wall time: {(time.time() - started) / 60:.1f} min")
+    print(f"   📄 {transcript.output_srt}\n   📄 {transcript.output_csv}")
+    return recorder.returncode in (0, None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python live_transcribe.py <DATE> (--url URL | --input FILE) [--segment-sec 300]"
+    )
+    parser.add_argument("date", help="YYYYMMDD (출력 파일 이름)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--url", help="라디오 스트림 주소")
+    src.add_argument("--input", help="로컬 오디오 파일 (가짜 스트림 테스트)")
+    parser.add_argument("--duration", type=int, default=DURATION_SEC, help="녹음 길이(초)")
+    parser.add_argument("--segment-sec", type=int, default=SEGMENT_SEC, help="세그먼트 길이(초)")
+    parser.add_argument("--output-mp3", default=None, help="전체 MP3 경로 (기본: BASE_PATH/{date}/mp3/{date}.mp3)")
+    parser.add_argument("--transcript-dir", default=None, help="전사 출력 폴더 (기본: BASE_PATH/{date}/transcript)")
+    parser.add_argument("--no-realtime", action="store_true", help="--input 을 실시간 속도가 아닌 최대 속도로 재생")
+    parser.add_argument("--model", default=WHISPER_MODEL_SIZE, help="Whisper 모델")
+    args = parser.parse_args()
+
+    if args.input and not os.path.exists(args.input):
+        print(f"❌ File not found: {args.input}")
+        sys.exit(1)
+
+    ok = run(args.date, args.url or args.input, mp3_file=args.output_mp3,
+             transcript_dir=args.transcript_dir, duration=args.duration,
+             segment_sec=args.segment_sec, realtime=not args.no_realtime, model_size=args.model)
+    sys.exit(0 if ok else 1)
@@ -2,8 +2,12 @@ import pandas as pd
 import re
 import sys
 import os
+import time
 import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from speaker_matrix import load_for_csv
 
 # ==========================================
 # 1. 화자 정보 파싱 함수
@@ -125,45 +129,228 @@ def decide_label(row, role_map, speaker_stats):
     return 'Program'
 
 # ==========================================
-# 4. 실행 함수
+# 3-1. 컬럼 단위 처리 (기본) — 위 2, 3 과 같은 결과
+# ==========================================
+# get_dominant_speaker() 의 "; 로 나눈 조각마다 re.match" 와 같은 매칭을 문자열 전체에 한 번에
+SPEAKER_PART_PATTERN = r"(?:^|;)\s*(SPEAKER_\d+):[\d\.]+s\(([\d\.]+)\)"
+
+def dominant_speakers(df, matrix=None):
+    """
+    행별 get_dominant_speaker() 결과 (object 배열, 없으면 None) — 정규식은 컬럼 전체에 1회
+    matrix (SpeakerMatrix) 가 있으면 파싱 없이 행별 첫 항목 (텍스트에서 비율이 가장 큰 화자와 같음)
+    """
+    if matrix is not None:
+        return matrix.dominant_speaker()
+    result = np.full(len(df), None, dtype=object)
+    if 'Speakers' not in df.columns or len(df) == 0:
+        return result
+
+    parts = df['Speakers'].astype('string').reset_index(drop=True).str.extractall(SPEAKER_PART_PATTERN)
+    if parts.empty:
+        return result
+
+    # 행별 최대 비율 (동점이면 앞쪽 — 기존 안정 정렬과 같음)
+    ratio = parts[1].astype(float)
+    best = ratio.groupby(level=0).idxmax()
+    result[best.index.to_numpy()] = parts.loc[best.tolist(), 0].to_numpy()
+    return result
+
+def analyze_turns(dominant, role_map):
+    """
+    analyze_speaker_characteristics() 와 같은 결과를 turn 시퀀스 1회 순회로
+    (화자마다 시퀀스 전체를 다시 훑지 않음)
+    """
+    speaker_counts = {}
+    speaker_sequence = []
+    for spk in dominant:
+        if spk:
+            speaker_counts[spk] = speaker_counts.get(spk, 0) + 1
+            # 연속된 동일 화자 병합
+            if not speaker_sequence or speaker_sequence[-1] != spk:
+                speaker_sequence.append(spk)
+
+    is_dj = [role_map.get(spk) == 'DJ' for spk in speaker_sequence]
+    last = len(speaker_sequence) - 1
+    turns = dict.fromkeys(speaker_counts, 0)
+    interactions = dict.fromkeys(speaker_counts, 0)
+    for i, spk in enumerate(speaker_sequence):
+        turns[spk] += 1
+        # 앞뒤에 DJ가 있으면 Interaction 인정
+        if (i > 0 and is_dj[i - 1]) or (i < last and is_dj[i + 1]):
+            interactions[spk] += 1
+
+    return {
+        spk: {
+            'count': count,
+            'interaction_rate': interactions[spk] / turns[spk] if turns[spk] else 0
+        }
+        for spk, count in speaker_counts.items()
+    }
+
+def decide_labels(df, dominant, role_map, speaker_stats):
+    """decide_label() 규칙을 np.select 한 번으로 (조건 순서 = 규칙 우선순위)"""
+    n = len(df)
+    if 'Type' in df.columns:
+        seg_type = df['Type'].astype(str).str.lower().str.strip()
+        is_music = seg_type.str.contains('music', regex=False, na=False).to_numpy()
+        is_silence = seg_type.str.contains('silence', regex=False, na=False).to_numpy()
+    else:
+        is_music = is_silence = np.zeros(n, dtype=bool)
+
+    if 'Start Time' in df.columns and 'Stop Time' in df.columns:
+        duration = (pd.to_numeric(df['Stop Time'], errors='coerce')
+                    - pd.to_numeric(df['Start Time'], errors='coerce')).to_numpy(dtype=float)
+    else:
+        duration = np.zeros(n)
+
+    dom = pd.Series(dominant)
+    role = dom.map(role_map).to_numpy(dtype=object)
+    count = dom.map({spk: st['count'] for spk, st in speaker_stats.items()}).fillna(0).to_numpy(dtype=float)
+    rate = dom.map({spk: st['interaction_rate'] for spk, st in speaker_stats.items()}).fillna(0).to_numpy(dtype=float)
+
+    conditions = [
+        is_music,                                   # 1. 비발화 구간
+        is_silence,
+        dom.isna().to_numpy(),                      # 2. 화자 없음
+        role == 'DJ',                               # 3. 절대 기준
+        role == 'AD_SPEAKER',
+        (rate >= 0.2) & (count >= 5),               # [Step 1] 게스트 인증
+        (duration >= 0.5) & (duration <= 100.0),    # [Step 2] 나머지는 광고
+    ]
+    choices = ['Music', 'Silence', 'Program', 'DJ', 'AD', 'Guest', 'AD']
+    return np.select(conditions, choices, default='Program')
+
+# ==========================================
+# 4. 오디오 핑거프린트 매칭 (ad_fingerprint.py)
 # ==========================================
-def process_date(date_str, base_path):
+def apply_ad_matches(df, matches, min_overlap=0.5):
+    """
+    알려진 광고 구간({date}-ad_matches.csv)과 절반 이상 겹치는 행은 AD 로 덮어씀
+    녹음된 광고 소리 자체가 일치한 것이므로 화자/역할 추정보다 우선
+
+    Returns:
+        덮어쓴 행 수
+    """
+    start = pd.to_numeric(df['Start Time'], errors='coerce').to_numpy(dtype=float)
+    stop = pd.to_numeric(df['Stop Time'], errors='coerce').to_numpy(dtype=float)
+    duration = stop - start
+
+    overlap = np.zeros(len(df))
+    ad_id = np.full(len(df), '', dtype=object)
+    best = np.zeros(len(df))
+    for m_start, m_stop, m_id in zip(matches['Start Time'], matches['Stop Time'], matches['Ad_ID']):
+        ov = np.clip(np.minimum(stop, m_stop) - np.maximum(start, m_start), 0, None)
+        overlap += ov
+        better = ov > best
+        ad_id[better] = f"AD_{int(m_id):04d}"
+        best[better] = ov[better]
+
+    hit = (duration > 0) & (overlap >= min_overlap * duration)
+    df['AD_Match'] = np.where(hit, ad_id, '')
+    df.loc[hit, 'Predicted_Label'] = 'AD'
+    return int(hit.sum())
+
+# ==========================================
+# 5. 실행 함수
+# ==========================================
+def label_segments(df_data, role_map, matches=None, legacy=False, matrix=None):
+    """
+    세그먼트 DataFrame 에 Predicted_Label (+ AD_Match) 컬럼을 채워 반환 (df_data 를 그대로 수정)
+    matches: {date}-ad_matches.csv DataFrame (없으면 None)
+    legacy:  기존 row 단위 analyze_speaker_characteristics / decide_label (결과 비교용)
+    matrix:  SpeakerMatrix (df_data 와 같은 행 순서, 없으면 Speakers 텍스트 파싱)
+    """
+    print("  ⏱️  Analyzing speaker patterns (Simpler is Better)...")
+    if legacy:
+        speaker_stats = analyze_speaker_characteristics(df_data, role_map)
+    else:
+        # 화자 파싱은 행마다 1회 → 패턴 분석과 라벨링이 같이 사용
+        dominant = dominant_speakers(df_data, matrix=matrix)
+        speaker_stats = analyze_turns(dominant, role_map)
+
+    print("  🏷️  Applying final labels...")
+    if legacy:
+        df_data['Predicted_Label'] = df_data.apply(
+            lambda row: decide_label(row, role_map, speaker_stats), 
+            axis=1
+        )
+    else:
+        df_data['Predicted_Label'] = decide_labels(df_data, dominant, role_map, speaker_stats)
+
+    if matches is not None:
+        n = apply_ad_matches(df_data, matches)
+        print(f"  🔎 Fingerprint: {len(matches)} known ads → {n} rows set to AD")
+    return df_data
+
+def process_date(date_str, base_path, use_ad_matches=True, legacy=False):
+    """→ 라벨링한 행 수 (입력이 없으면 None)"""
     print(f"🚀 Processing: {date_str} ...")
     
     transcript_dir = os.path.join(base_path, date_str, "transcript")
     input_csv = os.path.join(transcript_dir, f"{date_str}_with_speaker_ratio.csv")
     stats_csv = os.path.join(transcript_dir, f"{date_str}-dj_stats.csv")
     output_csv = os.path.join(transcript_dir, f"{date_str}-inference_result_ratio.csv")
+    matches_csv = os.path.join(transcript_dir, f"{date_str}-ad_matches.csv")
 
     if not os.path.exists(input_csv) or not os.path.exists(stats_csv):
         print("  ❌ Files missing.")
-        return
+        return None
 
     df_data = pd.read_csv(input_csv)
     df_stats = pd.read_csv(stats_csv)
     role_map = dict(zip(df_stats['Speaker'], df_stats['Role']))
+    matrix = load_for_csv(input_csv, len(df_data))
 
-    print("  ⏱️  Analyzing speaker patterns (Simpler is Better)...")
-    speaker_stats = analyze_speaker_characteristics(df_data, role_map)
-
-    print("  🏷️  Applying final labels...")
-    df_data['Predicted_Label'] = df_data.apply(
-        lambda row: decide_label(row, role_map, speaker_stats), 
-        axis=1
-    )
+    matches = None
+    if use_ad_matches and os.path.exists(matches_csv):
+        matches = pd.read_csv(matches_csv)
+    label_segments(df_data, role_map, matches, legacy=legacy, matrix=matrix)
 
     df_data.to_csv(output_csv, index=False, encoding='utf-8-sig')
     print(f"  ✅ Created: {output_csv}")
+    return len(df_data)
+
+def _process_date_job(job):
+    return process_date(*job)
+
+def process_dates(dates, base_path, use_ad_matches=True, workers=1, legacy=False):
+    """여러 날짜를 프로세스 풀로 (날짜 단위 독립) → 처리량 요약 출력"""
+    jobs = [(d, base_path, use_ad_matches, legacy) for d in dates]
+    started = time.time()
+    if workers <= 1:
+        rows = [_process_date_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_process_date_job, jobs))
+    elapsed = time.time() - started
+
+    done = [r for r in rows if r is not None]
+    total = sum(done)
+    print("\n" + "=" * 50)
+    print(f"📊 {len(done)}/{len(dates)} dates, {total} rows in {elapsed:.1f}s "
+          f"→ {total / max(elapsed, 1e-9):,.0f} rows/s ({workers} workers)")
+    missing = [d for d, r in zip(dates, rows) if r is None]
+    if missing:
+        print(f"   ⚠️  Files missing: {', '.join(missing)}")
+    print("=" * 50)
+    return rows
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("date", help="Target Date")
     parser.add_argument("--base_dir", default="/mnt/home_dnlab/jhjung/radio/baechulsu")
+    parser.add_argument("--ignore_ad_matches", action="store_true",
+                        help="{date}-ad_matches.csv (ad_fingerprint.py) 가 있어도 사용하지 않음")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="'all' 에서 동시에 처리할 날짜 수")
+    parser.add_argument("--legacy", action="store_true",
+                        help="기존 row 단위 경로로 실행 (컬럼 처리 결과와 diff 용)")
     args = parser.parse_args()
 
     if args.date == 'all':
         if not os.path.exists(args.base_dir): sys.exit(1)
-        for d in sorted(os.listdir(args.base_dir)):
-            if d.isdigit() and len(d) == 8: process_date(d, args.base_dir)
+        dates = [d for d in sorted(os.listdir(args.base_dir)) if d.isdigit() and len(d) == 8]
+        process_dates(dates, args.base_dir, not args.ignore_ad_matches,
+                      workers=args.workers, legacy=args.legacy)
     else:
-        process_date(args.date, args.base_dir)
\ No newline at end of file
+        process_date(args.date, args.base_dir, not args.ignore_ad_matches, legacy=args.legacy)
\ No newline at end of file
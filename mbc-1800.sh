@@ -8,6 +8,10 @@ export PATH
 WORK_DIR="/mnt/home_dnlab/jhjung/radio/mbc_radio"
 DATE=$(date +%y%m%d%H%M)
 FILENAME="mbc-${DATE}.mp3"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+
+# LIVE=1 이면 녹음하면서 5분 단위로 바로 전사 (live_transcribe.py)
+LIVE="${LIVE:-0}"
 
 # 3. 폴더 이동
 mkdir -p "$WORK_DIR"
@@ -29,7 +33,14 @@ echo "URL Found: $STREAM_URL"
 
 # 6. 녹음 시작 (2시간)
 # -re 옵션은 생방송 녹음 시 싱크를 맞춰줍니다.
-ffmpeg -y -re -i "$STREAM_URL" -t 7200 -acodec mp3 "$FILENAME" > /dev/null 2>&1
+if [ "$LIVE" = "1" ]; then
+    # 같은 MP3 를 기록하면서 세그먼트별 전사 → transcript/mbc-${DATE}.srt/.csv 에 이어 씀
+    python "$SCRIPT_DIR/live_transcribe.py" "mbc-${DATE}" --url "$STREAM_URL" --duration 7200 \
+        --output-mp3 "$WORK_DIR/$FILENAME" --transcript-dir "$WORK_DIR/transcript" \
+        >> "$WORK_DIR/live-${DATE}.log" 2>&1
+else
+    ffmpeg -y -re -i "$STREAM_URL" -t 7200 -acodec mp3 "$FILENAME" > /dev/null 2>&1
+fi
 
 # 7. 권한 설정
 chmod 644 "$FILENAME"
\ No newline at end of file
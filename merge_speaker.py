@@ -2,6 +2,8 @@ import pandas as pd
 import re
 import sys
 
+from speaker_overlap import OverlapIndex, best_speaker
+
 def parse_diarization(file_path):
     """diarization.txt 파일을 읽어 리스트로 반환"""
     segments = []
@@ -19,29 +21,18 @@ def parse_diarization(file_path):
                 })
     return segments
 
-def get_best_speaker(start, stop, diar_segments):
+def get_best_speaker(start, stop, diar_index):
     """특정 시간대(start~stop)에 가장 많이 겹치는 화자를 반환"""
-    overlap_dict = {}
-    
-    for seg in diar_segments:
-        # 두 구간이 겹치는 영역 계산
-        overlap_start = max(start, seg['start'])
-        overlap_stop = min(stop, seg['stop'])
-        
-        if overlap_start < overlap_stop:
-            duration = overlap_stop - overlap_start
-            overlap_dict[seg['speaker']] = overlap_dict.get(seg['speaker'], 0) + duration
-            
-    if not overlap_dict:
-        return "UNKNOWN"
-    
+    overlap_dict, _ = diar_index.overlaps(start, stop)
+
     # 가장 오래 말한 화자 반환
-    return max(overlap_dict, key=overlap_dict.get)
+    return best_speaker(overlap_dict)
 
 def merge(csv_file, diar_file, output_file):
     # 1. 데이터 로드
     df = pd.read_csv(csv_file)
     diar_segments = parse_diarization(diar_file)
+    diar_index = OverlapIndex(diar_segments)
     
     # 2. Speaker 컬럼 추가 (기본값 설정)
     df['Speaker'] = ""
@@ -49,7 +40,7 @@ def merge(csv_file, diar_file, output_file):
     # 3. Speech 타입인 경우에만 화자 매핑
     for idx, row in df.iterrows():
         if row['Type'] == 'speech':
-            speaker = get_best_speaker(row['Start Time'], row['Stop Time'], diar_segments)
+            speaker = get_best_speaker(row['Start Time'], row['Stop Time'], diar_index)
             df.at[idx, 'Speaker'] = speaker
         else:
             # music이나 silence 구간은 화자 정보 제외
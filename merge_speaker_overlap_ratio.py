@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 import pandas as pd
+import numpy as np
 import re
 import sys
 import os
+import argparse
+
+from speaker_overlap import OverlapIndex, format_speaker_ratios
+from speaker_matrix import SpeakerMatrix, matrix_path
 
 # =====================================================
 # diarization.txt 파싱
@@ -28,28 +33,12 @@ def parse_diarization(file_path):
 # =====================================================
 # Speaker 겹침 비율 계산
 # =====================================================
-def get_speaker_overlap_ratios(start, stop, diar_segments):
-    overlap = {}
-    total_overlap = 0.0
-
-    for seg in diar_segments:
-        overlap_start = max(start, seg["start"])
-        overlap_stop = min(stop, seg["stop"])
-
-        if overlap_start < overlap_stop:
-            dur = overlap_stop - overlap_start
-            overlap[seg["speaker"]] = overlap.get(seg["speaker"], 0.0) + dur
-            total_overlap += dur
-
-    if not overlap or total_overlap == 0:
-        return ""
-
-    parts = []
-    for spk, dur in sorted(overlap.items(), key=lambda x: x[1], reverse=True):
-        ratio = dur / total_overlap
-        parts.append(f"{spk}:{dur:.2f}s({ratio:.3f})")
-
-    return ";".join(parts)
+def get_speaker_overlap_ratios(start, stop, diar_index):
+    """
+    diar_index: speaker_overlap.OverlapIndex (merge()에서 한 번만 생성)
+    """
+    overlap, total_overlap = diar_index.overlaps(start, stop)
+    return format_speaker_ratios(overlap, total_overlap)
 
 # =====================================================
 # ⭐ 안전한 Transcript 체크 함수
@@ -77,26 +66,22 @@ def has_transcript(row):
     
     return True
 
-# =====================================================
-# CSV + diarization 병합
-# =====================================================
-def merge(csv_file, diar_file, output_file):
-    print("📥 Loading CSV...")
-    df = pd.read_csv(csv_file)
-    
-    print(f"   Columns: {df.columns.tolist()}")
-    print(f"   Total: {len(df)} segments")
+def transcript_mask(df):
+    """
+    has_transcript()와 같은 판정을 컬럼 단위로 한 번에 계산 (bool Series)
+    """
+    if "Transcript" not in df.columns:
+        return pd.Series(False, index=df.index)
 
-    print("\n📥 Loading Diarization...")
-    diar_segments = parse_diarization(diar_file)
-    print(f"   Total: {len(diar_segments)} speaker segments")
-    
-    speakers = set(seg['speaker'] for seg in diar_segments)
-    print(f"   Speakers: {sorted(speakers)}")
+    transcript = df["Transcript"]
+    stripped = transcript.astype(str).str.strip()
 
-    # Speakers 컬럼 초기화
-    df["Speakers"] = ""
+    return transcript.notna() & stripped.ne("") & stripped.str.lower().ne("nan")
 
+# =====================================================
+# Step 1~3: 기존 row 단위 처리 (--legacy, 결과 비교용)
+# =====================================================
+def merge_rows_legacy(df, diar_index):
     # Step 1: speech → music 변환
     print("\n🎵 Converting empty-transcript speech to music...")
     empty_count = 0
@@ -120,7 +105,7 @@ def merge(csv_file, diar_file, output_file):
                 speakers_str = get_speaker_overlap_ratios(
                     row["Start Time"],
                     row["Stop Time"],
-                    diar_segments
+                    diar_index
                 )
                 df.at[idx, "Speakers"] = speakers_str
                 speaker_count += 1
@@ -137,39 +122,117 @@ def merge(csv_file, diar_file, output_file):
             cleaned_count += 1
     
     print(f"   ✅ Cleaned {cleaned_count} segments")
+    return df
+
+# =====================================================
+# Step 1~3: 컬럼 단위 처리 (기본)
+# =====================================================
+def merge_rows_columnar(df, diar_index):
+    """→ (df, {행 위치: (화자별 겹침 dict, total)}) — 겹침 결과는 SpeakerMatrix 로도 저장"""
+    # Transcript 마스크는 한 번만 계산 (Type 변환과 무관)
+    has_text = transcript_mask(df)
+
+    # Step 1: speech → music 변환
+    print("\n🎵 Converting empty-transcript speech to music...")
+    to_music = df["Type"].eq("speech") & ~has_text
+    df.loc[to_music, "Type"] = "music"
+    print(f"   ✅ Converted {int(to_music.sum())} speech segments to music")
 
-    # Step 4: 저장
+    # Step 2: Speaker 계산 (Transcript 있는 speech/music 만)
+    print("\n🔄 Calculating speaker ratios...")
+    targets = has_text & df["Type"].isin(["speech", "music"])
+    overlaps = {
+        row: diar_index.overlaps(start, stop)
+        for row, start, stop in zip(np.flatnonzero(targets.to_numpy()),
+                                    df.loc[targets, "Start Time"], df.loc[targets, "Stop Time"])
+    }
+    df.loc[targets, "Speakers"] = [format_speaker_ratios(*overlaps[row]) for row in sorted(overlaps)]
+    print(f"   ✅ Added speakers to {int(targets.sum())} segments")
+
+    # Step 3: 최종 검증
+    print("\n🧹 Final validation...")
+    dirty = ~has_text & df["Speakers"].ne("")
+    df.loc[dirty, "Speakers"] = ""
+    for row in np.flatnonzero(dirty.to_numpy()):
+        overlaps.pop(row, None)
+    print(f"   ✅ Cleaned {int(dirty.sum())} segments")
+    return df, overlaps
+
+# =====================================================
+# CSV + diarization 병합
+# =====================================================
+def merge_frame(df, diar_segments, legacy=False, with_matrix=False):
+    """
+    세그먼트 DataFrame에 Speakers 컬럼을 채워 반환 (df는 그대로 수정됨)
+    with_matrix: (df, SpeakerMatrix) 반환 (legacy 경로는 행렬 없음 → None)
+    """
+    speakers = set(seg['speaker'] for seg in diar_segments)
+    print(f"   Speakers: {sorted(speakers)}")
+
+    # 화자 구간 인덱스 (정렬 1회)
+    diar_index = OverlapIndex(diar_segments)
+
+    # Speakers 컬럼 초기화
+    df["Speakers"] = ""
+
+    if legacy:
+        df = merge_rows_legacy(df, diar_index)
+        return (df, None) if with_matrix else df
+
+    df, overlaps = merge_rows_columnar(df, diar_index)
+    if with_matrix:
+        return df, SpeakerMatrix.from_overlaps(overlaps, len(df))
+    return df
+
+def merge(csv_file, diar_file, output_file, legacy=False):
+    print("📥 Loading CSV...")
+    df = pd.read_csv(csv_file)
+    
+    print(f"   Columns: {df.columns.tolist()}")
+    print(f"   Total: {len(df)} segments")
+
+    print("\n📥 Loading Diarization...")
+    diar_segments = parse_diarization(diar_file)
+    print(f"   Total: {len(diar_segments)} speaker segments")
+
+    df, matrix = merge_frame(df, diar_segments, legacy=legacy, with_matrix=True)
+
+    # Step 4: 저장 (CSV 먼저 → 행렬 파일이 CSV 보다 새것이어야 소비자가 사용)
     df.to_csv(output_file, index=False, encoding="utf-8-sig")
     print(f"\n✅ Saved: {output_file}")
+    if matrix is not None:
+        matrix.save(matrix_path(output_file))
+        print(f"✅ Saved: {matrix_path(output_file)} ({len(matrix.data)} speaker overlaps)")
     print(f"   Total segments: {len(df)}")
     
     # 최종 검증
     print("\n🔍 Final check:")
-    problem_count = 0
-    for idx, row in df.iterrows():
-        if not has_transcript(row) and row["Speakers"]:
-            print(f"   ❌ [{row['Start Time']:.1f}] {row['Type']}: Speakers={row['Speakers'][:50]}")
-            problem_count += 1
+    problems = df[~transcript_mask(df) & df["Speakers"].ne("")]
+    for _, row in problems.iterrows():
+        print(f"   ❌ [{row['Start Time']:.1f}] {row['Type']}: Speakers={row['Speakers'][:50]}")
     
-    if problem_count == 0:
+    if len(problems) == 0:
         print("   ✅ Perfect! No problems found!")
     else:
-        print(f"   ⚠️  Still {problem_count} problems!")
+        print(f"   ⚠️  Still {len(problems)} problems!")
 
 # =====================================================
 # main
 # =====================================================
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python merge_speaker_overlap_ratio.py <YYYYMMDD>")
-        sys.exit(1)
-
-    date_str = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--legacy", action="store_true",
+                        help="기존 iterrows 경로로 실행 (컬럼 처리 결과와 diff 용)")
+    parser.add_argument("--output", help="출력 CSV 경로 (기본: <date>_with_speaker_ratio.csv)")
+    args = parser.parse_args()
+
+    date_str = args.date
     base_dir = f"/mnt/home_dnlab/jhjung/radio/baechulsu/{date_str}/transcript"
     
     csv_in = os.path.join(base_dir, f"{date_str}.csv")
     diar_in = os.path.join(base_dir, f"{date_str}_diarization.txt")
-    out = os.path.join(base_dir, f"{date_str}_with_speaker_ratio.csv")
+    out = args.output or os.path.join(base_dir, f"{date_str}_with_speaker_ratio.csv")
     
     if not os.path.exists(csv_in):
         print(f"❌ CSV not found: {csv_in}")
@@ -179,4 +242,4 @@ if __name__ == "__main__":
         print(f"❌ Diarization not found: {diar_in}")
         sys.exit(1)
     
-    merge(csv_in, diar_in, out)
\ No newline at end of file
+    merge(csv_in, diar_in, out, legacy=args.legacy)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+작은 의존성 그래프(DAG) 실행기 (auto_run.py 용)
+
+- 의존성이 없는 stage 는 동시에 실행
+- 자원(resource)별 동시 실행 슬롯 제한 (예: GPU 1장당 1개 작업)
+- 출력 파일이 입력 파일보다 새로우면 stage 건너뜀
+- 실행 후 stage별 소요 시간 리포트 출력
+"""
+import os
+import time
+import queue
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """
+    name:     stage 이름 (deps 에서 참조)
+    action:   명령어 리스트(subprocess) 또는 callable(env)
+    inputs:   입력 파일 목록 (최신 여부 판단)
+    outputs:  출력 파일 목록 (비어 있으면 항상 실행)
+    deps:     먼저 끝나야 하는 stage 이름들
+    resource: 필요한 자원 이름 (예: "gpu", "cpu") — None 이면 제한 없음
+    """
+
+    def __init__(self, name, action, inputs=(), outputs=(), deps=(), resource=None):
+        self.name = name
+        self.action = action
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.resource = resource
+
+        # 실행 결과
+        self.status = "pending"   # pending / ran / skipped / failed / blocked
+        self.slot = None
+        self.started = None
+        self.elapsed = 0.0
+        self.error = None
+
+
+def is_up_to_date(stage):
+    """모든 출력이 존재하고, 가장 오래된 출력이 가장 새로운 입력보다 새로우면 True"""
+    if not stage.outputs:
+        return False
+    if not all(os.path.exists(p) for p in stage.outputs):
+        return False
+
+    existing_inputs = [p for p in stage.inputs if os.path.exists(p)]
+    if not existing_inputs:
+        return True
+
+    oldest_output = min(os.path.getmtime(p) for p in stage.outputs)
+    newest_input = max(os.path.getmtime(p) for p in existing_inputs)
+    return oldest_output >= newest_input
+
+
+def slot_env(resource, slot):
+    """stage 에 넘길 환경변수 (GPU 슬롯이면 해당 장치만 보이게)"""
+    env = os.environ.copy()
+    if resource == "gpu" and slot is not None:
+        env["CUDA_VISIBLE_DEVICES"] = str(slot)
+    return env
+
+
+def run_dag(stages, resources=None, force=False):
+    """
+    stages:    Stage 리스트
+    resources: {"gpu": ["0", "1"], "cpu": [None, None]} 처럼 자원별 슬롯 목록
+    force:     최신 여부와 상관없이 모두 실행
+
+    Returns:
+        모든 stage 가 성공(또는 skip)했으면 True
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        for dep in s.deps:
+            if dep not in by_name:
+                raise ValueError(f"Unknown dependency '{dep}' in stage '{s.name}'")
+
+    # 자원별 슬롯 풀
+    pools = {}
+    for name, slots in (resources or {}).items():
+        pools[name] = queue.Queue()
+        for slot in slots:
+            pools[name].put(slot)
+
+    print_lock = threading.Lock()
+    t0 = time.time()
+
+    def execute(stage):
+        if not force and is_up_to_date(stage):
+            stage.status = "skipped"
+            with print_lock:
+                print(f"⏭️  [{stage.name}] up to date - skipping")
+            return stage
+
+        pool = pools.get(stage.resource)
+        slot = pool.get() if pool is not None else None
+        stage.slot = slot
+        begin = time.time()
+        try:
+            with print_lock:
+                where = f" ({stage.resource}:{slot})" if slot is not None else ""
+                print(f"🚀 [{stage.name}] start{where}")
+
+            stage.started = begin - t0
+            env = slot_env(stage.resource, slot)
+
+            if callable(stage.action):
+                stage.action(env)
+            else:
+                subprocess.run(stage.action, check=True, env=env)
+
+            stage.elapsed = time.time() - begin
+            stage.status = "ran"
+            with print_lock:
+                print(f"✅ [{stage.name}] done in {stage.elapsed:.1f}s")
+        except Exception as e:
+            stage.elapsed = time.time() - begin
+            stage.status = "failed"
+            stage.error = str(e)
+            with print_lock:
+                print(f"❌ [{stage.name}] failed: {e}")
+        finally:
+            if pool is not None:
+                pool.put(slot)
+        return stage
+
+    remaining = {s.name for s in stages}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(len(stages), 1)) as executor:
+        while remaining or running:
+            # 실행 가능한 stage 제출
+            for name in sorted(remaining):
+                stage = by_name[name]
+                dep_states = [by_name[d].status for d in stage.deps]
+
+                if any(st in ("failed", "blocked") for st in dep_states):
+                    stage.status = "blocked"
+                    remaining.discard(name)
+                    with print_lock:
+                        print(f"⛔ [{name}] blocked by failed dependency")
+                    continue
+
+                if all(st in ("ran", "skipped") for st in dep_states):
+                    remaining.discard(name)
+                    running[executor.submit(execute, stage)] = name
+
+            if not running:
+                # 순환 의존성 등으로 더 진행할 수 없음
+                for name in remaining:
+                    by_name[name].status = "blocked"
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future)
+
+    print_report(stages, time.time() - t0)
+    return all(s.status in ("ran", "skipped") for s in stages)
+
+
+def print_report(stages, wall):
+    """stage별 타이밍 리포트"""
+    print("\n" + "=" * 64)
+    print(f"{'Stage':<14} {'Status':<8} {'Slot':<8} {'Start':>8} {'Elapsed':>10}")
+    print("-" * 64)
+    for s in stages:
+        slot = f"{s.resource}:{s.slot}" if s.slot is not None else (s.resource or "-")
+        start = f"{s.started:.1f}s" if s.started is not None else "-"
+        elapsed = f"{s.elapsed:.1f}s" if s.status in ("ran", "failed") else "-"
+        print(f"{s.name:<14} {s.status:<8} {slot:<8} {start:>8} {elapsed:>10}")
+    print("-" * 64)
+
+    busy = sum(s.elapsed for s in stages)
+    print(f"Wall time: {wall:.1f}s | Sum of stage times: {busy:.1f}s")
+    print("=" * 64)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+전사 이후 단계(Step 3, 5~8)를 한 프로세스에서 실행 — 단계 사이는 DataFrame 으로 전달
+
+  {date}.srt ─ srt2csv ─┐
+  diarization.txt ──────┴─ merge ─ dj_stats ─┬─ blocks        → {date}-blocks.csv
+                                             └─ ground_truth  → {date}-inference_result_ratio.csv
+                                                (ad_matches.csv 가 있으면 반영)
+
+whisper-direct.py --jsonl 결과({date}.jsonl + {date}.csv)가 있으면 SRT 대신 그 CSV 를 바로 사용합니다.
+기존처럼 단계마다 CSV 를 쓰고 다시 pandas 로 읽지 않습니다
+(_with_speaker_ratio.csv 는 dj_stats / blocks / ground_truth 가 각각 다시 읽던 파일).
+중간 파일은 --keep 으로 고른 것만 씁니다 (--debug = 전부). 결과 내용은 단계별 스크립트와 같습니다.
+
+Usage:
+  python postprocess.py <YYYYMMDD> [--keep ratio stats] [--debug] [--index speaker_index.npz] [--update-index]
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+from srt2csv import CSV_HEADER, srt_to_rows, srt_to_csv
+from merge_speaker_overlap_ratio import parse_diarization, merge_frame
+from dj_stat_ratio5 import build_stats
+from dj_merge_block3 import build_blocks
+from make_ground_truth import label_segments
+from speaker_matrix import matrix_path
+
+# ==========================================
+# 설정
+# ==========================================
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
+
+# 중간 파일 이름 → (경로 접미사, 단계별 스크립트가 쓰던 인코딩)
+INTERMEDIATES = {
+    "csv": (".csv", "utf-8"),
+    "ratio": ("_with_speaker_ratio.csv", "utf-8-sig"),
+    "stats": ("-dj_stats.csv", "utf-8"),
+}
+
+# pd.read_csv 기본 NA 문자열 (keep_default_na=True) — Transcript 가 "nan" 인 행도 NaN 으로 읽힘
+CSV_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+def date_paths(date_str, base_path=BASE_PATH):
+    transcript_dir = os.path.join(base_path, date_str, "transcript")
+    path = lambda suffix: os.path.join(transcript_dir, f"{date_str}{suffix}")
+    return {
+        "srt": path(".srt"),
+        "jsonl": path(".jsonl"),
+        "diar": path("_diarization.txt"),
+        "ad_matches": path("-ad_matches.csv"),
+        "blocks": path("-blocks.csv"),
+        "ground_truth": path("-inference_result_ratio.csv"),
+        **{name: path(suffix) for name, (suffix, _) in INTERMEDIATES.items()},
+    }
+
+# ==========================================
+# CSV 왕복과 같은 dtype 으로 맞추기
+# ==========================================
+def as_read_csv(df):
+    """
+    pd.read_csv 로 다시 읽은 것과 같은 값/dtype 으로 정리
+    (빈 문자열 / "nan" 등 → NaN, 전부 비어 있는 컬럼 → float64)
+    다음 단계들이 isinstance(x, str) / pd.isna 로 빈 값을 판정하므로 파일 경유 결과와 맞추려면 필요
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        values = df[col].mask(df[col].isin(CSV_NA_VALUES))
+        df[col] = values.astype(float) if values.isna().all() else values
+    return df
+
+def segments_frame(srt_file):
+    """SRT → 세그먼트 DataFrame ({date}.csv 를 읽은 것과 같은 내용)"""
+    return as_read_csv(pd.DataFrame(srt_to_rows(srt_file), columns=CSV_HEADER))
+
+# ==========================================
+# 메모리 파이프라인 (파일 I/O 없음)
+# ==========================================
+def run_frames(segments, diar_segments, matches=None, date_str=None, index_path=None):
+    """
+    segments:      {date}.csv 내용 (DataFrame)
+    diar_segments: parse_diarization() 결과
+    matches:       {date}-ad_matches.csv 내용 (없으면 None)
+
+    Returns:
+        {"ratio", "matrix", "stats", "blocks", "ground_truth", "speakers", "timings"}
+        matrix: 행 × 화자 겹침 SpeakerMatrix (다음 단계들이 Speakers 텍스트 대신 사용)
+    """
+    timings = {}
+
+    t0 = time.time()
+    print("\n🔗 [merge] Merging Transcript and Diarization...")
+    ratio, matrix = merge_frame(segments.copy(), diar_segments, with_matrix=True)
+    ratio = as_read_csv(ratio)
+    timings["merge"] = time.time() - t0
+
+    t0 = time.time()
+    print("\n🧠 [dj_stats] Analyzing Roles...")
+    stats, speakers = build_stats(ratio, date_str, index_path=index_path, matrix=matrix)
+    timings["dj_stats"] = time.time() - t0
+    role_map = dict(zip(stats["Speaker"], stats["Role"])) if not stats.empty else {}
+
+    t0 = time.time()
+    print("\n🧱 [blocks] Merging Blocks...")
+    blocks = build_blocks(ratio, role_map, matrix=matrix)
+    timings["blocks"] = time.time() - t0
+
+    t0 = time.time()
+    print("\n🏷️  [ground_truth] Creating Ground Truth...")
+    ground_truth = label_segments(ratio.copy(), role_map, matches, matrix=matrix)
+    timings["ground_truth"] = time.time() - t0
+
+    return {"ratio": ratio, "matrix": matrix, "stats": stats, "blocks": blocks,
+            "ground_truth": ground_truth, "speakers": speakers, "timings": timings}
+
+# ==========================================
+# 날짜 단위 실행 (입력 1회 로드, 결과 1회 저장)
+# ==========================================
+def run_date(date_str, base_path=BASE_PATH, keep=(), index_path=None, update_index=False,
+             use_ad_matches=True):
+    paths = date_paths(date_str, base_path)
+    started = time.time()
+
+    # 전사 결과: whisper --jsonl 이 같은 패스에서 쓴 {date}.csv → SRT → 이미 만들어진 {date}.csv (live_transcribe 등)
+    structured = os.path.exists(paths["jsonl"]) and os.path.exists(paths["csv"])
+    if not structured and os.path.exists(paths["srt"]):
+        print(f"📥 Loading SRT: {paths['srt']}")
+        segments = segments_frame(paths["srt"])
+    elif os.path.exists(paths["csv"]):
+        print(f"📥 Loading CSV: {paths['csv']}")
+        segments = pd.read_csv(paths["csv"])
+        keep = [k for k in keep if k != "csv"]
+    else:
+        print(f"❌ Transcript not found: {paths['srt']}")
+        return None
+
+    if not os.path.exists(paths["diar"]):
+        print(f"❌ Diarization not found: {paths['diar']}")
+        return None
+
+    diar_segments = parse_diarization(paths["diar"])
+    print(f"   {len(segments)} segments, {len(diar_segments)} speaker segments")
+
+    matches = None
+    if use_ad_matches and os.path.exists(paths["ad_matches"]):
+        matches = pd.read_csv(paths["ad_matches"])
+    load_sec = time.time() - started
+
+    result = run_frames(segments, diar_segments, matches, date_str=date_str, index_path=index_path)
+    if result["stats"].empty:
+        print(f"❌ [{date_str}] No speech speakers found")
+        return None
+
+    # 저장 (각 단계 스크립트와 같은 인코딩)
+    t0 = time.time()
+    frames = {"ratio": result["ratio"], "stats": result["stats"]}
+    written = []
+    for name in keep:
+        if name == "csv":
+            # csv 모듈로 쓰던 파일이라 (줄바꿈 등) 그대로 srt2csv 로 생성
+            srt_to_csv(paths["srt"], paths["csv"])
+        else:
+            frames[name].to_csv(paths[name], index=False, encoding=INTERMEDIATES[name][1])
+        written.append(paths[name])
+        if name == "ratio":
+            # ratio CSV 옆 화자 행렬 (CSV 보다 나중에 저장 → 다른 스크립트가 최신으로 인식)
+            result["matrix"].save(matrix_path(paths["ratio"]))
+            written.append(matrix_path(paths["ratio"]))
+    result["blocks"].to_csv(paths["blocks"], index=False, encoding="utf-8-sig")
+    result["ground_truth"].to_csv(paths["ground_truth"], index=False, encoding="utf-8-sig")
+    written += [paths["blocks"], paths["ground_truth"]]
+    save_sec = time.time() - t0
+
+    if update_index:
+        from speaker_index import INDEX_PATH, add_day
+        add_day(date_str, index_path=index_path or INDEX_PATH, speakers=result["speakers"])
+
+    print("\n" + "=" * 50)
+    print(f"🎉 [{date_str}] Post-processing done in {time.time() - started:.2f}s")
+    print(f"   load {load_sec:.2f}s | " + " | ".join(f"{k} {v:.2f}s" for k, v in result["timings"].items())
+          + f" | save {save_sec:.2f}s")
+    for path in written:
+        print(f"   📂 {path}")
+    print("=" * 50)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python postprocess.py <YYYYMMDD> [--keep ratio stats] [--debug]")
+    parser.add_argument("date", help="YYYYMMDD")
+    parser.add_argument("--base_dir", default=BASE_PATH)
+    parser.add_argument("--keep", nargs="*", default=[], choices=list(INTERMEDIATES),
+                        help="같이 저장할 중간 파일 (csv / ratio / stats)")
+    parser.add_argument("--debug", action="store_true", help="중간 파일 전부 저장")
+    parser.add_argument("--index", default=None, help="speaker_index.py 인덱스 (dj_stat_ratio5.py --index 와 같음)")
+    parser.add_argument("--update-index", action="store_true", help="판별 결과와 함께 오늘 화자들을 인덱스에 추가")
+    parser.add_argument("--ignore_ad_matches", action="store_true",
+                        help="{date}-ad_matches.csv 가 있어도 사용하지 않음")
+    args = parser.parse_args()
+
+    keep = list(INTERMEDIATES) if args.debug else args.keep
+    result = run_date(args.date, args.base_dir, keep=keep, index_path=args.index,
+                      update_index=args.update_index, use_ad_matches=not args.ignore_ad_matches)
+    if result is None:
+        sys.exit(1)
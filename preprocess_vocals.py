@@ -1,8 +1,15 @@
 import os
 import sys
+import argparse
 import subprocess
 from pathlib import Path
 
+import numpy as np
+
+from stage_cache import get_cache
+
+DEMUCS_MODEL = "htdemucs"
+
 def separate_vocals(input_path, output_dir):
     """
     Demucs를 이용해 목소리(vocals)와 배경음(noises)을 분리
@@ -12,34 +19,208 @@ def separate_vocals(input_path, output_dir):
         print(f"❌ Input missing: {input_path}")
         return None
 
+    # 생성될 파일 위치 (htdemucs/파일명/vocals.wav)
+    vocal_wav = Path(output_dir) / DEMUCS_MODEL / input_file.stem / "vocals.wav"
+
+    # 같은 입력 + 같은 모델/stem 설정이면 캐시에서 복원
+    cache = get_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key("demucs", [str(input_file)], model=DEMUCS_MODEL,
+                              params={"two_stems": "vocals"})
+        if cache.restore(cache_key, [str(vocal_wav)]) is not None:
+            print(f"♻️  Cache hit - vocals restored: {vocal_wav}")
+            return str(vocal_wav)
+
     print(f"🎵 Separating Vocals: {input_file.name}...")
     
     # Demucs 실행 (htdemucs 모델, 2 stems)
     cmd = [
         "demucs",
         "--two-stems=vocals",
-        "-n", "htdemucs",
+        "-n", DEMUCS_MODEL,
         "-o", str(output_dir),
         str(input_file)
     ]
     
     try:
         subprocess.run(cmd, check=True)
-        # 생성된 파일 위치 찾기 (htdemucs/파일명/vocals.wav)
-        model_name = "htdemucs"
-        song_name = input_file.stem
-        vocal_wav = Path(output_dir) / model_name / song_name / "vocals.wav"
         
         if vocal_wav.exists():
+            if cache_key is not None:
+                cache.store(cache_key, [str(vocal_wav)], stage="demucs")
             return str(vocal_wav)
     except Exception as e:
         print(f"❌ Demucs Error: {e}")
     
     return None
 
+# ==========================================
+# 스트리밍 분리 (vocals stem 만, 16kHz mono 바로 출력)
+# ==========================================
+def _read_frames(stream, n_frames, channels):
+    """ffmpeg stdout 에서 float32 프레임 n개 읽기 (EOF 면 더 짧을 수 있음)"""
+    data = stream.read(n_frames * channels * 4)
+    if not data:
+        return np.zeros((channels, 0), dtype=np.float32)
+    frames = np.frombuffer(data[:len(data) - len(data) % (channels * 4)], dtype=np.float32)
+    return frames.reshape(-1, channels).T
+
+def separate_vocals_stream(input_path, output_file, chunk_sec=60.0, overlap_sec=5.0,
+                           device=None, threads=None, out_sr=16000, bitrate="64k"):
+    """
+    겹치는 윈도우 단위로 Demucs 를 돌려 vocals 만 16kHz mono 파일로 바로 저장
+
+    - ffmpeg 디코더 → (chunk + overlap) 윈도우 → Demucs → vocals 를 mono 로 다운믹스
+    - 윈도우 경계는 overlap 구간에서 선형 crossfade
+    - 결과는 ffmpeg 인코더 stdin 으로 흘려보냄 (44.1kHz → out_sr 리샘플링도 인코더가 처리)
+    → 메모리는 윈도우 크기만큼만 쓰고, 전체 길이 wav / no_vocals stem 을 디스크에 쓰지 않음
+    """
+    import torch
+    from demucs.pretrained import get_model
+    from demucs.apply import apply_model
+
+    if not Path(input_path).exists():
+        print(f"❌ Input missing: {input_path}")
+        return None
+
+    # 같은 입력 + 같은 스트리밍 설정이면 캐시에서 복원
+    cache = get_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key("demucs-stream", [str(input_path)], model=DEMUCS_MODEL,
+                              params={"stem": "vocals", "chunk_sec": chunk_sec, "overlap_sec": overlap_sec,
+                                      "out_sr": out_sr, "bitrate": bitrate})
+        if cache.restore(cache_key, [str(output_file)]) is not None:
+            print(f"♻️  Cache hit - vocals restored: {output_file}")
+            return str(output_file)
+
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cpu" and threads:
+        torch.set_num_threads(threads)
+
+    model = get_model(DEMUCS_MODEL)
+    model.eval()
+    sr = model.samplerate
+    channels = model.audio_channels
+    vocals_idx = model.sources.index("vocals")
+
+    chunk = int(chunk_sec * sr)
+    overlap = int(overlap_sec * sr)
+    fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+
+    print(f"🎵 Streaming vocal separation: {Path(input_path).name} "
+          f"(window {chunk_sec:.0f}s + {overlap_sec:.0f}s overlap, device={device})")
+
+    decoder = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", str(input_path),
+         "-f", "f32le", "-ac", str(channels), "-ar", str(sr), "pipe:1"],
+        stdout=subprocess.PIPE
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    # 임시 파일에 인코딩 → 두 ffmpeg 모두 정상 종료했을 때만 os.replace
+    # (중간에 실패해도 잘린 vocals 가 최신 출력으로 남아 DAG / 재실행에서 재사용되지 않도록)
+    # 확장자는 뒤에 그대로 두어 ffmpeg 가 출력 형식을 판단
+    suffix = Path(output_file).suffix
+    tmp_file = f"{output_file}.{os.getpid()}.tmp{suffix}"
+    encoder = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-y",
+         "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0",
+         "-ac", "1", "-ar", str(out_sr), "-b:a", bitrate, tmp_file],
+        stdin=subprocess.PIPE
+    )
+
+    carry = np.zeros((channels, 0), dtype=np.float32)   # 이전 윈도우 끝의 입력 (overlap)
+    prev_tail = None                                    # 이전 윈도우 끝의 vocals (crossfade 용)
+    written = 0
+
+    def write(samples):
+        nonlocal written
+        encoder.stdin.write(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+        written += len(samples)
+
+    completed = False
+    try:
+        first = True
+        while True:
+            want = chunk + overlap if first else chunk
+            new = _read_frames(decoder.stdout, want, channels)
+            if new.shape[1] == 0:
+                # 입력 끝: 보류해 둔 마지막 overlap 구간 출력
+                if prev_tail is not None:
+                    write(prev_tail)
+                break
+
+            window = np.concatenate([carry, new], axis=1)
+            last = new.shape[1] < want
+
+            # Demucs CLI 와 같은 정규화
+            mix = torch.from_numpy(window.copy())
+            ref = mix.mean(0)
+            mean, std = ref.mean(), ref.std() + 1e-8
+            with torch.no_grad():
+                sources = apply_model(model, ((mix - mean) / std)[None], device=device,
+                                      split=True, overlap=0.25, progress=False)[0]
+            vocals = (sources[vocals_idx] * std + mean).mean(0).cpu().numpy().astype(np.float32)
+
+            # 앞쪽 overlap 구간은 이전 윈도우의 vocals 와 crossfade
+            if prev_tail is not None:
+                n = min(len(prev_tail), len(vocals))
+                vocals[:n] = prev_tail[:n] * (1.0 - fade_in[:n]) + vocals[:n] * fade_in[:n]
+
+            if last:
+                write(vocals)
+                prev_tail = None
+                break
+
+            # 마지막 overlap 구간은 다음 윈도우와 섞은 뒤에 출력
+            keep = len(vocals) - overlap
+            write(vocals[:keep])
+            prev_tail = vocals[keep:]
+            carry = window[:, window.shape[1] - overlap:]
+            first = False
+        completed = True
+    finally:
+        decoder.stdout.close()
+        decoder.wait()
+        encoder.stdin.close()
+        encoder.wait()
+        if not completed and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    if decoder.returncode != 0 or encoder.returncode != 0:
+        print(f"❌ ffmpeg failed (decoder={decoder.returncode}, encoder={encoder.returncode})")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return None
+    os.replace(tmp_file, output_file)
+
+    print(f"   ✅ {written / sr / 60:.1f} min of vocals → {output_file}")
+    if cache_key is not None:
+        cache.store(cache_key, [str(output_file)], stage="demucs-stream")
+    return str(output_file)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python preprocess.py <input_mp3> <output_dir>")
-        sys.exit(1)
-    
-    separate_vocals(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        usage="python preprocess_vocals.py <input_mp3> <output_dir>\n"
+              "       python preprocess_vocals.py --stream <input_mp3> <output_file> [--threads N]"
+    )
+    parser.add_argument("input", help="입력 MP3")
+    parser.add_argument("output", help="출력 폴더 (기본) 또는 출력 파일 (--stream)")
+    parser.add_argument("--stream", action="store_true",
+                        help="윈도우 단위 in-process 분리, vocals 만 16kHz mono 로 바로 저장")
+    parser.add_argument("--chunk-sec", type=float, default=60.0, help="스트리밍 윈도우 길이(초)")
+    parser.add_argument("--overlap-sec", type=float, default=5.0, help="윈도우 겹침(초)")
+    parser.add_argument("--device", default=None, help="cuda / cpu (기본: 자동)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU 스레드 수 (--device cpu)")
+    args = parser.parse_args()
+
+    if args.stream:
+        result = separate_vocals_stream(args.input, args.output, chunk_sec=args.chunk_sec,
+                                        overlap_sec=args.overlap_sec, device=args.device,
+                                        threads=args.threads)
+        if result is None:
+            sys.exit(1)
+    else:
+        separate_vocals(args.input, args.output)
@@ -1,53 +1,76 @@
+#!/usr/bin/env python3
+"""
+inaSpeechSegmenter 구간 분석 (speech / music / noise)
+
+모델(TF import + Segmenter 생성)은 프로세스당 한 번만 만들고 여러 파일을 처리합니다.
+파일 N 을 신경망이 처리하는 동안 파일 N+1 의 feature 추출(ffmpeg + mel)을 스레드에서 미리 해 둡니다.
+
+Usage:
+  python run_ina.py <input.mp3> [output.csv]                     # 단일 파일 (기존과 동일)
+  python run_ina.py a.mp3 b.mp3 <dir> ...                        # 여러 파일 / 디렉토리
+  python run_ina.py --start 20260101 --end 20260131              # 날짜 범위 ({BASE}/{date}/mp3/{date}.mp3)
+  python run_ina.py --serve <queue_dir> [--once]                 # 상주 워커 (queue 디렉토리)
+  python run_ina.py --submit <queue_dir> <input.mp3> [...]       # 상주 워커에 작업 등록
+
+Options:
+  --batch-size N   Segmenter 배치 크기 (기본 32, 키우면 빠르지만 GPU 메모리 더 사용)
+  --cpu            GPU 를 숨기고 CPU 전용으로 실행 (CPU 빌드 TF 에서도 동작)
+"""
 import sys
 import os
-import pandas as pd
-import tensorflow as tf
+import glob
+import time
+import argparse
+import datetime
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from whisper_worker import init_queue, claim_next, recover_stale, write_json_atomic
+
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/jeongeunim"
+AUDIO_EXTS = (".mp3", ".wav", ".m4a", ".flac")
+DEFAULT_BATCH_SIZE = 32
 
 # ==========================================
-# 🚀 GPU 설정 (충돌 방지 + 가속)
+# 🚀 TF / GPU 설정 (충돌 방지 + 가속)
 # ==========================================
-gpus = tf.config.list_physical_devices('GPU')
-if gpus:
-    try:
-        # GPU 메모리를 처음부터 100% 잡지 말고, 필요할 때만 늘려가도록 설정
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        print(f"✅ GPU Enabled: {len(gpus)} GPUs detected (Memory Growth ON)")
-    except RuntimeError as e:
-        print(f"⚠️ GPU Setup Error: {e}")
-else:
-    print("⚠️ No GPU detected. Running on CPU.")
-
-# 경고 메시지 끄기
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' 
-from inaSpeechSegmenter import Segmenter
-
-def run_segmentation(input_file, output_csv):
-    print(f"📂 Loading File: {input_file}")
-    
-    # 1. 모델 로드
-    print("🔧 Loading Model (GPU Mode)...")
-    try:
-        # 배치 사이즈를 키우면 더 빨라지지만 메모리 터질 수 있음 (기본값 사용)
-        seg = Segmenter(vad_engine='smn', detect_gender=True)
-    except Exception as e:
-        print(f"❌ Model Load Error: {e}")
-        return
+def configure_tf(cpu=False):
+    """TF 는 여기서 처음 import (CLI 인자 파싱 / --help 가 TF 로딩을 기다리지 않도록)"""
+    # 경고 메시지 끄기
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    if cpu:
+        # TF import 전에 설정해야 GPU 가 보이지 않음
+        os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+    import tensorflow as tf
+
+    gpus = tf.config.list_physical_devices('GPU')
+    if gpus:
+        try:
+            # GPU 메모리를 처음부터 100% 잡지 말고, 필요할 때만 늘려가도록 설정
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            print(f"✅ GPU Enabled: {len(gpus)} GPUs detected (Memory Growth ON)")
+        except RuntimeError as e:
+            print(f"⚠️ GPU Setup Error: {e}")
+    else:
+        print("⚠️ No GPU detected. Running on CPU.")
+    return tf
+
+def load_segmenter(batch_size=DEFAULT_BATCH_SIZE, cpu=False):
+    configure_tf(cpu)
+    from inaSpeechSegmenter import Segmenter
+
+    print(f"🔧 Loading Model ({'CPU' if cpu else 'GPU'} Mode, batch_size={batch_size})...")
+    return Segmenter(vad_engine='smn', detect_gender=True, batch_size=batch_size)
+
+# ==========================================
+# 결과 정리 / 저장
+# ==========================================
+def segmentation_to_df(segmentation):
+    import pandas as pd
 
-    print("🔍 Analyzing audio (Fast Mode)...")
-    
-    # 2. 분석 실행
-    try:
-        segmentation = seg(input_file)
-    except Exception as e:
-        print(f"❌ Segmentation Error: {e}")
-        print("💡 팁: 만약 'CUDNN_STATUS_INTERNAL_ERROR' 같은 게 뜨면 GPU 메모리 부족입니다.")
-        return
-    
-    # 3. 결과 정리
     results = []
-    print("📝 Processing Results...")
-    
     for label, start, end in segmentation:
         # 라벨 정리
         category = "OTHER"
@@ -57,7 +80,7 @@ def run_segmentation(input_file, output_csv):
             category = "MUSIC"
         elif label == "noise":
             category = "NOISE"
-            
+
         results.append({
             "Start": round(start, 2),
             "Stop": round(end, 2),
@@ -65,32 +88,240 @@ def run_segmentation(input_file, output_csv):
             "Label": label,
             "Category": category
         })
-    
-    # 4. CSV 저장
-    df = pd.DataFrame(results)
+    return pd.DataFrame(results)
+
+def save_result(df, output_csv, verbose=True):
     df.to_csv(output_csv, index=False, encoding='utf-8-sig')
-    
-    print("\n" + "="*50)
-    print(f"📊 Analysis Result (Top 5)")
-    print("-" * 50)
-    print(df.head(5).to_string(index=False))
-    print("=" * 50)
+
+    if verbose:
+        print("\n" + "="*50)
+        print(f"📊 Analysis Result (Top 5)")
+        print("-" * 50)
+        print(df.head(5).to_string(index=False))
+        print("=" * 50)
     print(f"✅ Saved to: {output_csv}")
 
+def default_output(input_file):
+    return input_file.rsplit('.', 1)[0] + "_ina.csv"
+
+# ==========================================
+# 여러 파일 파이프라인
+# ==========================================
+def segment_files(seg, jobs, verbose=False):
+    """
+    jobs: [(input_file, output_csv), ...]
+    feature 추출(ffmpeg 디코딩 + mel, CPU)은 스레드 1개로 한 파일 앞서 진행하고
+    신경망(segment_feats)은 메인 스레드에서 순서대로 → 결과는 파일별 CSV (기존 형식)
+    반환: [(input_file, output_csv, 성공 여부, 메시지)]
+    """
+    from inaSpeechSegmenter.features import media2feats
+
+    def extract(path):
+        return media2feats(path, None, None, None, seg.ffmpeg)
+
+    report = []
+    if not jobs:
+        return report
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        future = prefetch.submit(extract, jobs[0][0])
+        for i, (input_file, output_csv) in enumerate(jobs):
+            started = time.time()
+            print(f"\n📂 [{i + 1}/{len(jobs)}] {input_file}")
+            try:
+                mspec, loge, difflen = future.result()
+            except Exception as e:
+                mspec = None
+                error = f"Feature Error: {type(e).__name__}: {e}"
+
+            # 다음 파일 feature 는 지금 바로 시작 → 신경망과 겹침
+            if i + 1 < len(jobs):
+                future = prefetch.submit(extract, jobs[i + 1][0])
+
+            if mspec is None:
+                print(f"❌ {error}")
+                report.append((input_file, output_csv, False, error))
+                continue
+
+            try:
+                segmentation = seg.segment_feats(mspec, loge, difflen, 0)
+            except Exception as e:
+                error = f"Segmentation Error: {type(e).__name__}: {e}"
+                print(f"❌ {error}")
+                print("💡 팁: 만약 'CUDNN_STATUS_INTERNAL_ERROR' 같은 게 뜨면 GPU 메모리 부족이니 --batch-size 를 줄이세요.")
+                report.append((input_file, output_csv, False, error))
+                continue
+
+            save_result(segmentation_to_df(segmentation), output_csv, verbose=verbose)
+            report.append((input_file, output_csv, True, f"{time.time() - started:.1f}s"))
+    return report
+
+def run_segmentation(input_file, output_csv, seg=None, batch_size=DEFAULT_BATCH_SIZE, cpu=False):
+    """단일 파일 (기존 인터페이스)"""
+    if seg is None:
+        try:
+            seg = load_segmenter(batch_size, cpu)
+        except Exception as e:
+            print(f"❌ Model Load Error: {e}")
+            return False
+
+    print("🔍 Analyzing audio (Fast Mode)...")
+    report = segment_files(seg, [(input_file, output_csv)], verbose=True)
+    return report[0][2]
+
+# ==========================================
+# 입력 수집
+# ==========================================
+def date_range(start, end):
+    s = datetime.datetime.strptime(start, "%Y%m%d")
+    e = datetime.datetime.strptime(end, "%Y%m%d")
+    return [(s + datetime.timedelta(days=i)).strftime("%Y%m%d") for i in range((e - s).days + 1)]
+
+def collect_inputs(paths, start=None, end=None, base_path=BASE_PATH):
+    """파일 / 디렉토리 / 날짜 범위 → 존재하는 오디오 파일 목록 (순서 유지, 중복 제거)"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(f for f in glob.glob(os.path.join(p, "*"))
+                            if f.lower().endswith(AUDIO_EXTS) and not f.lower().endswith("_vocals.wav"))
+        elif os.path.exists(p):
+            files.append(p)
+        else:
+            print(f"⚠️ File not found, skipped: {p}")
+
+    if start and end:
+        for d in date_range(start, end):
+            mp3 = f"{base_path}/{d}/mp3/{d}.mp3"
+            if os.path.exists(mp3):
+                files.append(mp3)
+            else:
+                print(f"⚠️ [{d}] MP3 missing, skipped")
+
+    seen = set()
+    return [f for f in files if not (f in seen or seen.add(f))]
+
+def print_summary(report, elapsed):
+    ok = sum(1 for r in report if r[2])
+    print("\n" + "=" * 50)
+    print(f"🎉 {ok}/{len(report)} files done in {elapsed:.1f}s "
+          f"({elapsed / max(len(report), 1):.1f}s/file, model loaded once)")
+    for input_file, _, success, msg in report:
+        if not success:
+            print(f"   ❌ {input_file}: {msg}")
+    print("=" * 50)
+
+# ==========================================
+# 상주 워커 (queue 디렉토리, whisper_worker 와 같은 구조)
+# ==========================================
+def submit(queue_dir, input_file, output_csv=None):
+    init_queue(queue_dir)
+    input_file = os.path.abspath(input_file)
+    job_name = f"{time.time_ns()}-{os.path.basename(input_file)}.json"
+    write_json_atomic(os.path.join(queue_dir, "pending", job_name), {
+        "audio": input_file,
+        "output": os.path.abspath(output_csv or default_output(input_file)),
+        "submitted": time.time(),
+    })
+    return job_name
+
+def serve(queue_dir, seg, poll_interval=2.0, once=False):
+    """
+    pending 에 쌓인 작업을 한 번에 가져와 segment_files 파이프라인으로 처리
+    (작업이 여러 개면 feature 추출과 신경망이 겹쳐서 돌아감)
+    """
+    import json
+
+    init_queue(queue_dir)
+    recover_stale(queue_dir)
+    print(f"👂 Watching queue: {queue_dir}")
+    processed = 0
+    while True:
+        claimed = []
+        while True:
+            c = claim_next(queue_dir)
+            if c is None:
+                break
+            claimed.append(c)
+
+        if not claimed:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        batch = []
+        for name, running_path in claimed:
+            with open(running_path, "r", encoding="utf-8") as f:
+                batch.append((name, running_path, json.load(f)))
+
+        try:
+            report = segment_files(seg, [(job["audio"], job["output"]) for _, _, job in batch])
+        except Exception as e:
+            report = [(job["audio"], job["output"], False, f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+                      for _, _, job in batch]
+
+        for (name, running_path, job), (_, _, success, msg) in zip(batch, report):
+            job["finished"] = time.time()
+            if success:
+                job["elapsed"] = msg
+            else:
+                job["error"] = msg
+            write_json_atomic(os.path.join(queue_dir, "done" if success else "failed", name), job)
+            os.remove(running_path)
+        processed += len(batch)
+
+    print(f"\n🎉 Worker finished: {processed} jobs")
+    return processed
+
+# ==========================================
+# MAIN
+# ==========================================
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python run_ina.py <input.mp3> [output.csv]")
-        sys.exit(1)
-        
-    input_path = sys.argv[1]
-    
-    if len(sys.argv) >= 3:
-        output_path = sys.argv[2]
-    else:
-        output_path = input_path.rsplit('.', 1)[0] + "_ina.csv"
-    
-    if not os.path.exists(input_path):
-        print(f"❌ File not found: {input_path}")
+    parser = argparse.ArgumentParser(usage=__doc__.split("Usage:")[1].split("Options:")[0])
+    parser.add_argument("inputs", nargs="*", help="오디오 파일 / 디렉토리 (단일 파일이면 두 번째 인자로 output.csv 가능)")
+    parser.add_argument("--start", default=None, help="날짜 범위 시작 (YYYYMMDD)")
+    parser.add_argument("--end", default=None, help="날짜 범위 끝 (YYYYMMDD)")
+    parser.add_argument("--base-dir", default=BASE_PATH)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Segmenter 배치 크기")
+    parser.add_argument("--cpu", action="store_true", help="CPU 전용 (GPU 숨김)")
+    parser.add_argument("--serve", metavar="QUEUE_DIR", default=None, help="상주 워커 모드")
+    parser.add_argument("--submit", metavar="QUEUE_DIR", default=None, help="상주 워커에 작업 등록")
+    parser.add_argument("--once", action="store_true", help="--serve: pending 이 비면 종료")
+    parser.add_argument("--poll", type=float, default=2.0, help="--serve: queue 확인 간격(초)")
+    args = parser.parse_args()
+
+    # 기존 사용법: run_ina.py <input.mp3> <output.csv>
+    output_path = None
+    inputs = list(args.inputs)
+    if len(inputs) == 2 and inputs[1].lower().endswith(".csv"):
+        output_path = inputs.pop()
+
+    if args.submit:
+        files = collect_inputs(inputs, args.start, args.end, args.base_dir)
+        for f in files:
+            print(f"📨 Submitted: {submit(args.submit, f, output_path if len(files) == 1 else None)}")
+        sys.exit(0 if files else 1)
+
+    if not args.serve:
+        files = collect_inputs(inputs, args.start, args.end, args.base_dir)
+        if not files:
+            parser.print_usage()
+            print("❌ No input files")
+            sys.exit(1)
+
+    try:
+        seg = load_segmenter(args.batch_size, args.cpu)
+    except Exception as e:
+        print(f"❌ Model Load Error: {e}")
         sys.exit(1)
-        
-    run_segmentation(input_path, output_path)
\ No newline at end of file
+
+    if args.serve:
+        serve(args.serve, seg, poll_interval=args.poll, once=args.once)
+        sys.exit(0)
+
+    jobs = [(f, output_path or default_output(f)) for f in files]
+    t0 = time.time()
+    report = segment_files(seg, jobs, verbose=len(jobs) == 1)
+    if len(jobs) > 1:
+        print_summary(report, time.time() - t0)
+    sys.exit(0 if all(r[2] for r in report) else 1)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+화자 embedding 공용 모듈
+
+- pyannote speaker-diarization-3.1 이 내부에서 쓰는 것과 같은 embedding 모델(wespeaker)
+- diarization 결과(START= STOP= SPEAKER=) 의 화자별 평균 embedding
+- 지난 며칠의 DJ 로 DJ 프로필(dj_profile.npz) 만들기
+
+Usage:
+  python speaker_embedding.py dj-profile 20251201 20251202 ... [--output dj_profile.npz]
+  python speaker_embedding.py dj-profile --last 7
+"""
+import os
+import re
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from audio_buffer import load_pcm
+
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
+EMBEDDING_MODEL = "pyannote/wespeaker-voxceleb-resnet34-LM"
+SAMPLE_RATE = 16000
+DJ_PROFILE = os.path.join(BASE_PATH, "dj_profile.npz")
+
+MIN_TURN_SEC = 1.0           # 이보다 짧은 turn 은 embedding 이 불안정
+MAX_TURN_SEC = 10.0          # 긴 turn 은 앞 10초만 사용
+MAX_SEC_PER_SPEAKER = 120.0  # 화자당 최대 사용 음성 길이 (긴 turn 부터)
+
+
+# ==========================================
+# 1. 모델 / embedding
+# ==========================================
+def load_embedder(device=None):
+    import torch
+    from pyannote.audio import Model, Inference
+
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = Model.from_pretrained(EMBEDDING_MODEL)
+    inference = Inference(model, window="whole")
+    inference.to(torch.device(device))
+    return inference
+
+
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norm, 1e-12)
+
+
+def embed(inference, samples):
+    """16kHz mono float32 구간 → L2 정규화 embedding"""
+    import torch
+
+    waveform = torch.from_numpy(np.ascontiguousarray(samples, dtype=np.float32)).unsqueeze(0)
+    emb = inference({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+    return normalize(np.asarray(emb).reshape(-1))
+
+
+# ==========================================
+# 2. diarization 결과 → 화자별 embedding
+# ==========================================
+def read_diarization(path):
+    """[(start, stop, speaker)]"""
+    pattern = re.compile(r"START=(\d+\.\d+) STOP=(\d+\.\d+) SPEAKER=(\S+)")
+    turns = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            m = pattern.search(line)
+            if m:
+                turns.append((float(m.group(1)), float(m.group(2)), m.group(3)))
+    return turns
+
+
+def speaker_embeddings(inference, pcm, turns, speakers=None):
+    """
+    화자별 평균 embedding
+
+    Returns:
+        {speaker: {"embedding": 정규화 평균, "duration": 전체 발화 시간, "used": 사용한 시간}}
+    """
+    by_speaker = {}
+    for start, stop, spk in turns:
+        if speakers is not None and spk not in speakers:
+            continue
+        by_speaker.setdefault(spk, []).append((start, stop))
+
+    result = {}
+    for spk, spans in by_speaker.items():
+        total = sum(stop - start for start, stop in spans)
+        acc, used = None, 0.0
+        for start, stop in sorted(spans, key=lambda s: s[0] - s[1]):   # 긴 turn 부터
+            if stop - start < MIN_TURN_SEC or used >= MAX_SEC_PER_SPEAKER:
+                break
+            stop = min(stop, start + MAX_TURN_SEC)
+            emb = embed(inference, pcm[int(start * SAMPLE_RATE):int(stop * SAMPLE_RATE)])
+            if not np.all(np.isfinite(emb)):
+                continue
+            acc = emb * (stop - start) if acc is None else acc + emb * (stop - start)
+            used += stop - start
+        if acc is not None:
+            result[spk] = {"embedding": normalize(acc), "duration": total, "used": used}
+    return result
+
+
+# ==========================================
+# 3. DJ 프로필
+# ==========================================
+def dj_speaker(stats_csv):
+    df = pd.read_csv(stats_csv)
+    dj = df.loc[df["Role"] == "DJ", "Speaker"]
+    return dj.iloc[0] if len(dj) else None
+
+
+def day_paths(date_str, base_path=BASE_PATH):
+    transcript_dir = os.path.join(base_path, date_str, "transcript")
+    return (
+        os.path.join(base_path, date_str, "mp3", f"{date_str}.mp3"),
+        os.path.join(transcript_dir, f"{date_str}_diarization.txt"),
+        os.path.join(transcript_dir, f"{date_str}-dj_stats.csv"),
+    )
+
+
+def available_dates(base_path=BASE_PATH):
+    """mp3 / diarization / dj_stats 가 모두 있는 날짜 (오름차순)"""
+    if not os.path.isdir(base_path):
+        return []
+    dates = []
+    for d in sorted(os.listdir(base_path)):
+        if d.isdigit() and len(d) == 8 and all(os.path.exists(p) for p in day_paths(d, base_path)):
+            dates.append(d)
+    return dates
+
+
+def build_dj_profile(dates, output=DJ_PROFILE, base_path=BASE_PATH, inference=None):
+    """
+    날짜별 DJ embedding 의 (사용 시간 가중) 평균 → npz 저장
+    날짜별 embedding 도 같이 저장해서 유사도 분포를 확인할 수 있게 함
+    """
+    inference = inference or load_embedder()
+    per_day, weights, used_dates = [], [], []
+
+    for date_str in dates:
+        mp3, diar, stats = day_paths(date_str, base_path)
+        dj = dj_speaker(stats)
+        if dj is None:
+            print(f"   ⚠️  [{date_str}] DJ not found in {stats}")
+            continue
+        emb = speaker_embeddings(inference, load_pcm(mp3, SAMPLE_RATE), read_diarization(diar), speakers={dj})
+        if dj not in emb:
+            continue
+        per_day.append(emb[dj]["embedding"])
+        weights.append(emb[dj]["used"])
+        used_dates.append(date_str)
+        print(f"   ✅ [{date_str}] {dj} ({emb[dj]['used']:.0f}s used)")
+
+    if not per_day:
+        raise ValueError("no DJ embeddings found")
+
+    per_day = np.stack(per_day)
+    profile = normalize((per_day * np.asarray(weights)[:, None]).sum(axis=0))
+    sims = per_day @ profile
+
+    np.savez(output, embedding=profile, day_embeddings=per_day, dates=np.array(used_dates))
+    print(f"💾 DJ profile from {len(used_dates)} days → {output} "
+          f"(day-to-profile cosine min {sims.min():.3f}, mean {sims.mean():.3f})")
+    return profile
+
+
+def load_dj_profile(path=DJ_PROFILE):
+    data = np.load(path)
+    return normalize(data["embedding"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python speaker_embedding.py dj-profile [DATES ...] [--last N]")
+    parser.add_argument("command", choices=["dj-profile"])
+    parser.add_argument("dates", nargs="*", help="YYYYMMDD ...")
+    parser.add_argument("--last", type=int, default=None, help="가장 최근 N일 사용")
+    parser.add_argument("--output", default=DJ_PROFILE)
+    parser.add_argument("--base-dir", default=BASE_PATH)
+    args = parser.parse_args()
+
+    dates = args.dates
+    if args.last:
+        dates = available_dates(args.base_dir)[-args.last:]
+    if not dates:
+        print("❌ No dates given")
+        sys.exit(1)
+
+    build_dj_profile(dates, output=args.output, base_path=args.base_dir)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+날짜를 넘어 유지되는 화자(목소리) embedding 인덱스
+
+SPEAKER_xx 라벨은 날마다 의미가 없으므로, 하루 diarization 이 끝나면
+화자별 평균 embedding (speaker_embedding.py) 을 이 인덱스에 넣고
+다음 날부터는 DJ / 고정 게스트 / 반복 광고 목소리를 lookup 으로 찾습니다.
+
+  speaker_index.npz
+    embeddings  (N, D) float32, L2 정규화
+    roles       목소리별 누적 역할 표 (DJ / GUEST / AD_SPEAKER)
+    days, duration, first_date, last_date
+
+- 검색: 정규화 embedding 내적 = cosine, 질의 여러 개를 한 번의 행렬곱으로 (NumPy brute force)
+- 목소리가 많아지면 (IVF_MIN_SIZE 이상) IVF: spherical k-means 로 √N 개 리스트로 나누고 nprobe 개만 탐색
+- 추가: 가장 가까운 목소리와 MATCH_THRESHOLD 이상이면 running mean 으로 합치고, 아니면 새 목소리
+
+Usage:
+  python speaker_index.py add <DATE> [<DATE> ...]    # dj_stats 역할과 함께 인덱스에 추가
+  python speaker_index.py lookup <DATE>              # 그날 화자들을 인덱스에서 찾기
+  python speaker_index.py info
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from speaker_embedding import BASE_PATH, normalize
+
+INDEX_PATH = os.path.join(BASE_PATH, "speaker_index.npz")
+ROLES = ["DJ", "GUEST", "AD_SPEAKER"]
+
+MATCH_THRESHOLD = 0.7     # 같은 목소리로 보는 cosine 유사도
+IVF_MIN_SIZE = 2048       # 이보다 작으면 brute force 가 더 빠름
+IVF_NPROBE = 8
+KMEANS_ITERS = 10
+
+
+class SpeakerIndex:
+    def __init__(self, dim=None):
+        self.embeddings = np.zeros((0, dim or 0), dtype=np.float32)
+        self.sums = np.zeros((0, dim or 0), dtype=np.float32)   # running mean 용 가중합
+        self.votes = np.zeros((0, len(ROLES)), dtype=np.int32)  # 날짜별 역할 투표
+        self.days = np.zeros(0, dtype=np.int32)
+        self.duration = np.zeros(0, dtype=np.float64)
+        self.first_date = np.zeros(0, dtype="U8")
+        self.last_date = np.zeros(0, dtype="U8")
+        self._ivf = None
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    # ==========================================
+    # 저장 / 로드
+    # ==========================================
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        data = np.load(path)
+        index.embeddings = data["embeddings"].astype(np.float32)
+        index.sums = data["sums"].astype(np.float32)
+        index.votes = data["votes"].astype(np.int32)
+        index.days = data["days"].astype(np.int32)
+        index.duration = data["duration"].astype(np.float64)
+        index.first_date = data["first_date"]
+        index.last_date = data["last_date"]
+        return index
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, embeddings=self.embeddings, sums=self.sums, votes=self.votes,
+                     days=self.days, duration=self.duration,
+                     first_date=self.first_date, last_date=self.last_date)
+        os.replace(tmp, path)
+
+    def role(self, i):
+        """역할 투표 1위 (동률이면 DJ > GUEST > AD_SPEAKER), 투표 없으면 None"""
+        if self.votes[i].sum() == 0:
+            return None
+        return ROLES[int(np.argmax(self.votes[i]))]
+
+    # ==========================================
+    # 검색
+    # ==========================================
+    def _build_ivf(self):
+        """spherical k-means 로 √N 개 리스트"""
+        n = len(self)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = self.embeddings[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(self.embeddings @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.embeddings)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+        assign = np.argmax(self.embeddings @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._ivf = (centroids, order, bounds, n)
+
+    def search(self, queries, k=1, use_ivf=None, nprobe=IVF_NPROBE):
+        """
+        queries: (M, D) 또는 (D,)
+        Returns:
+            (ids (M, k), sims (M, k))  — 후보가 k 개보다 적으면 id=-1, sim=-inf
+        """
+        queries = normalize(np.atleast_2d(queries))
+        m = len(queries)
+        ids = np.full((m, k), -1, dtype=np.int64)
+        sims = np.full((m, k), -np.inf, dtype=np.float32)
+        if len(self) == 0:
+            return ids, sims
+
+        if use_ivf is None:
+            use_ivf = len(self) >= IVF_MIN_SIZE
+
+        if not use_ivf:
+            scores = queries @ self.embeddings.T                   # (M, N) 한 번에
+            kk = min(k, scores.shape[1])
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            ids[:, :kk] = np.take_along_axis(top, order, axis=1)
+            sims[:, :kk] = np.take_along_axis(top_scores, order, axis=1)
+            return ids, sims
+
+        if self._ivf is None or self._ivf[3] != len(self):
+            self._build_ivf()
+        centroids, order, bounds, _ = self._ivf
+        probe = np.argsort(-(queries @ centroids.T), axis=1)[:, :nprobe]
+        for qi in range(m):
+            cand = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probe[qi]])
+            if len(cand) == 0:
+                continue
+            scores = self.embeddings[cand] @ queries[qi]
+            kk = min(k, len(cand))
+            top = np.argsort(-scores)[:kk]
+            ids[qi, :kk] = cand[top]
+            sims[qi, :kk] = scores[top]
+        return ids, sims
+
+    def lookup(self, embeddings, threshold=MATCH_THRESHOLD):
+        """
+        {name: embedding} → {name: (voice_id, sim, role)}  (threshold 미만이면 voice_id=None)
+        """
+        names = list(embeddings.keys())
+        if not names:
+            return {}
+        ids, sims = self.search(np.stack([embeddings[n] for n in names]), k=1)
+        result = {}
+        for name, i, s in zip(names, ids[:, 0], sims[:, 0]):
+            if i >= 0 and s >= threshold:
+                result[name] = (int(i), float(s), self.role(i))
+            else:
+                result[name] = (None, float(s) if np.isfinite(s) else None, None)
+        return result
+
+    # ==========================================
+    # 추가 (증분)
+    # ==========================================
+    def add(self, date_str, speakers, roles=None, threshold=MATCH_THRESHOLD):
+        """
+        speakers: speaker_embedding.speaker_embeddings() 결과
+        roles:    {speaker: "DJ" | "GUEST" | "AD_SPEAKER"} (dj_stats)
+
+        Returns:
+            {speaker: voice_id}
+        """
+        roles = roles or {}
+        names = list(speakers.keys())
+        if not names:
+            return {}
+        if len(self) == 0:
+            dim = len(speakers[names[0]]["embedding"])
+            self.embeddings = np.zeros((0, dim), dtype=np.float32)
+            self.sums = np.zeros((0, dim), dtype=np.float32)
+
+        matched = self.lookup({n: speakers[n]["embedding"] for n in names}, threshold)
+        assigned = {}
+        taken = set()   # 같은 날 두 화자가 한 목소리에 합쳐지지 않게
+
+        # 발화량 많은 화자부터 기존 목소리에 매칭
+        for name in sorted(names, key=lambda n: -speakers[n]["duration"]):
+            info = speakers[name]
+            emb = normalize(info["embedding"])
+            weight = max(info.get("used", info["duration"]), 1.0)
+            voice, _, _ = matched[name]
+
+            if voice is None or voice in taken:
+                voice = len(self)
+                self.embeddings = np.vstack([self.embeddings, emb[None]])
+                self.sums = np.vstack([self.sums, (emb * weight)[None]])
+                self.votes = np.vstack([self.votes, np.zeros((1, len(ROLES)), dtype=np.int32)])
+                self.days = np.append(self.days, 0)
+                self.duration = np.append(self.duration, 0.0)
+                self.first_date = np.append(self.first_date, date_str)
+                self.last_date = np.append(self.last_date, date_str)
+            else:
+                self.sums[voice] += emb * weight
+                self.embeddings[voice] = normalize(self.sums[voice])
+
+            self.days[voice] += 1
+            self.duration[voice] += info["duration"]
+            self.last_date[voice] = max(self.last_date[voice], date_str)
+            if roles.get(name) in ROLES:
+                self.votes[voice, ROLES.index(roles[name])] += 1
+
+            taken.add(voice)
+            assigned[name] = voice
+
+        self._ivf = None
+        return assigned
+
+
+# ==========================================
+# 날짜 단위 헬퍼
+# ==========================================
+def day_speakers(date_str, base_path=BASE_PATH, inference=None):
+    """그날 diarization 화자별 embedding"""
+    from audio_buffer import load_pcm
+    from speaker_embedding import SAMPLE_RATE, day_paths, load_embedder, read_diarization, speaker_embeddings
+
+    mp3, diar, _ = day_paths(date_str, base_path)
+    inference = inference or load_embedder()
+    return speaker_embeddings(inference, load_pcm(mp3, SAMPLE_RATE), read_diarization(diar))
+
+
+def known_roles(date_str, index_path=INDEX_PATH, base_path=BASE_PATH, speakers=None):
+    """
+    그날 화자 → 인덱스에서 찾은 역할 (dj_stat_ratio5.py --index 용)
+
+    Returns:
+        (DataFrame[Speaker, Voice_ID, Match_Sim, Known_Role], speakers)
+    """
+    index = SpeakerIndex.load(index_path)
+    speakers = speakers if speakers is not None else day_speakers(date_str, base_path)
+    found = index.lookup({n: s["embedding"] for n, s in speakers.items()})
+    rows = []
+    for name, (voice, sim, role) in found.items():
+        rows.append({
+            "Speaker": name,
+            "Voice_ID": "" if voice is None else f"VOICE_{voice:05d}",
+            "Match_Sim": "" if sim is None else round(sim, 3),
+            "Known_Role": role or "",
+        })
+    return pd.DataFrame(rows, columns=["Speaker", "Voice_ID", "Match_Sim", "Known_Role"]), speakers
+
+
+def add_day(date_str, index_path=INDEX_PATH, base_path=BASE_PATH, speakers=None, inference=None):
+    """dj_stats 역할과 함께 그날 화자들을 인덱스에 추가"""
+    from speaker_embedding import day_paths
+
+    _, _, stats_csv = day_paths(date_str, base_path)
+    roles = {}
+    if os.path.exists(stats_csv):
+        stats = pd.read_csv(stats_csv)
+        roles = dict(zip(stats["Speaker"], stats["Role"]))
+
+    index = SpeakerIndex.load(index_path)
+    before = len(index)
+    speakers = speakers if speakers is not None else day_speakers(date_str, base_path, inference)
+    assigned = index.add(date_str, speakers, roles)
+    index.save(index_path)
+    print(f"📚 [{date_str}] {len(assigned)} speakers → {len(index) - before} new voices "
+          f"(index: {len(index)} voices)")
+    return assigned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python speaker_index.py (add DATES... | lookup DATE | info)")
+    parser.add_argument("command", choices=["add", "lookup", "info"])
+    parser.add_argument("dates", nargs="*", help="YYYYMMDD ...")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--base-dir", default=BASE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        index = SpeakerIndex.load(args.index)
+        print(f"📚 {args.index}: {len(index)} voices")
+        for role in ROLES:
+            n = sum(1 for i in range(len(index)) if index.role(i) == role)
+            print(f"   {role:<11}: {n}")
+        sys.exit(0)
+
+    if not args.dates:
+        print("❌ No dates given")
+        sys.exit(1)
+
+    if args.command == "add":
+        from speaker_embedding import load_embedder
+        inference = load_embedder()
+        for d in args.dates:
+            add_day(d, args.index, args.base_dir, inference=inference)
+    else:
+        df, _ = known_roles(args.dates[0], args.index, args.base_dir)
+        print(df.to_string(index=False))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+행(세그먼트) × 화자 겹침 시간 희소 행렬 (CSR, .npz)
+
+merge_speaker_overlap_ratio.py 가 Speakers 텍스트("SPEAKER_xx:1.23s(0.456);...")와 같이 저장하고,
+dj_stat_ratio5 / make_ground_truth / dj_merge_block3 / ina_speech_mbc_classify 는
+행마다 정규식으로 텍스트를 다시 파싱하는 대신 이 행렬의 접근자를 씁니다.
+Speakers 텍스트는 사람이 읽는 용도로만 남습니다.
+
+  {date}_with_speaker_ratio.npz   (CSV 와 같은 이름)
+    indptr, indices, data   CSR — data = 화자별 겹침 시간(초, 반올림 없음)
+    total                   행별 전체 겹침 시간 (텍스트 비율의 분모)
+    speakers                열 이름 (SPEAKER_xx)
+    shape, format           scipy.sparse.load_npz 로도 열림
+
+- 행 안의 순서 = 겹침 시간 내림차순 (Speakers 텍스트와 같은 순서) → 첫 항목이 지배 화자
+- 접근자 결과는 텍스트를 파싱하던 기존 함수들과 같은 값
+
+Usage:
+  python speaker_matrix.py info <file.npz>
+  python speaker_matrix.py check <with_speaker_ratio.csv>   # 텍스트 컬럼과 일치 확인
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from speaker_overlap import format_speaker_ratios
+
+
+class SpeakerMatrix:
+    def __init__(self, indptr, indices, data, total, speakers):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float64)
+        self.total = np.asarray(total, dtype=np.float64)
+        self.speakers = np.asarray(speakers, dtype=str)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_overlaps(cls, overlaps, n_rows):
+        """
+        overlaps: {행 번호: (OverlapIndex.overlaps() 의 dict, total_overlap)}
+        겹침이 없거나 total 이 0 인 행은 빈 행 (format_speaker_ratios 가 "" 를 내는 경우와 같음)
+        """
+        names = sorted({spk for overlap, _ in overlaps.values() for spk in overlap})
+        column = {spk: i for i, spk in enumerate(names)}
+
+        counts = np.zeros(n_rows, dtype=np.int64)
+        total = np.zeros(n_rows, dtype=np.float64)
+        indices, data = [], []
+        for row in sorted(overlaps):
+            overlap, total_overlap = overlaps[row]
+            if not overlap or total_overlap == 0:
+                continue
+            # format_speaker_ratios 와 같은 정렬 (겹침 시간 내림차순, 동점은 원래 순서)
+            for spk, dur in sorted(overlap.items(), key=lambda x: x[1], reverse=True):
+                indices.append(column[spk])
+                data.append(dur)
+            counts[row] = len(overlap)
+            total[row] = total_overlap
+
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return cls(indptr, indices, data, total, names)
+
+    # ==========================================
+    # 저장 / 로드
+    # ==========================================
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        return cls(data["indptr"], data["indices"], data["data"], data["total"], data["speakers"])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, indptr=self.indptr, indices=self.indices, data=self.data,
+                     total=self.total, speakers=self.speakers,
+                     shape=np.array([len(self), len(self.speakers)]), format=np.array(b"csr"))
+        os.replace(tmp, path)
+
+    def take(self, rows):
+        """rows 위치의 행만 (DataFrame 을 필터링한 것과 같은 순서)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = np.diff(self.indptr)[rows]
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        if counts.sum():
+            starts = np.repeat(self.indptr[rows] - indptr[:-1], counts)
+            positions = starts + np.arange(counts.sum())
+        else:
+            positions = np.zeros(0, dtype=np.int64)
+        return SpeakerMatrix(indptr, self.indices[positions], self.data[positions],
+                             self.total[rows], self.speakers)
+
+    # ==========================================
+    # 접근자
+    # ==========================================
+    def row_counts(self):
+        return np.diff(self.indptr)
+
+    def dominant_speaker(self):
+        """
+        행별 지배 화자 (object 배열, 없으면 None)
+        = dj_stat_ratio5 / make_ground_truth 의 get_dominant_speaker(Speakers 텍스트)
+        """
+        result = np.full(len(self), None, dtype=object)
+        has = self.row_counts() > 0
+        result[has] = self.speakers[self.indices[self.indptr[:-1][has]]].astype(object)
+        return result
+
+    def dominant_ratio(self):
+        """
+        행별 지배 화자 비율 (없으면 0.0)
+        = ina_speech_mbc_classify.get_speaker_ratio(Speakers 텍스트) — 텍스트의 소수 셋째 자리 값
+        """
+        has = self.row_counts() > 0
+        first = self.data[self.indptr[:-1][has]]
+        result = np.zeros(len(self), dtype=np.float64)
+        result[has] = [float(f"{r:.3f}") for r in (first / self.total[has]).tolist()]
+        return result
+
+    def speaker_pairs(self):
+        """(행 번호, 화자) 배열 — 행마다 등장한 화자 전부 (dj_merge_block3 의 화자 집합)"""
+        rows = np.repeat(np.arange(len(self)), self.row_counts())
+        return rows, self.speakers[self.indices]
+
+    def speaker_sets(self):
+        """행별 화자 집합 리스트"""
+        sets = [set() for _ in range(len(self))]
+        for row, spk in zip(*self.speaker_pairs()):
+            sets[row].add(str(spk))
+        return sets
+
+    def to_text(self):
+        """Speakers 텍스트 컬럼 (사람이 읽는 export 용, merge 결과와 같은 문자열)"""
+        texts = []
+        for row in range(len(self)):
+            lo, hi = self.indptr[row], self.indptr[row + 1]
+            overlap = {str(self.speakers[i]): d for i, d in zip(self.indices[lo:hi], self.data[lo:hi].tolist())}
+            texts.append(format_speaker_ratios(overlap, float(self.total[row])))
+        return texts
+
+    def to_scipy(self):
+        """scipy.sparse.csr_matrix (scipy 가 있을 때만)"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=(len(self), len(self.speakers)))
+
+# ==========================================
+# CSV 옆 파일 찾기
+# ==========================================
+def matrix_path(csv_path):
+    """{date}_with_speaker_ratio.csv → {date}_with_speaker_ratio.npz"""
+    return os.path.splitext(csv_path)[0] + ".npz"
+
+def load_for_csv(csv_path, n_rows=None):
+    """
+    CSV 옆의 행렬 (없거나 CSV 보다 오래됐거나 행 수가 다르면 None → 호출자는 텍스트 파싱으로)
+    """
+    path = matrix_path(csv_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        return None
+    matrix = SpeakerMatrix.load(path)
+    if n_rows is not None and len(matrix) != n_rows:
+        return None
+    return matrix
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="행 × 화자 겹침 희소 행렬")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_info = sub.add_parser("info", help="행렬 요약")
+    p_info.add_argument("path")
+    p_check = sub.add_parser("check", help="CSV 의 Speakers 텍스트와 일치 확인")
+    p_check.add_argument("csv")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        matrix = SpeakerMatrix.load(args.path)
+        counts = matrix.row_counts()
+        print(f"📊 {args.path}")
+        print(f"   rows {len(matrix)} | speakers {len(matrix.speakers)} | nnz {len(matrix.data)} "
+              f"| rows with speakers {int((counts > 0).sum())}")
+        return
+
+    import pandas as pd
+    df = pd.read_csv(args.csv)
+    matrix = load_for_csv(args.csv, len(df))
+    if matrix is None:
+        print(f"❌ No up-to-date matrix for {args.csv} ({matrix_path(args.csv)})")
+        sys.exit(1)
+    text = df["Speakers"].fillna("").astype(str).tolist() if "Speakers" in df.columns else [""] * len(df)
+    mismatched = sum(a != b for a, b in zip(matrix.to_text(), text))
+    if mismatched:
+        print(f"❌ {mismatched} rows differ from the Speakers column")
+        sys.exit(1)
+    print(f"✅ {len(df)} rows match the Speakers column")
+
+
+if __name__ == "__main__":
+    main()
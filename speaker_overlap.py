@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Diarization 구간 겹침 계산 엔진 (merge_speaker.py / merge_speaker_overlap_ratio.py 공용)
+
+화자 구간을 시작 시각으로 한 번만 정렬해 두고, 각 CSV row 마다
+이진 탐색으로 후보 구간만 훑습니다.
+  - 정렬: O(m log m)
+  - 질의: O(log m + k)  (k = 실제로 겹치는 구간 수)
+"""
+from bisect import bisect_left, bisect_right
+
+
+class OverlapIndex:
+    """
+    diarization 세그먼트({'start', 'stop', 'speaker'}) 리스트에 대한 구간 인덱스
+
+    prefix_max_stop[i] = 정렬된 0..i 구간 중 가장 늦은 stop
+    -> 단조 증가하므로 "start 이전에 모두 끝난 구간"을 이진 탐색으로 건너뛸 수 있음
+    """
+
+    def __init__(self, diar_segments):
+        # 원래 파일 순서(order)를 보존해야 누적 합/동점 정렬이 기존 결과와 byte 단위로 같아짐
+        items = sorted(
+            ((seg["start"], seg["stop"], order, seg["speaker"])
+             for order, seg in enumerate(diar_segments)),
+            key=lambda x: (x[0], x[2])
+        )
+        self.starts = [it[0] for it in items]
+        self.stops = [it[1] for it in items]
+        self.orders = [it[2] for it in items]
+        self.speakers = [it[3] for it in items]
+
+        self.prefix_max_stop = []
+        running = float("-inf")
+        for stop in self.stops:
+            running = max(running, stop)
+            self.prefix_max_stop.append(running)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, stop):
+        """
+        [start, stop] 구간과 겹치는 화자별 누적 시간 반환
+
+        Returns:
+            (dict speaker -> duration, total_overlap)
+            dict 의 삽입 순서는 원본 diarization 파일 순서와 동일
+        """
+        lo = bisect_right(self.prefix_max_stop, start)
+        hi = bisect_left(self.starts, stop)
+
+        hits = []
+        for i in range(lo, hi):
+            overlap_start = max(start, self.starts[i])
+            overlap_stop = min(stop, self.stops[i])
+            if overlap_start < overlap_stop:
+                hits.append((self.orders[i], self.speakers[i], overlap_stop - overlap_start))
+
+        # 원본 순서대로 더해야 float 누적 결과가 기존 전체 스캔과 같음
+        hits.sort(key=lambda x: x[0])
+
+        overlap = {}
+        total_overlap = 0.0
+        for _, speaker, dur in hits:
+            overlap[speaker] = overlap.get(speaker, 0.0) + dur
+            total_overlap += dur
+        return overlap, total_overlap
+
+
+def format_speaker_ratios(overlap, total_overlap):
+    """'SPEAKER_xx:1.23s(0.456);...' 형식 문자열 (겹침 시간 내림차순)"""
+    if not overlap or total_overlap == 0:
+        return ""
+
+    parts = []
+    for spk, dur in sorted(overlap.items(), key=lambda x: x[1], reverse=True):
+        ratio = dur / total_overlap
+        parts.append(f"{spk}:{dur:.2f}s({ratio:.3f})")
+
+    return ";".join(parts)
+
+
+def best_speaker(overlap):
+    """가장 오래 겹친 화자 (없으면 UNKNOWN)"""
+    if not overlap:
+        return "UNKNOWN"
+    return max(overlap, key=overlap.get)
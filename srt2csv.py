@@ -1,3 +1,4 @@
+import io
 import csv
 import re
 import sys
@@ -26,52 +27,78 @@ def determine_type(duration: float, transcript: str) -> str:
     
     return "speech"
 
-def srt_to_csv(srt_file: str, csv_file: str):
-    # SRT 패턴 (숫자 - 시간 - 내용 - 빈줄)
-    pattern = re.compile(
-        r"(\d+)\n(\d\d:\d\d:\d\d,\d\d\d) --> (\d\d:\d\d:\d\d,\d\d\d)\n(.+?)(?=\n\n|\Z)",
-        re.S
-    )
-
-    if not os.path.exists(srt_file):
-        print(f"❌ 파일을 찾을 수 없습니다: {srt_file}")
-        return
+CSV_HEADER = [
+    "Start Time", "Stop Time", "Duration",
+    "Type", "MP3 File", "Transcript File", "Transcript"
+]
 
+class SegmentCsvWriter:
+    """
+    세그먼트를 하나씩 받아 CSV 행으로 기록 (gap 감지 상태 유지)
+    srt_to_csv() 와 live_transcribe.py 의 증분 기록이 같은 규칙을 쓰도록 분리
+    """
+    def __init__(self, f, write_header=True):
+        self.writer = csv.writer(f)
+        self.prev_stop = 0.0
+        self.first = True
+        if write_header:
+            self.writer.writerow(CSV_HEADER)
+
+    def write_entry(self, start_sec: float, end_sec: float, text: str):
+        self.writer.writerows(self.entry_rows(start_sec, end_sec, text))
+
+    def entry_rows(self, start_sec: float, end_sec: float, text: str):
+        """세그먼트 1개 → CSV 행 리스트 (앞 gap 행 포함)"""
+        rows = []
+        duration = round(end_sec - start_sec, 3)
+        transcript = " ".join(line.strip() for line in text.split("\n")).strip()
+
+        # GAP DETECTION (음악/침묵 구간)
+        if not self.first and start_sec > self.prev_stop:
+            gap_duration = round(start_sec - self.prev_stop, 3)
+            # gap도 60초 기준으로 music/silence 판단
+            gap_type = "music" if gap_duration >= 30 else "silence"
+            rows.append([self.prev_stop, start_sec, gap_duration, gap_type, "", "", ""])
+
+        self.first = False
+
+        # 타입 결정 (duration 기반)
+        row_type = determine_type(duration, transcript)
+
+        rows.append([start_sec, end_sec, duration, row_type, "", "", transcript])
+        self.prev_stop = end_sec
+        return rows
+
+# SRT 패턴 (숫자 - 시간 - 내용 - 빈줄)
+SRT_PATTERN = re.compile(
+    r"(\d+)\n(\d\d:\d\d:\d\d,\d\d\d) --> (\d\d:\d\d:\d\d,\d\d\d)\n(.+?)(?=\n\n|\Z)",
+    re.S
+)
+
+def read_srt_entries(srt_file: str):
+    """SRT → [(start_sec, end_sec, text)]"""
     with open(srt_file, "r", encoding="utf-8") as f:
         srt_text = f.read()
+    return [(parse_timestamp(start_ts), parse_timestamp(end_ts), text)
+            for idx, start_ts, end_ts, text in SRT_PATTERN.findall(srt_text)]
+
+def srt_to_rows(srt_file: str):
+    """SRT → CSV 행 리스트 (헤더 제외, srt_to_csv 와 같은 행)"""
+    rows = SegmentCsvWriter(io.StringIO(), write_header=False)
+    out = []
+    for start_sec, end_sec, text in read_srt_entries(srt_file):
+        out.extend(rows.entry_rows(start_sec, end_sec, text))
+    return out
 
-    entries = pattern.findall(srt_text)
+def srt_to_csv(srt_file: str, csv_file: str):
+    if not os.path.exists(srt_file):
+        print(f"❌ 파일을 찾을 수 없습니다: {srt_file}")
+        return
 
     with open(csv_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "Start Time", "Stop Time", "Duration",
-            "Type", "MP3 File", "Transcript File", "Transcript"
-        ])
-
-        prev_stop = 0.0
-        first = True
-
-        for idx, start_ts, end_ts, text in entries:
-            start_sec = parse_timestamp(start_ts)
-            end_sec = parse_timestamp(end_ts)
-            duration = round(end_sec - start_sec, 3)
-            transcript = " ".join(line.strip() for line in text.split("\n")).strip()
-
-            # GAP DETECTION (음악/침묵 구간)
-            if not first and start_sec > prev_stop:
-                gap_duration = round(start_sec - prev_stop, 3)
-                # gap도 60초 기준으로 music/silence 판단
-                gap_type = "music" if gap_duration >= 30 else "silence"
-                writer.writerow([prev_stop, start_sec, gap_duration, gap_type, "", "", ""])
-
-            first = False
-
-            # 타입 결정 (duration 기반)
-            row_type = determine_type(duration, transcript)
-            
-            writer.writerow([start_sec, end_sec, duration, row_type, "", "", transcript])
-            prev_stop = end_sec
+        rows = SegmentCsvWriter(f)
+        for start_sec, end_sec, text in read_srt_entries(srt_file):
+            rows.write_entry(start_sec, end_sec, text)
 
     print(f"✔ 변환 완료: {csv_file}")
 
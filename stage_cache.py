@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+내용 주소 기반(content-addressed) stage 캐시
+
+키 = sha256(stage 이름, 입력 파일 내용 해시, 모델 이름, 파라미터)
+  → 입력 오디오나 beam_size / vad_parameters / no_speech_threshold 같은
+    파라미터가 바뀌면 키가 달라져 자동으로 다시 계산됩니다.
+
+캐시 구조:
+  <cache_dir>/hashes.json            (경로+크기+mtime → 파일 해시 메모)
+  <cache_dir>/objects/ab/abcdef.../  (출력 파일 0, 1, ... + manifest.json)
+
+manifest.json 의 mtime 을 마지막 사용 시각으로 보고, 전체 크기가
+max_bytes 를 넘으면 가장 오래 안 쓴 항목부터 지웁니다 (LRU).
+
+환경변수:
+  RADIO_STAGE_CACHE      캐시 디렉토리
+  RADIO_STAGE_CACHE_GB   최대 크기 (GB, 기본 50)
+  RADIO_NO_CACHE=1       캐시 사용 안 함
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+CACHE_DIR = os.environ.get("RADIO_STAGE_CACHE", "/mnt/home_dnlab/jhjung/radio/.stage_cache")
+MAX_CACHE_BYTES = int(float(os.environ.get("RADIO_STAGE_CACHE_GB", "50")) * 1024 ** 3)
+
+_HASH_CHUNK = 4 * 1024 * 1024
+
+
+def cache_disabled():
+    return os.environ.get("RADIO_NO_CACHE", "") not in ("", "0")
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class StageCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.hash_index_path = os.path.join(cache_dir, "hashes.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    # ==========================================
+    # 키 계산
+    # ==========================================
+    def file_hash(self, path):
+        """
+        파일 내용 sha256 (경로/크기/mtime 이 같으면 메모된 값 재사용)
+        """
+        st = os.stat(path)
+        memo_key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+        index = {}
+        if os.path.exists(self.hash_index_path):
+            try:
+                with open(self.hash_index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+
+        if memo_key in index:
+            return index[memo_key]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        index[memo_key] = digest
+        _write_json_atomic(self.hash_index_path, index)
+        return digest
+
+    def key(self, stage, inputs, model=None, params=None):
+        """
+        stage:  stage 이름 (예: "whisper")
+        inputs: 입력 파일 경로 리스트 (내용 해시로 변환됨)
+        model:  모델 이름
+        params: 결과에 영향을 주는 파라미터 dict (JSON 직렬화 가능해야 함)
+        """
+        payload = {
+            "stage": stage,
+            "inputs": [self.file_hash(p) for p in inputs],
+            "model": model,
+            "params": params or {},
+        }
+        blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    # ==========================================
+    # 조회 / 저장
+    # ==========================================
+    def restore(self, key, outputs):
+        """
+        캐시에 있으면 outputs 경로로 복사하고 manifest 의 meta 반환 (없으면 None)
+        """
+        entry = self._entry_dir(key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if len(manifest.get("files", [])) != len(outputs):
+            return None
+
+        for i, out in enumerate(outputs):
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            shutil.copyfile(os.path.join(entry, str(i)), out)
+
+        # LRU: 마지막 사용 시각 갱신
+        os.utime(manifest_path, None)
+        return manifest.get("meta", {})
+
+    def store(self, key, outputs, stage=None, meta=None):
+        """outputs 파일들을 캐시에 저장 후 용량 초과분 정리"""
+        entry = self._entry_dir(key)
+        if os.path.exists(os.path.join(entry, "manifest.json")):
+            return
+
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        os.makedirs(tmp_entry, exist_ok=True)
+        for i, out in enumerate(outputs):
+            shutil.copyfile(out, os.path.join(tmp_entry, str(i)))
+
+        _write_json_atomic(os.path.join(tmp_entry, "manifest.json"), {
+            "stage": stage,
+            "files": [os.path.basename(p) for p in outputs],
+            "meta": meta or {},
+            "created": time.time(),
+        })
+
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # 다른 프로세스가 같은 키를 먼저 저장함
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """전체 크기가 max_bytes 를 넘으면 가장 오래 안 쓴 항목부터 삭제"""
+        entries = []
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, name)
+                manifest_path = os.path.join(entry, "manifest.json")
+                if name.endswith(".tmp") or not os.path.exists(manifest_path):
+                    continue
+                entries.append((os.path.getmtime(manifest_path), _dir_size(entry), entry))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def get_cache():
+    """RADIO_NO_CACHE 가 설정되어 있으면 None"""
+    if cache_disabled():
+        return None
+    try:
+        return StageCache()
+    except OSError as e:
+        print(f"⚠️  Stage cache unavailable ({e}) - running without cache")
+        return None
@@ -0,0 +1,75 @@
+import os
+import sys
+import shutil
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_transcribe import start_recorder, read_segment_list, watch
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+@needs_ffmpeg
+def test_recorder_exits_on_endless_input(tmp_path):
+    """끝이 없는 입력 (lavfi sine = 생방송 URL 대용) 도 duration 후 종료되고 마지막 세그먼트가 닫혀야 함"""
+    mp3_file = tmp_path / "mp3" / "20990101.mp3"
+    segment_dir = tmp_path / "mp3" / "segments"
+
+    proc, segment_list = start_recorder("sine=frequency=440", str(mp3_file), str(segment_dir), "20990101",
+                                        duration=3, segment_sec=2, realtime=False, input_format="lavfi")
+    try:
+        returncode = proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        pytest.fail("ffmpeg did not exit on an endless input")
+
+    assert returncode == 0
+    assert mp3_file.exists()
+    entries = read_segment_list(segment_list)
+    assert len(entries) == 2
+    assert entries[-1][2] == pytest.approx(3.0, abs=0.1)
+
+
+class FakeRecorder:
+    """두 번째 poll 에서 마지막 세그먼트 줄을 쓰고 바로 종료하는 ffmpeg 흉내"""
+    def __init__(self, segment_list):
+        self.segment_list = segment_list
+        self.calls = 0
+
+    def poll(self):
+        self.calls += 1
+        if self.calls == 1:
+            return None
+        if self.calls == 2:
+            with open(self.segment_list, "a", encoding="utf-8") as f:
+                f.write("20990101_001.wav,2.000000,3.000000\n")
+        return 0
+
+
+class FakeModel:
+    def __init__(self):
+        self.files = []
+
+    def transcribe(self, wav, **kwargs):
+        self.files.append(os.path.basename(wav))
+        return [], None
+
+
+class FakeTranscript:
+    def append(self, segments, offset):
+        return 0
+
+
+def test_watch_picks_up_segment_written_as_recorder_exits(tmp_path):
+    segment_list = tmp_path / "20990101_segments.csv"
+    segment_list.write_text("20990101_000.wav,0.000000,2.000000\n", encoding="utf-8")
+    model = FakeModel()
+
+    done = watch(model, str(segment_list), FakeTranscript(),
+                 recorder=FakeRecorder(str(segment_list)), poll_interval=0)
+
+    assert done == 2
+    assert model.files == ["20990101_000.wav", "20990101_001.wav"]
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import socket
+import subprocess
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whisper_worker
+from whisper_worker import submit, serve, wait_for, write_json_atomic
+
+
+class StubModel:
+    """faster-whisper WhisperModel 대신 — transcribe() 만 흉내"""
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(audio)
+        segments = [SimpleNamespace(start=0.0, end=1.5, text=" 안녕하세요"),
+                    SimpleNamespace(start=1.5, end=3.0, text=" 뉴스입니다")]
+        info = SimpleNamespace(language="ko", language_probability=0.99, duration=3.0)
+        return iter(segments), info
+
+
+def make_audio(tmp_path, date="20990101"):
+    mp3_dir = tmp_path / date / "mp3"
+    mp3_dir.mkdir(parents=True)
+    audio = mp3_dir / f"{date}.mp3"
+    audio.write_bytes(b"")
+    return audio
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_submit_serve_roundtrip(tmp_path):
+    queue = str(tmp_path / "queue")
+    audio = make_audio(tmp_path)
+    model = StubModel()
+
+    job_name = submit(queue, str(audio))
+    assert serve(queue, model=model, once=True) == 1
+
+    state, job = wait_for(queue, job_name, timeout=0)
+    assert state == "done"
+    assert job["segments"] == 2
+    assert model.calls == [os.path.abspath(audio)]
+    with open(job["output_srt"], encoding="utf-8") as f:
+        assert "00:00:01,500 --> 00:00:03,000\n뉴스입니다" in f.read()
+    assert os.listdir(os.path.join(queue, "running")) == []
+
+
+def test_serve_requeues_job_of_dead_worker(tmp_path):
+    queue = str(tmp_path / "queue")
+    audio = make_audio(tmp_path)
+    job_name = submit(queue, str(audio))
+
+    # 작업 도중 죽은 워커가 남긴 running 파일
+    running_path = os.path.join(queue, "running", job_name)
+    os.rename(os.path.join(queue, "pending", job_name), running_path)
+    with open(running_path, encoding="utf-8") as f:
+        job = json.load(f)
+    job["worker"] = {"host": socket.gethostname(), "pid": dead_pid()}
+    write_json_atomic(running_path, job)
+
+    assert serve(queue, model=StubModel(), once=True) == 1
+    state, job = wait_for(queue, job_name, timeout=0)
+    assert state == "done"
+    assert job["attempts"] == 1
+
+
+def test_serve_fails_job_that_keeps_killing_workers(tmp_path):
+    queue = str(tmp_path / "queue")
+    audio = make_audio(tmp_path)
+    job_name = submit(queue, str(audio))
+
+    running_path = os.path.join(queue, "running", job_name)
+    os.rename(os.path.join(queue, "pending", job_name), running_path)
+    with open(running_path, encoding="utf-8") as f:
+        job = json.load(f)
+    job["attempts"] = whisper_worker.MAX_ATTEMPTS - 1
+    job["worker"] = {"host": socket.gethostname(), "pid": dead_pid()}
+    write_json_atomic(running_path, job)
+
+    model = StubModel()
+    assert serve(queue, model=model, once=True) == 0
+    state, job = wait_for(queue, job_name, timeout=0)
+    assert state == "failed"
+    assert "Worker died" in job["error"]
+    assert model.calls == []
+
+
+def test_recover_leaves_live_worker_job(tmp_path):
+    queue = str(tmp_path / "queue")
+    audio = make_audio(tmp_path)
+    job_name = submit(queue, str(audio))
+    assert whisper_worker.claim_next(queue) == (job_name, os.path.join(queue, "running", job_name))
+
+    # 이 프로세스가 주인 → 살아 있음
+    assert whisper_worker.recover_stale(queue) == 0
+    assert os.listdir(os.path.join(queue, "running")) == [job_name]
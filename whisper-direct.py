@@ -1,181 +1,155 @@
 #!/usr/bin/env python3
-import torch
-from faster_whisper import WhisperModel
 import os
-import sys
-import re
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from whisper_core import (
+    WHISPER_MODEL_SIZE, LANGUAGE, USE_VAD,
+    resolve_paths, transcript_outputs, detect_device, load_model,
+    load_batched_pipeline, transcribe_file, whisper_cache_key
+)
+from stage_cache import get_cache
+from audio_buffer import load_pcm
 
 # ============================================================
-# 1. Timestamp Formatter
+# 3. 배치 모드 보조 함수
 # ============================================================
-def format_timestamp(seconds: float) -> str:
-    hrs = int(seconds // 3600)
-    mins = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int(round((seconds - int(seconds)) * 1000))
-    return f"{hrs:02}:{mins:02}:{secs:02},{millis:03}"
+def decode_audio(audio_file):
+    """공유 16kHz mono float32 PCM 버퍼 (다른 stage 와 같은 디코딩 결과 재사용)"""
+    return load_pcm(audio_file, 16000, writable=True)
 
-# ============================================================
-# 2. Hard Filter (환각 방지용 강력 필터)
-# ============================================================
-def is_hallucination(text):
+def transcribe_many(model, jobs, batch_size, cache=None, cache_keys=None, structured=False, srt=True):
     """
-    Whisper 모델이 음악/무음 구간에서 자주 뱉는 환각(Hallucination) 키워드 필터링
-    """
-    text = text.strip()
-    
-    # 1. 너무 짧거나 특수문자만 있는 경우 삭제
-    if len(text) < 2:
-        return True
-    
-    # 2. 블랙리스트 (라디오/음악 환각 전용)
-    blacklist = [
-        "한글자막", "자막 by", "Subtitle",
-        "시청해 주셔서", "구독과 좋아요", "알림 설정", "좋아요", "구독",
-        "다음 주에 만나요", "다음 영상에서"
-    ]
-    
-    for word in blacklist:
-        # 대소문자 무시하고 포함 여부 확인
-        if word.lower() in text.lower():
-            # 문장이 너무 짧은데(10글자 미만) 저 단어가 포함되면 100% 환각
-            if len(text) < 15:
-                return True
-            # 문장이 길더라도 'MBC 라디오입니다' 같이 딱 떨어지면 환각
-            if text == word:
-                return True
-
-    # 3. 반복 문자 필터링 (예: ".......", "!!!!", "으으으으")
-    if len(text) > 5 and len(set(text)) < 3:
-        return True
-    
-    # 4. 반복 구문 필터링 (예: "행복하세요 행복하세요 행복하세요")
-    if len(text) > 20:
-        words = text.split()
-        if len(words) > 4 and len(set(words)) < len(words) / 2:
-            return True
-        
-    return False
+    여러 파일을 순서대로 전사 (batch_size > 1 이면 배치 파이프라인)
 
-# ============================================================
-# 3. Main Execution
-# ============================================================
-if len(sys.argv) != 2:
-    print("Usage: python whisper-direct.py <date_or_filepath>")
-    print("Example 1: python whisper-direct.py 20260131")
-    print("Example 2: python whisper-direct.py /path/to/audio.mp3")
-    exit(1)
-
-INPUT_ARG = sys.argv[1]
-
-# 입력이 날짜인지 파일 경로인지 판단하여 경로 설정
-if os.path.isfile(INPUT_ARG):
-    # 직접 파일 경로를 입력받은 경우
-    AUDIO_FILE = INPUT_ARG
-    BASE_DIR = os.path.dirname(os.path.dirname(AUDIO_FILE)) # ../../
-    DATE = os.path.splitext(os.path.basename(AUDIO_FILE))[0]
-    OUTPUT_DIR = os.path.join(os.path.dirname(AUDIO_FILE), "../transcript")
-else:
-    # 날짜(YYYYMMDD)만 입력받은 경우 (기본 설정)
-    DATE = INPUT_ARG
-    # ★ 주의: 본인 환경에 맞게 baechulsu 또는 jeongeunim 수정 필요 ★
-    BASE_DIR = f"/mnt/home_dnlab/jhjung/radio/baechulsu/{DATE}"
-    AUDIO_FILE = f"{BASE_DIR}/mp3/{DATE}.mp3"
-    OUTPUT_DIR = f"{BASE_DIR}/transcript"
-
-# 출력 폴더 생성
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-OUTPUT_TEXT = f"{OUTPUT_DIR}/{DATE}.txt"
-OUTPUT_SRT = f"{OUTPUT_DIR}/{DATE}.srt"
-
-if not os.path.exists(AUDIO_FILE):
-    print(f"❌ Audio file not found: {AUDIO_FILE}")
-    exit(1)
-
-# 모델 설정
-WHISPER_MODEL_SIZE = "large-v3"
-LANGUAGE = "ko"
-USE_VAD = True
-
-print("🚀 Loading faster-whisper model...")
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Using device: {device}")
-
-# 모델 로드 (float16 사용으로 속도 최적화)
-model = WhisperModel(
-    WHISPER_MODEL_SIZE,
-    device=device,
-    compute_type="float16"
-)
-
-print(f"\n▶ Starting transcription for: {AUDIO_FILE}")
-print(f"Model: {WHISPER_MODEL_SIZE} | Language: {LANGUAGE} | VAD: {USE_VAD}")
+    배치 모드에서는 다음 파일의 디코딩을 백그라운드 스레드에서 미리 해 두어
+    GPU 가 파일 사이에서 놀지 않도록 합니다.
+    cache 가 있으면 전사 결과(TXT/SRT, structured 면 JSONL/CSV 포함)를 cache_keys[i] 로 저장합니다.
 
-# ============================================================
-# 4. Transcribe (튜닝된 파라미터)
-# ============================================================
-segments, info = model.transcribe(
-    AUDIO_FILE,
-    language=LANGUAGE,
-    
-    # [속도 최적화] beam_size를 5에서 2로 줄입니다. 
-    # A6000에서 5는 너무 신중해서 느립니다. 2 정도면 충분히 정확하고 속도는 2배 빨라집니다.
-    beam_size=2, 
-    
-    # [정확도/속도] temperature를 리스트 대신 고정값으로 줍니다.
-    # 여러 온도를 다 시도하면 시간이 너무 많이 걸립니다. 0.0이 가장 표준적이고 빠릅니다.
-    temperature=0.0, 
-
-    vad_filter=True,
-    vad_parameters=dict(
-        min_silence_duration_ms=1000, 
-        speech_pad_ms=600             
-    ),
-
-    no_speech_threshold=0.3,         
-    condition_on_previous_text=True, 
-    word_timestamps=True
-)
-
-print("\n🎤 Transcription Completed!")
-print(f"Detected language: {info.language} ({info.language_probability:.2f})")
-print(f"Duration: {info.duration:.2f} sec")
+    Returns:
+        (총 오디오 길이(초), 결과 리스트)
+    """
+    pipeline = load_batched_pipeline(model) if batch_size > 1 else None
+    results = []
+    total_audio = 0.0
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = None
+        if pipeline is not None and jobs:
+            pending = prefetcher.submit(decode_audio, jobs[0][0])
+
+        for i, (audio_file, output_dir, date) in enumerate(jobs):
+            print(f"\n▶ [{i + 1}/{len(jobs)}] Starting transcription for: {audio_file}")
+
+            if pipeline is not None:
+                audio = pending.result()
+                if i + 1 < len(jobs):
+                    pending = prefetcher.submit(decode_audio, jobs[i + 1][0])
+            else:
+                audio = audio_file
+
+            started = time.time()
+            result = transcribe_file(model, audio, output_dir, date,
+                                     pipeline=pipeline, batch_size=batch_size,
+                                     structured=structured, srt=srt)
+            elapsed = time.time() - started
+
+            total_audio += result["duration"]
+            results.append(result)
+            if cache is not None:
+                cache.store(cache_keys[i], result["outputs"], stage="whisper", meta=result)
+            print(f"   ✅ {result['duration'] / 60:.1f} min audio in {elapsed:.1f}s "
+                  f"| {result['segments']} segments, {result['hallucinations']} hallucinations filtered")
+
+    return total_audio, results
 
 # ============================================================
-# 5. Save Output
+# 4. Main Execution
 # ============================================================
-print(f"\n💾 Saving output...")
-
-with open(OUTPUT_TEXT, "w", encoding="utf-8") as f_text, \
-     open(OUTPUT_SRT, "w", encoding="utf-8") as f_srt:
-
-    seg_idx = 1
-    hallucination_count = 0
-
-    for seg in segments:
-        start = seg.start
-        end = seg.end
-        text = seg.text.strip()
-
-        if not text:
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python whisper-direct.py <date_or_filepath> [<date_or_filepath> ...] [--batch-size N] [--jsonl [--no-srt]]",
+        epilog="Example 1: python whisper-direct.py 20260131\n"
+               "Example 2: python whisper-direct.py /path/to/audio.mp3\n"
+               "Example 3: python whisper-direct.py 20260129 20260130 20260131 --batch-size 16\n"
+               "Example 4: python whisper-direct.py 20260131 --jsonl   (→ {date}.jsonl + {date}.csv, srt2csv 불필요)",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inputs", nargs="+", help="YYYYMMDD 또는 MP3 경로 (여러 개 가능)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="VAD 구간 배치 크기 (1 = 기존 단일 파일 경로와 동일한 출력)")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="세그먼트별 {date}.jsonl (신뢰도/단어 포함) + gap 채운 {date}.csv 를 전사와 같은 패스에서 저장")
+    parser.add_argument("--no-srt", action="store_true", help="--jsonl 모드에서 SRT 는 쓰지 않음")
+    args = parser.parse_args()
+    if args.no_srt and not args.jsonl:
+        parser.error("--no-srt 는 --jsonl 과 같이 사용")
+    srt = not args.no_srt
+
+    # 입력이 날짜인지 파일 경로인지 판단하여 경로 설정
+    jobs = []
+    for input_arg in args.inputs:
+        audio_file, output_dir, date = resolve_paths(input_arg)
+        if not os.path.exists(audio_file):
+            print(f"❌ Audio file not found: {audio_file}")
+            if len(args.inputs) == 1:
+                exit(1)
             continue
-            
-        # 환각 필터링
-        if is_hallucination(text):
-            hallucination_count += 1
+        jobs.append((audio_file, output_dir, date))
+
+    if not jobs:
+        print("❌ No audio files to transcribe.")
+        exit(1)
+
+    # 입력 해시 + 파라미터가 같은 결과가 캐시에 있으면 전사 생략
+    cache = get_cache()
+    cached, todo, todo_keys = [], [], []
+    for audio_file, output_dir, date in jobs:
+        if cache is None:
+            todo.append((audio_file, output_dir, date))
             continue
-
-        # TXT 저장
-        f_text.write(f"[{format_timestamp(start)} → {format_timestamp(end)}] {text}\n")
-
-        # SRT 저장
-        f_srt.write(f"{seg_idx}\n")
-        f_srt.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n")
-        f_srt.write(f"{text}\n\n")
-
-        seg_idx += 1
-
-print("\n🎉 ALL DONE!")
-print(f"Filtered {hallucination_count} hallucination segments.")
-print(f"Check output files:\n  {OUTPUT_TEXT}\n  {OUTPUT_SRT}")
\ No newline at end of file
+        key = whisper_cache_key(cache, audio_file, WHISPER_MODEL_SIZE, args.batch_size,
+                                structured=args.jsonl, srt=srt)
+        meta = cache.restore(key, transcript_outputs(output_dir, date, structured=args.jsonl, srt=srt))
+        if meta is not None:
+            print(f"♻️  Cache hit: {audio_file}")
+            cached.append(((audio_file, output_dir, date), meta))
+        else:
+            todo.append((audio_file, output_dir, date))
+            todo_keys.append(key)
+
+    if not todo:
+        print("\n🎉 ALL DONE! (all results restored from cache)")
+        return
+
+    print("🚀 Loading faster-whisper model...")
+    device = detect_device()
+    print(f"Using device: {device}")
+
+    # 모델 로드 (float16 사용으로 속도 최적화)
+    model = load_model(WHISPER_MODEL_SIZE, device=device, compute_type="float16")
+
+    print(f"Model: {WHISPER_MODEL_SIZE} | Language: {LANGUAGE} | VAD: {USE_VAD} | Batch: {args.batch_size}")
+
+    # ============================================================
+    # 5. Transcribe + Save Output (튜닝된 파라미터는 whisper_core.TRANSCRIBE_OPTIONS)
+    # ============================================================
+    wall_start = time.time()
+    total_audio, results = transcribe_many(model, todo, args.batch_size, cache=cache, cache_keys=todo_keys,
+                                           structured=args.jsonl, srt=srt)
+    wall = time.time() - wall_start
+
+    print("\n🎤 Transcription Completed!")
+    for (audio_file, output_dir, date), result in zip(todo, results):
+        print(f"\n[{date}] Detected language: {result['language']} ({result['language_probability']:.2f})")
+        print(f"Duration: {result['duration']:.2f} sec")
+        print(f"Filtered {result['hallucinations']} hallucination segments.")
+        print("Check output files:\n  " + "\n  ".join(result["outputs"]))
+
+    print("\n🎉 ALL DONE!")
+    print(f"⏱️  Throughput: {total_audio / 3600:.2f} audio-hours in {wall / 3600:.2f} wall-hours "
+          f"→ {total_audio / max(wall, 1e-9):.1f} audio-h per wall-h ({len(results)} files, {len(cached)} cached)")
+
+if __name__ == "__main__":
+    main()
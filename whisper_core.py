@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Whisper 전사 공용 모듈 (whisper-direct.py / whisper_worker.py 공용)
+
+- 경로 해석 (날짜 or 파일 경로)
+- 모델 로드 (torch / faster_whisper 는 함수 안에서 import)
+- 전사 + 환각 필터 + TXT/SRT 저장
+- structured 모드: 세그먼트별 JSONL (신뢰도/단어 포함) + gap 채운 {date}.csv 를 같은 패스에서 저장
+"""
+import os
+import json
+import inspect
+import hashlib
+from contextlib import ExitStack
+
+from srt2csv import SegmentCsvWriter, parse_timestamp
+
+# ★ 주의: 본인 환경에 맞게 baechulsu 또는 jeongeunim 수정 필요 ★
+BASE_PATH = "/mnt/home_dnlab/jhjung/radio/baechulsu"
+
+# 모델 설정
+WHISPER_MODEL_SIZE = "large-v3"
+LANGUAGE = "ko"
+USE_VAD = True
+
+# ============================================================
+# Transcribe 파라미터 (튜닝된 값)
+# ============================================================
+TRANSCRIBE_OPTIONS = dict(
+    language=LANGUAGE,
+
+    # [속도 최적화] beam_size를 5에서 2로 줄입니다.
+    # A6000에서 5는 너무 신중해서 느립니다. 2 정도면 충분히 정확하고 속도는 2배 빨라집니다.
+    beam_size=2,
+
+    # [정확도/속도] temperature를 리스트 대신 고정값으로 줍니다.
+    # 여러 온도를 다 시도하면 시간이 너무 많이 걸립니다. 0.0이 가장 표준적이고 빠릅니다.
+    temperature=0.0,
+
+    vad_filter=USE_VAD,
+    vad_parameters=dict(
+        min_silence_duration_ms=1000,
+        speech_pad_ms=600
+    ),
+
+    no_speech_threshold=0.3,
+    condition_on_previous_text=True,
+    word_timestamps=True
+)
+
+# ============================================================
+# 1. Timestamp Formatter
+# ============================================================
+def format_timestamp(seconds: float) -> str:
+    hrs = int(seconds // 3600)
+    mins = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int(round((seconds - int(seconds)) * 1000))
+    return f"{hrs:02}:{mins:02}:{secs:02},{millis:03}"
+
+# ============================================================
+# 2. Hard Filter (환각 방지용 강력 필터)
+# ============================================================
+def is_hallucination(text):
+    """
+    Whisper 모델이 음악/무음 구간에서 자주 뱉는 환각(Hallucination) 키워드 필터링
+    """
+    text = text.strip()
+
+    # 1. 너무 짧거나 특수문자만 있는 경우 삭제
+    if len(text) < 2:
+        return True
+
+    # 2. 블랙리스트 (라디오/음악 환각 전용)
+    blacklist = [
+        "한글자막", "자막 by", "Subtitle",
+        "시청해 주셔서", "구독과 좋아요", "알림 설정", "좋아요", "구독",
+        "다음 주에 만나요", "다음 영상에서"
+    ]
+
+    for word in blacklist:
+        # 대소문자 무시하고 포함 여부 확인
+        if word.lower() in text.lower():
+            # 문장이 너무 짧은데(10글자 미만) 저 단어가 포함되면 100% 환각
+            if len(text) < 15:
+                return True
+            # 문장이 길더라도 'MBC 라디오입니다' 같이 딱 떨어지면 환각
+            if text == word:
+                return True
+
+    # 3. 반복 문자 필터링 (예: ".......", "!!!!", "으으으으")
+    if len(text) > 5 and len(set(text)) < 3:
+        return True
+
+    # 4. 반복 구문 필터링 (예: "행복하세요 행복하세요 행복하세요")
+    if len(text) > 20:
+        words = text.split()
+        if len(words) > 4 and len(set(words)) < len(words) / 2:
+            return True
+
+    return False
+
+# ============================================================
+# 3. 경로 해석
+# ============================================================
+def resolve_paths(input_arg, base_path=BASE_PATH):
+    """
+    입력이 날짜인지 파일 경로인지 판단하여 (audio_file, output_dir, date) 반환
+    """
+    if os.path.isfile(input_arg):
+        # 직접 파일 경로를 입력받은 경우
+        audio_file = input_arg
+        date = os.path.splitext(os.path.basename(audio_file))[0]
+        output_dir = os.path.join(os.path.dirname(audio_file), "../transcript")
+    else:
+        # 날짜(YYYYMMDD)만 입력받은 경우 (기본 설정)
+        date = input_arg
+        audio_file = f"{base_path}/{date}/mp3/{date}.mp3"
+        output_dir = f"{base_path}/{date}/transcript"
+    return audio_file, output_dir, date
+
+def output_paths(output_dir, date):
+    """(TXT, SRT) 출력 경로"""
+    return f"{output_dir}/{date}.txt", f"{output_dir}/{date}.srt"
+
+def structured_paths(output_dir, date):
+    """(JSONL, CSV) 출력 경로 — structured 모드"""
+    return f"{output_dir}/{date}.jsonl", f"{output_dir}/{date}.csv"
+
+def transcript_outputs(output_dir, date, structured=False, srt=True):
+    """모드별로 실제 저장되는 파일 목록 (캐시 store/restore 순서와 같음)"""
+    output_text, output_srt = output_paths(output_dir, date)
+    outputs = [output_text]
+    if srt or not structured:
+        outputs.append(output_srt)
+    if structured:
+        outputs += list(structured_paths(output_dir, date))
+    return outputs
+
+# ============================================================
+# 4. 모델 로드
+# ============================================================
+def detect_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def load_model(model_size=WHISPER_MODEL_SIZE, device=None, compute_type=None):
+    """
+    faster-whisper 모델 로드 (GPU: float16, CPU: int8 기본)
+    """
+    from faster_whisper import WhisperModel
+
+    if device is None:
+        device = detect_device()
+    if compute_type is None:
+        compute_type = "float16" if device == "cuda" else "int8"
+
+    return WhisperModel(model_size, device=device, compute_type=compute_type)
+
+# ============================================================
+# 5. Transcribe + Save
+# ============================================================
+def srt_seconds(seconds: float) -> float:
+    """SRT 에 적히고 srt2csv 가 다시 읽던 값 (ms 단위) → CSV 가 기존 SRT 경유 결과와 같도록"""
+    return parse_timestamp(format_timestamp(seconds))
+
+def segment_record(seg, text):
+    """세그먼트 → JSONL 1줄 (원본 정밀도 시간 + 디코딩 신뢰도 + 단어)"""
+    words = getattr(seg, "words", None) or []
+    return {
+        "start": seg.start,
+        "end": seg.end,
+        "text": text,
+        "avg_logprob": getattr(seg, "avg_logprob", None),
+        "no_speech_prob": getattr(seg, "no_speech_prob", None),
+        "compression_ratio": getattr(seg, "compression_ratio", None),
+        "temperature": getattr(seg, "temperature", None),
+        "words": [{"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                  for w in words],
+    }
+
+def write_segments(segments, output_text, output_srt=None, output_jsonl=None, output_csv=None):
+    """
+    세그먼트를 환각 필터링 후 TXT (+ SRT / JSONL / CSV) 로 저장
+    디코딩되는 대로 한 세그먼트씩 기록 (JSONL 은 세그먼트마다 flush)
+
+    Returns:
+        (저장한 세그먼트 수, 필터링된 환각 수)
+    """
+    with ExitStack() as stack:
+        open_text = lambda path: stack.enter_context(open(path, "w", encoding="utf-8"))
+        f_text = open_text(output_text)
+        f_srt = open_text(output_srt) if output_srt else None
+        f_jsonl = open_text(output_jsonl) if output_jsonl else None
+        csv_rows = None
+        if output_csv:
+            # srt_to_csv 와 같은 열기 옵션 (csv 모듈 줄바꿈)
+            csv_rows = SegmentCsvWriter(stack.enter_context(open(output_csv, "w", newline="", encoding="utf-8")))
+
+        seg_idx = 1
+        hallucination_count = 0
+
+        for seg in segments:
+            start = seg.start
+            end = seg.end
+            text = seg.text.strip()
+
+            if not text:
+                continue
+
+            # 환각 필터링
+            if is_hallucination(text):
+                hallucination_count += 1
+                continue
+
+            # TXT 저장
+            f_text.write(f"[{format_timestamp(start)} → {format_timestamp(end)}] {text}\n")
+
+            # SRT 저장
+            if f_srt is not None:
+                f_srt.write(f"{seg_idx}\n")
+                f_srt.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n")
+                f_srt.write(f"{text}\n\n")
+
+            # JSONL / CSV 저장 (srt2csv 단계 없이 바로)
+            if f_jsonl is not None:
+                f_jsonl.write(json.dumps(segment_record(seg, text), ensure_ascii=False) + "\n")
+                f_jsonl.flush()
+            if csv_rows is not None:
+                csv_rows.write_entry(srt_seconds(start), srt_seconds(end), text)
+
+            seg_idx += 1
+
+    return seg_idx - 1, hallucination_count
+
+def load_batched_pipeline(model):
+    """여러 VAD 구간을 한 번에 디코딩하는 faster-whisper 배치 파이프라인"""
+    from faster_whisper import BatchedInferencePipeline
+    return BatchedInferencePipeline(model=model)
+
+def transcribe_file(model, audio_file, output_dir, date, pipeline=None, batch_size=1,
+                    structured=False, srt=True):
+    """
+    오디오 1개 전사 → {date}.txt / {date}.srt 저장
+
+    audio_file: 파일 경로 또는 16kHz mono float32 배열 (미리 디코딩한 경우)
+    pipeline:   load_batched_pipeline() 결과 — batch_size > 1 일 때만 사용
+                (batch_size == 1 이면 기존 단일 파일 경로와 완전히 같은 호출)
+    structured: {date}.jsonl + {date}.csv 도 같은 패스에서 저장 (srt2csv 불필요)
+    srt:        structured 모드에서 SRT 를 같이 쓸지 (기본 True)
+
+    Returns:
+        dict (duration, segments, hallucinations, output_text, output_srt, output_jsonl, output_csv, outputs)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_text, output_srt = output_paths(output_dir, date)
+    output_jsonl, output_csv = structured_paths(output_dir, date) if structured else (None, None)
+    if structured and not srt:
+        output_srt = None
+
+    if pipeline is not None and batch_size > 1:
+        segments, info = pipeline.transcribe(audio_file, batch_size=batch_size, **TRANSCRIBE_OPTIONS)
+    else:
+        segments, info = model.transcribe(audio_file, **TRANSCRIBE_OPTIONS)
+
+    # segments 는 generator 이므로 실제 디코딩은 저장하면서 진행됨
+    saved, hallucination_count = write_segments(segments, output_text, output_srt,
+                                                output_jsonl=output_jsonl, output_csv=output_csv)
+
+    return {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration,
+        "segments": saved,
+        "hallucinations": hallucination_count,
+        "output_text": output_text,
+        "output_srt": output_srt,
+        "output_jsonl": output_jsonl,
+        "output_csv": output_csv,
+        "outputs": transcript_outputs(output_dir, date, structured=structured, srt=srt),
+    }
+
+# ============================================================
+# 6. Stage 캐시 키
+# ============================================================
+def whisper_cache_key(cache, audio_file, model_size=WHISPER_MODEL_SIZE, batch_size=1,
+                      structured=False, srt=True):
+    """
+    입력 오디오 해시 + 모델 + 전사 파라미터 + 후처리(환각 필터/타임스탬프) 코드 기준 키
+    → 파라미터나 블랙리스트를 바꾸면 자동으로 다시 전사됨
+    """
+    postprocess_src = inspect.getsource(is_hallucination) + inspect.getsource(format_timestamp)
+    params = dict(TRANSCRIBE_OPTIONS)
+    if batch_size > 1:
+        params["batch_size"] = batch_size
+        # 배치 모드는 audio_buffer 의 ffmpeg PCM 을 입력으로 사용 (단일 파일 경로는 faster-whisper 디코더 그대로)
+        from audio_buffer import PCM_DECODER
+        params["decoder"] = PCM_DECODER
+    if structured:
+        # 저장 파일 구성이 다르므로 기존 (TXT/SRT) 캐시 항목과 구분
+        params["outputs"] = [os.path.splitext(p)[1] for p in transcript_outputs("", "", True, srt)]
+        postprocess_src += inspect.getsource(segment_record) + inspect.getsource(SegmentCsvWriter)
+    params["postprocess"] = hashlib.sha256(postprocess_src.encode("utf-8")).hexdigest()
+    return cache.key("whisper", [audio_file], model=model_size, params=params)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+상주형 Whisper 전사 워커 (queue 디렉토리 API)
+
+모델을 한 번만 로드해 두고, queue 디렉토리에 들어오는 작업(JSON)을 순서대로 처리합니다.
+출력은 whisper-direct.py 와 동일한 {date}.txt / {date}.srt 입니다.
+(submit --jsonl 이면 {date}.jsonl / {date}.csv 도 같이 — whisper-direct.py --jsonl 과 같음)
+
+  queue/
+    pending/  ← submit 이 작업 파일을 넣는 곳
+    running/  ← 워커가 rename 으로 가져간 작업 (원자적 claim, worker = host/pid 기록)
+    done/     ← 성공 (결과 정보가 JSON 에 추가됨)
+    failed/   ← 실패 (error 메시지 포함)
+
+워커가 작업 중에 죽으면 (OOM, GPU reset, kill) running/ 에 작업이 남으므로
+serve 시작 시 주인 프로세스가 없는 running/ 작업을 pending/ 으로 되돌림
+(같은 작업으로 MAX_ATTEMPTS 번 죽었으면 failed/ 로)
+
+Usage:
+  python whisper_worker.py serve  --queue <dir> [--model large-v3] [--device cuda]
+  python whisper_worker.py submit --queue <dir> <date_or_filepath> [--wait] [--jsonl]
+
+CPU 테스트:
+  python whisper_worker.py serve --queue /tmp/wq --model tiny --device cpu --once
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import traceback
+
+from whisper_core import WHISPER_MODEL_SIZE, resolve_paths, load_model, transcribe_file
+
+QUEUE_STATES = ("pending", "running", "done", "failed")
+MAX_ATTEMPTS = 2        # 이 횟수만큼 워커가 죽은 작업은 다시 돌리지 않고 failed
+CLAIM_GRACE_SEC = 30    # worker 기록이 없는 running 작업 (claim 직후 / 이전 버전 워커) 을 기다려 주는 시간
+
+# ==========================================
+# Queue 유틸
+# ==========================================
+def init_queue(queue_dir):
+    for state in QUEUE_STATES:
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+def write_json_atomic(path, data):
+    """tmp 파일에 쓰고 rename → 워커가 반쯤 쓰인 JSON 을 읽지 않음"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def submit(queue_dir, input_arg, structured=False):
+    """작업 등록 후 job 파일 이름 반환"""
+    init_queue(queue_dir)
+    audio_file, output_dir, date = resolve_paths(input_arg)
+
+    # 날짜 자리에 경로가 들어와도 파일 이름이 깨지지 않도록 정리
+    safe_date = re.sub(r"[^\w.-]", "_", date)
+    job_name = f"{time.time_ns()}-{safe_date}.json"
+    write_json_atomic(os.path.join(queue_dir, "pending", job_name), {
+        "input": input_arg,
+        "audio": os.path.abspath(audio_file),
+        "output_dir": os.path.abspath(output_dir),
+        "date": date,
+        "structured": structured,
+        "submitted": time.time(),
+    })
+    return job_name
+
+def wait_for(queue_dir, job_name, timeout=None, poll_interval=2.0):
+    """작업이 done/failed 로 옮겨질 때까지 대기 → (state, job dict)"""
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        for state in ("done", "failed"):
+            path = os.path.join(queue_dir, state, job_name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return state, json.load(f)
+        if deadline is not None and time.time() > deadline:
+            return "timeout", None
+        time.sleep(poll_interval)
+
+def claim_next(queue_dir):
+    """pending 에서 가장 오래된 작업을 running 으로 옮겨서 반환 (없으면 None)"""
+    pending_dir = os.path.join(queue_dir, "pending")
+    for name in sorted(os.listdir(pending_dir)):
+        if not name.endswith(".json"):
+            continue
+        running_path = os.path.join(queue_dir, "running", name)
+        try:
+            os.rename(os.path.join(pending_dir, name), running_path)
+        except FileNotFoundError:
+            # 다른 워커가 먼저 가져감
+            continue
+        mark_owner(running_path)
+        return name, running_path
+    return None
+
+def mark_owner(running_path):
+    """running 작업에 이 프로세스(host, pid) 를 기록 → 나중에 죽은 워커의 작업인지 판단"""
+    with open(running_path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    job["worker"] = {"host": socket.gethostname(), "pid": os.getpid()}
+    job["claimed"] = time.time()
+    write_json_atomic(running_path, job)
+
+def owner_alive(job):
+    """True / False, 판단 불가(다른 host 이거나 기록 없음)면 None"""
+    worker = job.get("worker")
+    if not worker or worker.get("host") != socket.gethostname():
+        return None
+    try:
+        os.kill(worker["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass   # 다른 사용자의 살아 있는 프로세스
+    return True
+
+def recover_stale(queue_dir, max_attempts=MAX_ATTEMPTS):
+    """
+    주인 워커가 죽은 running 작업을 pending 으로 되돌림 (max_attempts 번째면 failed)
+    → 되돌린 작업 수 반환
+    """
+    running_dir = os.path.join(queue_dir, "running")
+    recovered = 0
+    for name in sorted(os.listdir(running_dir)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(running_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+            ctime = os.stat(path).st_ctime
+        except FileNotFoundError:
+            continue   # 그 사이 끝남
+        except ValueError:
+            job, ctime = {}, 0.0   # 깨진 JSON — 주인 확인 불가
+
+        alive = owner_alive(job)
+        if alive is None:
+            if job.get("worker"):
+                print(f"   ⏭️  {name}: claimed on {job['worker'].get('host')}, leaving it")
+                continue
+            # rename 으로 claim 하면 ctime 이 바뀜 → 최근 claim 은 owner 기록 전일 수 있음
+            if time.time() - ctime < CLAIM_GRACE_SEC:
+                continue
+        elif alive:
+            continue
+
+        # 다른 워커가 동시에 복구하지 않도록 먼저 rename 으로 가져옴 (.json 이 아니므로 claim 대상 아님)
+        stale_path = path + ".stale"
+        try:
+            os.rename(path, stale_path)
+        except FileNotFoundError:
+            continue
+
+        job["attempts"] = job.get("attempts", 0) + 1
+        worker = job.pop("worker", None)
+        job.pop("claimed", None)
+        if job["attempts"] >= max_attempts:
+            job["error"] = f"Worker died while running the job ({job['attempts']} attempts, last {worker})"
+            state = "failed"
+            print(f"   ❌ {name}: {job['error']}")
+        else:
+            state = "pending"
+            print(f"   ♻️  {name}: worker {worker} is gone, back to pending")
+        write_json_atomic(os.path.join(queue_dir, state, name), job)
+        os.remove(stale_path)
+        recovered += 1
+    return recovered
+
+# ==========================================
+# Worker
+# ==========================================
+def process_job(model, queue_dir, name, running_path):
+    with open(running_path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+
+    print(f"\n▶ [{job['date']}] {job['audio']}")
+    started = time.time()
+
+    try:
+        if not os.path.exists(job["audio"]):
+            raise FileNotFoundError(f"Audio file not found: {job['audio']}")
+
+        result = transcribe_file(model, job["audio"], job["output_dir"], job["date"],
+                                 structured=job.get("structured", False))
+        job.update(result)
+        state = "done"
+        print(f"   ✅ {result['segments']} segments "
+              f"({result['hallucinations']} hallucinations filtered) → {', '.join(result['outputs'][1:])}")
+    except Exception as e:
+        job["error"] = f"{type(e).__name__}: {e}"
+        job["traceback"] = traceback.format_exc()
+        state = "failed"
+        print(f"   ❌ {job['error']}")
+
+    job["elapsed"] = round(time.time() - started, 2)
+    write_json_atomic(os.path.join(queue_dir, state, name), job)
+    os.remove(running_path)
+    return state
+
+def serve(queue_dir, model=None, model_size=WHISPER_MODEL_SIZE, device=None,
+          compute_type=None, poll_interval=2.0, once=False):
+    """
+    queue 를 계속 감시하며 작업 처리
+
+    model: 이미 로드된 모델 (transcribe() 를 가진 객체) — 없으면 여기서 1회 로드
+    once:  pending 이 비면 종료 (배치/테스트용)
+    """
+    init_queue(queue_dir)
+    recover_stale(queue_dir)
+
+    if model is None:
+        print(f"📦 Loading Whisper model: {model_size} (device={device or 'auto'})")
+        model = load_model(model_size, device=device, compute_type=compute_type)
+        print("   ✅ Model loaded!")
+
+    print(f"👂 Watching queue: {queue_dir}")
+    processed = 0
+    while True:
+        claimed = claim_next(queue_dir)
+        if claimed is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        process_job(model, queue_dir, *claimed)
+        processed += 1
+
+    print(f"\n🎉 Worker finished: {processed} jobs")
+    return processed
+
+# ==========================================
+# MAIN
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="상주형 Whisper 전사 워커")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="모델을 한 번 로드하고 queue 처리")
+    p_serve.add_argument("--queue", required=True, help="queue 디렉토리")
+    p_serve.add_argument("--model", default=WHISPER_MODEL_SIZE, help="모델 이름 (예: large-v3, tiny)")
+    p_serve.add_argument("--device", default=None, help="cuda / cpu (기본: 자동)")
+    p_serve.add_argument("--compute-type", default=None, help="float16 / int8 ... (기본: 장치별 자동)")
+    p_serve.add_argument("--poll", type=float, default=2.0, help="queue 확인 간격(초)")
+    p_serve.add_argument("--once", action="store_true", help="pending 이 비면 종료")
+
+    p_submit = sub.add_parser("submit", help="작업 등록")
+    p_submit.add_argument("--queue", required=True, help="queue 디렉토리")
+    p_submit.add_argument("input", help="YYYYMMDD 또는 오디오 파일 경로")
+    p_submit.add_argument("--wait", action="store_true", help="완료될 때까지 대기 (실패 시 exit 1)")
+    p_submit.add_argument("--timeout", type=float, default=None, help="--wait 최대 대기 시간(초)")
+    p_submit.add_argument("--jsonl", action="store_true", help="{date}.jsonl + {date}.csv 도 저장 (whisper-direct.py --jsonl)")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.queue, model_size=args.model, device=args.device,
+              compute_type=args.compute_type, poll_interval=args.poll, once=args.once)
+        return
+
+    job_name = submit(args.queue, args.input, structured=args.jsonl)
+    print(f"📨 Submitted: {job_name}")
+
+    if args.wait:
+        state, job = wait_for(args.queue, job_name, timeout=args.timeout)
+        if state == "done":
+            print(f"✅ Done in {job['elapsed']}s: {job['output_srt']}")
+        elif state == "failed":
+            print(f"❌ Failed: {job.get('error')}")
+            sys.exit(1)
+        else:
+            print(f"⏱️  Timed out waiting for {job_name}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()